@@ -2,7 +2,113 @@
 # For more information and documentation, please go to https://support.saleae.com/extensions/high-level-analyzer-extensions
 
 from saleae.analyzers import HighLevelAnalyzer, AnalyzerFrame, StringSetting, NumberSetting, ChoicesSetting
+import atexit
+import collections
+import time
+import weakref
 import tmag5170 as lbr
+import tmag5170_export
+import tmag5170_statistics
+import tmag5170_background_worker
+import tmag5170_memory
+import tmag5170_crc_correction
+import tmag5170_shared_memory
+import tmag5170_load_shedding
+
+# Settings independent raw decoding results (words, length check, crc) of recent captures keyed by bytes of their first frame.
+# Module level, so Hla re-instantiated by Logic 2 after settings change on the same capture repeats only the presentation phase.
+# Reuse is limited to the first RAW_FRAME_RECORD_CACHE_FRAME_COUNT frames of the last RAW_FRAME_RECORD_CACHE_CAPTURE_COUNT captures.
+RAW_FRAME_RECORD_CACHE_FRAME_COUNT = 1 << 18
+RAW_FRAME_RECORD_CACHE_CAPTURE_COUNT = 2
+raw_frame_record_caches = {}
+
+class tmag5170_raw_frame_record_cache:
+    '''
+    Raw frame records of one capture in frame order.
+    Record is reused only when frame words match, record depends on nothing else, so capture with the same first frame cannot get wrong record.
+    '''
+    def __init__(self, max_frame_count = RAW_FRAME_RECORD_CACHE_FRAME_COUNT):
+        self.max_frame_count = max_frame_count
+        self.raw_frame_records = []
+
+    def __len__(self):
+        return len(self.raw_frame_records)
+
+    def get(self, frame_index, mosi_value, miso_value):
+        if frame_index < len(self.raw_frame_records):
+            raw_frame_record = self.raw_frame_records[frame_index]
+            if raw_frame_record.mosi_value == mosi_value and raw_frame_record.miso_value == miso_value:
+                return raw_frame_record
+        return None
+
+    def add(self, frame_index, raw_frame_record):
+        if frame_index < len(self.raw_frame_records):
+            # Capture differs from cached one from this frame on
+            del self.raw_frame_records[frame_index:]
+        if frame_index == len(self.raw_frame_records) and frame_index < self.max_frame_count:
+            self.raw_frame_records.append(raw_frame_record)
+
+def get_raw_frame_record_cache(first_frame_key):
+    '''
+    Cache of capture starting with given frame bytes, the least recently started capture is dropped.
+    '''
+    raw_frame_record_cache = raw_frame_record_caches.pop(first_frame_key, None)
+    if raw_frame_record_cache == None:
+        raw_frame_record_cache = tmag5170_raw_frame_record_cache()
+    raw_frame_record_caches[first_frame_key] = raw_frame_record_cache
+    while len(raw_frame_record_caches) > RAW_FRAME_RECORD_CACHE_CAPTURE_COUNT:
+        del raw_frame_record_caches[next(iter(raw_frame_record_caches))]
+    return raw_frame_record_cache
+
+# Shared memory writers by block name, module level so re-instantiated Hla keeps publishing to the same block
+shared_memory_writers = {}
+
+# Resource releasers of the last Hla by export file path, module level so Hla re-instantiated by Logic 2
+# releases previous export sink (and worker feeding it) before the file is opened again
+export_file_releasers = {}
+
+# Frame types printed as single short line
+compact_frame_types = frozenset(('tmag5170_compact', 'tmag5170_compact_special', 'tmag5170_crc_address'))
+
+class tmag5170_frame_record_handler:
+    '''
+    Terminal output and export of decoded frames, called directly or from background worker.
+    Handler does not reference Hla, so records still queued when Hla is garbage collected are written too.
+    '''
+    def __init__(self, export_sink = None):
+        self.export_sink = export_sink
+        self.frame_type_counts = collections.Counter()
+
+    def __call__(self, frame_record):
+        '''
+        frame_record: (start time, end time, raw frame record, length error message, frame type, frame dictionary), frame type and dictionary are None for decimated frames.
+        '''
+        start_frame_label_time, end_frame_label_time, raw_frame_record, length_err_msg, AnalyzerFrameType, AnalyzerFrameDictionary = frame_record
+        if AnalyzerFrameDictionary == None:
+            return
+        self.frame_type_counts[AnalyzerFrameType] += 1
+        if self.export_sink != None:
+            self.export_sink.write(AnalyzerFrameType, start_frame_label_time, end_frame_label_time, AnalyzerFrameDictionary)
+        if AnalyzerFrameType in compact_frame_types:
+            print(f"FrameCnt_debug: {AnalyzerFrameDictionary['FrameCnt_debug']: >6}, crc_mosi: {AnalyzerFrameDictionary['crc_mosi_correct']: >{len(lbr.CRC_ERROR_TOKEN)}}, crc_miso: {AnalyzerFrameDictionary['crc_miso_correct']: >{len(lbr.CRC_ERROR_TOKEN)}}, read_write: {AnalyzerFrameDictionary.get('read_write', ''): >6}, reg name:{AnalyzerFrameDictionary.get('register_name', '')}")
+            return
+        print(f"FrameCnt_debug: {AnalyzerFrameDictionary['FrameCnt_debug']: >6}, mosi_f: {AnalyzerFrameDictionary['mosi_frame']: >10}, crc_mosi: {AnalyzerFrameDictionary['crc_mosi_correct']: >{len(lbr.CRC_ERROR_TOKEN)}}, miso_f: {AnalyzerFrameDictionary['miso_frame']: >10}, crc_miso: {AnalyzerFrameDictionary['crc_miso_correct']: >{len(lbr.CRC_ERROR_TOKEN)}}, read_write: {AnalyzerFrameDictionary['read_write']: >6}, reg name:{AnalyzerFrameDictionary['register_name']}")
+
+    def close(self):
+        if self.export_sink != None:
+            self.export_sink.close()
+
+def release_hla_resources(background_worker, frame_record_handler, memory_accounting):
+    '''
+    Called once, when Hla is garbage collected (on any thread), replaced by Hla with the same export file or at exit.
+    Background worker closes handler itself after its queue is drained.
+    '''
+    if background_worker != None:
+        background_worker.stop()
+    else:
+        frame_record_handler.close()
+    if memory_accounting != None:
+        memory_accounting.stop()
 
 # High level analyzers must subclass the HighLevelAnalyzer class.
 class Hla(HighLevelAnalyzer):
@@ -72,6 +178,49 @@ class Hla(HighLevelAnalyzer):
     Y_RANGE = ChoicesSetting(choices=(RANGE_NOT_SELECTED, A2_150MT, A2_75MT, A2_300MT, A1_50MT, A1_25MT, A1_100MT))
     Z_RANGE = ChoicesSetting(choices=(RANGE_NOT_SELECTED, A2_150MT, A2_75MT, A2_300MT, A1_50MT, A1_25MT, A1_100MT))
 
+    Device_tag = StringSetting()
+
+    # Only every N-th measurement frame (X/Y/Z/TEMP/ANGLE/MAGNITUDE result or 12-bit data read) is decoded and shown
+    Measurement_decimation = NumberSetting(min_value=1)
+    # Minimal time [s] between decoded measurement frames, 0 disables
+    Measurement_decimation_interval = NumberSetting(min_value=0)
+
+    # Empty path disables export, *.csv selects CSV format, any other extension JSON Lines
+    Export_file_path = StringSetting()
+    # Comma separated list of exported fields, empty selects all fields
+    Export_fields = StringSetting()
+
+    # Number of frames between bus timing summary frames, 0 disables summary frames
+    Timing_summary_period = NumberSetting(min_value=0)
+
+    BACKGROUND_WORKER_DISABLED = "Terminal, export and statistics on decode path"
+    BACKGROUND_WORKER_DROP = "Background worker, drop records when queue is full"
+    BACKGROUND_WORKER_BLOCK = "Background worker, wait when queue is full"
+
+    str_background_worker_policy_mapping = {
+        BACKGROUND_WORKER_DROP:  tmag5170_background_worker.QUEUE_FULL_DROP,
+        BACKGROUND_WORKER_BLOCK: tmag5170_background_worker.QUEUE_FULL_BLOCK,
+        }
+
+    Background_worker = ChoicesSetting(choices=(BACKGROUND_WORKER_DISABLED, BACKGROUND_WORKER_DROP, BACKGROUND_WORKER_BLOCK))
+    # 0 selects default queue size
+    Background_worker_queue_size = NumberSetting(min_value=0)
+
+    DISPLAY_MODE_VERBOSE = "Verbose display, all decoded fields"
+    DISPLAY_MODE_COMPACT = "Compact display, register, value and crc only"
+    Display_mode = ChoicesSetting(choices=(DISPLAY_MODE_VERBOSE, DISPLAY_MODE_COMPACT))
+
+    # Name of shared memory ring buffer with decoded samples for live plotting (tools/shared_memory_reader.py), empty disables
+    Shared_memory_name = StringSetting()
+
+    MEMORY_ACCOUNTING_DISABLED = "Memory accounting DISABLED"
+    MEMORY_ACCOUNTING_ENABLED = "Memory accounting ENABLED (frame dictionaries, buffers, caches)"
+    MEMORY_ACCOUNTING_TRACEMALLOC = "Memory accounting ENABLED with tracemalloc snapshots"
+    Memory_accounting = ChoicesSetting(choices=(MEMORY_ACCOUNTING_DISABLED, MEMORY_ACCOUNTING_ENABLED, MEMORY_ACCOUNTING_TRACEMALLOC))
+
+    # Maximal decode time [s] per second of capture, detail of frames is lowered step by step when exceeded, 0 disables
+    Load_shedding_budget = NumberSetting(min_value=0)
+
     # An optional list of types this analyzer produces, providing a way to customize the way frames are displayed in Logic 2.
     result_types = {
         'tmag5170_regular': {
@@ -105,8 +254,24 @@ class Hla(HighLevelAnalyzer):
             crc_miso_expected: {{data.miso_crc_calculated}}, \
             crc_miso_from_bus: {{data.miso_crc_from_bus}},\
             reg_val:{{data.register_value}}' \
+        },
+        'tmag5170_compact': {
+            'format': '{{data.length_err_msg}}{{data.register_name}} {{data.read_write}} {{data.register_value}} {{data.crc_mosi_correct}}/{{data.crc_miso_correct}}'
+        },
+        'tmag5170_compact_special': {
+            'format': '{{data.length_err_msg}}{{data.register_name}} {{data.read_write}} ch1:{{data.ch1}} ch2:{{data.ch2}} {{data.crc_mosi_correct}}/{{data.crc_miso_correct}}'
+        },
+        'tmag5170_crc_address': {
+            'format': '{{data.length_err_msg}}{{data.register_address}} {{data.crc_mosi_correct}}/{{data.crc_miso_correct}}'
+        },
+        'tmag5170_timing_summary': {
+            'format': '{{data.timing_summary}}'
+        },
+        'tmag5170_load_shedding': {
+            'format': '{{data.load_shedding}}'
         }
     }
+
     
     
 
@@ -117,28 +282,134 @@ class Hla(HighLevelAnalyzer):
         Settings can be accessed using the same name used above.
         '''
 
-        self.decoder = lbr.tmga5170_frame_decoder(data_type = self.str_data_type_mapping[self.DATA_TYPE], 
+        self.device_context = lbr.tmag5170_device_context(device_tag = self.Device_tag,
+                                              data_type = self.str_data_type_mapping[self.DATA_TYPE], 
                                               Br_X_axis_enum = self.str_range_mapping[self.X_RANGE], 
                                               Br_Y_axis_enum = self.str_range_mapping[self.Y_RANGE], 
                                               Br_Z_axis_enum = self.str_range_mapping[self.Z_RANGE],
                                               TempAngleConvEn = self.str_temp_angle_conv_mapping[self.Temperature_Angle_Conversion])
+        self.decoder = lbr.tmga5170_frame_decoder(device_context = self.device_context,
+                                              decimation_factor = max(1, int(self.Measurement_decimation or 1)),
+                                              decimation_interval = max(0, float(self.Measurement_decimation_interval or 0)))
+
+        self.compact_display = self.Display_mode == self.DISPLAY_MODE_COMPACT
+        self.streaming_extractor = None
+        if self.compact_display and self.DATA_TYPE != self.DATA_TYPE_0h:
+            self.streaming_extractor = lbr.tmag5170_streaming_extractor(self.device_context.data_type, self.device_context.Br_X_axis_enum,
+                                              self.device_context.Br_Y_axis_enum, self.device_context.Br_Z_axis_enum, self.device_context.TempAngleConvEn)
 
         self.frame_data_MISO = bytearray(b'')
         self.frame_data_MOSI = bytearray(b'')
+        self.byte_start_times = []
+        self.byte_end_times = []
         self.start_frame_label_time = None
         self.end_frame_label_time = None
         self.counter = 0
-
-    def generateAnalyzerFrame(self):
-
-            length_err_msg = self.decoder.set_mosi_miso_raw_data(self.frame_data_MOSI, self.frame_data_MISO)
-            mosi_frame, miso_frame = self.decoder.get_mosi_miso_str()
-            miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = self.decoder.get_4_bit_crc_cmd_stat_group()
-
-            if self.DATA_TYPE == self.DATA_TYPE_0h:
+        # Index of frame in capture and raw phase cache of the capture, selected by the first frame
+        self.raw_frame_index = 0
+        self.raw_frame_record_cache = None
+
+        self.timing_statistics = tmag5170_statistics.tmag5170_bus_timing_statistics()
+        self.crc_error_statistics = tmag5170_crc_correction.tmag5170_crc_error_statistics()
+        self.conversion_latency_statistics = tmag5170_statistics.tmag5170_conversion_latency_statistics(is_12_bit_data_access = self.DATA_TYPE != self.DATA_TYPE_0h)
+        self.timing_summary_period = max(0, int(self.Timing_summary_period or 0))
+        self.next_timing_summary_counter = self.timing_summary_period
+
+        self.export_sink = None
+        if self.Export_file_path != "":
+            # Previous sink would flush its buffered stale bytes into the reopened file
+            previous_releaser = export_file_releasers.pop(self.Export_file_path, None)
+            if previous_releaser != None:
+                previous_releaser()
+            self.export_sink = tmag5170_export.tmag5170_export_sink(self.Export_file_path, tmag5170_export.parse_export_fields(self.Export_fields))
+        self.frame_record_handler = tmag5170_frame_record_handler(self.export_sink)
+
+        self.background_worker = None
+        if self.Background_worker in self.str_background_worker_policy_mapping:
+            self.background_worker = tmag5170_background_worker.tmag5170_background_worker(self.frame_record_handler,
+                                              queue_size = int(self.Background_worker_queue_size or tmag5170_background_worker.DEFAULT_QUEUE_SIZE),
+                                              queue_full_policy = self.str_background_worker_policy_mapping[self.Background_worker],
+                                              on_stop = self.frame_record_handler.close)
+
+        self.sample_publisher = None
+        self.sample_time_origin = None
+        if self.Shared_memory_name != "":
+            shared_memory_writer = shared_memory_writers.get(self.Shared_memory_name)
+            if shared_memory_writer == None:
+                shared_memory_writer = shared_memory_writers[self.Shared_memory_name] = tmag5170_shared_memory.tmag5170_shared_memory_writer(self.Shared_memory_name)
+                atexit.register(shared_memory_writer.close)
+            self.sample_publisher = tmag5170_shared_memory.tmag5170_sample_publisher(shared_memory_writer, self.device_context.data_type,
+                                              self.device_context.Br_X_axis_enum, self.device_context.Br_Y_axis_enum, self.device_context.Br_Z_axis_enum,
+                                              self.device_context.TempAngleConvEn)
+
+        self.load_shedder = None
+        self.detail_level = tmag5170_load_shedding.DETAIL_FULL
+        if float(self.Load_shedding_budget or 0) > 0:
+            self.load_shedder = tmag5170_load_shedding.tmag5170_load_shedder(float(self.Load_shedding_budget))
+
+        self.memory_accounting = None
+        if self.Memory_accounting != self.MEMORY_ACCOUNTING_DISABLED:
+            self.memory_accounting = tmag5170_memory.tmag5170_memory_accounting(trace_allocations = self.Memory_accounting == self.MEMORY_ACCOUNTING_TRACEMALLOC)
+
+        # Finalizer does not reference Hla, it runs at most once (also at exit)
+        self.resource_releaser = weakref.finalize(self, release_hla_resources, self.background_worker, self.frame_record_handler, self.memory_accounting)
+        if self.export_sink != None:
+            export_file_releasers[self.Export_file_path] = self.resource_releaser
+
+    def getRawFrameRecord(self, frame_data_MOSI, frame_data_MISO):
+        if self.raw_frame_index == 0:
+            self.raw_frame_record_cache = get_raw_frame_record_cache((bytes(frame_data_MOSI), bytes(frame_data_MISO)))
+        raw_frame_record = self.raw_frame_record_cache.get(self.raw_frame_index,
+                                                           lbr.tmga5170_frame_decoder.convert_tmag5170_bytes_to_int(frame_data_MOSI),
+                                                           lbr.tmga5170_frame_decoder.convert_tmag5170_bytes_to_int(frame_data_MISO))
+        if raw_frame_record == None:
+            raw_frame_record = self.decoder.decode_raw_frame(frame_data_MOSI, frame_data_MISO)
+            self.raw_frame_record_cache.add(self.raw_frame_index, raw_frame_record)
+        self.raw_frame_index = self.raw_frame_index + 1
+        return raw_frame_record
+
+    def generateAnalyzerFrame(self, frame_data_MOSI, frame_data_MISO, start_frame_label_time, end_frame_label_time):
+
+            raw_frame_record = self.getRawFrameRecord(frame_data_MOSI, frame_data_MISO)
+            length_err_msg, miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = self.decoder.load_raw_frame_record(raw_frame_record)
+            self.decoder.update_device_context(length_err_msg, miso_crc_group, mosi_crc_group)
+            threshold_violations = self.decoder.evaluate_thresholds(miso_crc_group, mosi_crc_group)
+            crc_error_candidates = self.getCrcErrorCandidates(raw_frame_record, miso_crc_group, mosi_crc_group)
+            if self.sample_publisher != None:
+                self.publishSamples(raw_frame_record, start_frame_label_time)
+            if self.decoder.is_frame_decimated(length_err_msg, miso_crc_group, mosi_crc_group, start_frame_label_time):
+                self.submitFrameRecord((start_frame_label_time, end_frame_label_time, raw_frame_record, length_err_msg, None, None))
+                self.counter = self.counter + 1
+                return None
+            detail_level = self.detail_level
+            if length_err_msg != "" or miso_crc_group.crc_status != lbr.CRC_OK_TOKEN or mosi_crc_group.crc_status != lbr.CRC_OK_TOKEN:
+                # Frames with length or crc errors are always decoded with full detail, the same way as they are never decimated
+                detail_level = tmag5170_load_shedding.DETAIL_FULL
+            if detail_level == tmag5170_load_shedding.DETAIL_COUNTED:
+                # Frame is only counted in statistics, the same way as decimated frame
+                self.submitFrameRecord((start_frame_label_time, end_frame_label_time, raw_frame_record, length_err_msg, None, None))
+                self.counter = self.counter + 1
+                return None
+
+            if detail_level == tmag5170_load_shedding.DETAIL_CRC_ADDRESS:
+                AnalyzerFrameType = 'tmag5170_crc_address'
+                AnalyzerFrameDictionary = {
+                    'length_err_msg':length_err_msg,
+                    'register_address':self.decoder.get_register_index_from_tmag5170_frame(self.decoder.mosi_value),
+                    'crc_mosi_correct':mosi_crc_group.crc_status,
+                    'crc_miso_correct':miso_crc_group.crc_status,
+                    'FrameCnt_debug':self.counter,
+                }
+                register_fields = {}
+            elif self.compact_display or detail_level == tmag5170_load_shedding.DETAIL_NUMERIC:
+                AnalyzerFrameType, AnalyzerFrameDictionary = self.generateCompactFrameDictionary(length_err_msg, miso_crc_group, mosi_crc_group, threshold_violations)
+                register_fields = {}
+            elif self.DATA_TYPE == self.DATA_TYPE_0h:
+                mosi_frame, miso_frame = self.decoder.get_mosi_miso_str()
                 address_8bit_register_16bit_group, stat_8_bit_group = self.decoder.get_register_16_bit_address_stat_8_bit_group()
                 read_write = address_8bit_register_16bit_group.read_write
                 register_name = address_8bit_register_16bit_group.register_name
+                register_fields = address_8bit_register_16bit_group.register_fields
 
                 AnalyzerFrameType = 'tmag5170_regular'
                 AnalyzerFrameDictionary = {\
@@ -171,12 +442,16 @@ class Hla(HighLevelAnalyzer):
                         'cmd1':lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd1),                                                \
                         'cmd0':lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd0),                                                \
                         'FrameCnt_debug':self.counter,                                                                          \
+                        'device_tag':self.device_context.device_tag,                                                            \
+                        'threshold_violations':lbr.tmag5170_threshold_evaluator.get_threshold_violations_str(threshold_violations), \
                 }
                 
             else:
+                mosi_frame, miso_frame = self.decoder.get_mosi_miso_str()
                 data_24_bit_group = self.decoder.get_24_bit_data_group()
                 read_write = data_24_bit_group.read_write
                 register_name = data_24_bit_group.register_name
+                register_fields = data_24_bit_group.register_fields
 
                 AnalyzerFrameType = 'tmag5170_special'
                 AnalyzerFrameDictionary = {\
@@ -205,16 +480,193 @@ class Hla(HighLevelAnalyzer):
                         'cmd1':lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd1),                                                \
                         'cmd0':lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd0),                                                \
                         'FrameCnt_debug':self.counter,                                                                          \
+                        'device_tag':self.device_context.device_tag,                                                            \
+                        'threshold_violations':lbr.tmag5170_threshold_evaluator.get_threshold_violations_str(threshold_violations), \
                 }
-            retVal = AnalyzerFrame(AnalyzerFrameType, self.start_frame_label_time, self.end_frame_label_time, AnalyzerFrameDictionary)
-            print(f"FrameCnt_debug: {self.counter: >6}, mosi_f: {mosi_frame: >10}, crc_mosi: {mosi_crc_group.crc_status: >{len(lbr.CRC_ERROR_TOKEN)}}, miso_f: {miso_frame: >10}, crc_miso: {miso_crc_group.crc_status: >{len(lbr.CRC_ERROR_TOKEN)}}, read_write: {read_write: >6}, reg name:{register_name}")
+            if crc_error_candidates != "":
+                AnalyzerFrameDictionary['crc_error_candidates'] = crc_error_candidates
+            # Numeric register fields are separate data table columns, so scripts do not have to parse register_decoding
+            for field_name, field in register_fields.items():
+                AnalyzerFrameDictionary[field_name] = field.value
+            if self.memory_accounting != None:
+                self.memory_accounting.add_frame_dictionary(AnalyzerFrameType, AnalyzerFrameDictionary)
+            retVal = AnalyzerFrame(AnalyzerFrameType, start_frame_label_time, end_frame_label_time, AnalyzerFrameDictionary)
+            self.submitFrameRecord((start_frame_label_time, end_frame_label_time, raw_frame_record, length_err_msg, AnalyzerFrameType, AnalyzerFrameDictionary))
             self.counter = self.counter + 1
-            self.end_frame_label_time = None
-            self.start_frame_label_time = None
-            self.frame_data_MISO = bytearray(b'')
-            self.frame_data_MOSI = bytearray(b'')
             return retVal
 
+    def publishSamples(self, raw_frame_record, start_frame_label_time):
+        '''
+        Samples of every measurement frame (decimated too) go to shared memory, timestamps are seconds from first frame.
+        '''
+        if start_frame_label_time == None:
+            return
+        if self.sample_time_origin == None:
+            self.sample_time_origin = start_frame_label_time
+        self.sample_publisher.publish_raw_frame_record(tmag5170_statistics.time_difference(start_frame_label_time, self.sample_time_origin), raw_frame_record)
+
+    def getCrcErrorCandidates(self, raw_frame_record, miso_crc_group, mosi_crc_group):
+        '''
+        Single bit error candidates (corrected word and register value) of lines with crc error, counted in crc_error_statistics.
+        '''
+        candidate_strings = []
+        if mosi_crc_group.crc_status == lbr.CRC_ERROR_TOKEN:
+            candidates = self.crc_error_statistics.add_error(tmag5170_crc_correction.MOSI_LINE_TOKEN, raw_frame_record.mosi_value, raw_frame_record.mosi_crc_calculated)
+            candidate_strings.append(tmag5170_crc_correction.get_candidates_str(tmag5170_crc_correction.MOSI_LINE_TOKEN, candidates, self.decoder.get_register_acronym))
+        if miso_crc_group.crc_status == lbr.CRC_ERROR_TOKEN:
+            candidates = self.crc_error_statistics.add_error(tmag5170_crc_correction.MISO_LINE_TOKEN, raw_frame_record.miso_value, raw_frame_record.miso_crc_calculated)
+            candidate_strings.append(tmag5170_crc_correction.get_candidates_str(tmag5170_crc_correction.MISO_LINE_TOKEN, candidates))
+        return " | ".join(candidate_strings)
+
+    def generateCompactFrameDictionary(self, length_err_msg, miso_crc_group, mosi_crc_group, threshold_violations):
+        '''
+        Minimal payload of compact display mode: numbers instead of hex strings, no per bit fields and no register decoding.
+        12-bit channels are SI values (float) from streaming extractor.
+        '''
+        mosi_value = self.decoder.mosi_value
+        miso_value = self.decoder.miso_value
+        AnalyzerFrameDictionary = {
+            'length_err_msg':length_err_msg,
+            'crc_mosi_correct':mosi_crc_group.crc_status,
+            'crc_miso_correct':miso_crc_group.crc_status,
+            'FrameCnt_debug':self.counter,
+        }
+        if mosi_value != None:
+            is_read = lbr.get_bit(mosi_value, lbr.READ_WRITE_BIT_POSITION) == 1
+            AnalyzerFrameDictionary['read_write'] = lbr.READ_REGISTER_TOKEN if is_read else lbr.WRITE_REGISTER_TOKEN
+            # In 12-bit data access reads carry channel data instead of register content
+            if not is_read or self.streaming_extractor == None:
+                AnalyzerFrameDictionary['register_name'] = self.decoder.get_register_acronym(self.decoder.get_register_index_from_tmag5170_frame(mosi_value))
+                if not is_read:
+                    AnalyzerFrameDictionary['register_value'] = lbr.tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(mosi_value)
+                elif miso_value != None:
+                    AnalyzerFrameDictionary['register_value'] = lbr.tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(miso_value)
+        if self.streaming_extractor != None and miso_value != None:
+            AnalyzerFrameDictionary['ch1'], AnalyzerFrameDictionary['ch2'] = self.streaming_extractor.extract(miso_value)
+        if len(threshold_violations) != 0:
+            AnalyzerFrameDictionary['threshold_violations'] = lbr.tmag5170_threshold_evaluator.get_threshold_violations_str(threshold_violations)
+        if self.streaming_extractor != None:
+            return 'tmag5170_compact_special', AnalyzerFrameDictionary
+        return 'tmag5170_compact', AnalyzerFrameDictionary
+
+    def submitFrameRecord(self, frame_record):
+        # Statistics are read by timing summary on decode thread, so they are updated here and not in background worker
+        self.updateFrameStatistics(frame_record)
+        if self.background_worker != None:
+            self.background_worker.put(frame_record)
+        else:
+            self.frame_record_handler(frame_record)
+
+    def updateFrameStatistics(self, frame_record):
+        '''
+        Bus timing and conversion latency statistics of single frame, always called on decode thread.
+        '''
+        start_frame_label_time, end_frame_label_time, raw_frame_record, length_err_msg, AnalyzerFrameType, AnalyzerFrameDictionary = frame_record
+        mosi_value = raw_frame_record.mosi_value
+        if length_err_msg == "":
+            # Conversion events are taken from frames with correct crc only, corrupted CMD0 or RDY would give wrong latency
+            if raw_frame_record.mosi_crc_calculated == mosi_value & 0x0F and raw_frame_record.miso_crc_calculated == raw_frame_record.miso_value & 0x0F:
+                self.conversion_latency_statistics.add_frame(start_frame_label_time, end_frame_label_time, mosi_value, raw_frame_record.miso_value)
+            self.timing_statistics.add_frame(start_frame_label_time, end_frame_label_time,
+                                             self.decoder.get_register_acronym(self.decoder.get_register_index_from_tmag5170_frame(mosi_value)),
+                                             lbr.get_bit(mosi_value, lbr.READ_WRITE_BIT_POSITION) == 1)
+        else:
+            self.timing_statistics.add_frame(start_frame_label_time, end_frame_label_time)
+
+    def generateBurstAnalyzerFrames(self):
+        '''
+        Decode whole chip select transaction in one pass, every 4 bytes are separate tmag5170 frame.
+        Frame times are taken from SPI byte timestamps, trailing bytes are reported as frame with length error.
+        '''
+        retVal = []
+        for burst_frame in lbr.split_burst_into_frames(self.frame_data_MOSI, self.frame_data_MISO):
+            start_frame_label_time = self.byte_start_times[burst_frame.first_byte_index]
+            end_frame_label_time = self.byte_end_times[burst_frame.last_byte_index]
+            analyzerFrame = self.generateAnalyzerFrame(burst_frame.mosi_raw_data, burst_frame.miso_raw_data, start_frame_label_time, end_frame_label_time)
+            if analyzerFrame != None:
+                retVal.append(analyzerFrame)
+        return retVal
+
+    def generateTimingSummaryFrame(self):
+        summary = self.timing_statistics.get_summary()
+        summary_str = tmag5170_statistics.tmag5170_bus_timing_statistics.get_summary_str(summary)
+        print(f"Timing summary: {summary_str}")
+        crc_error_summary = self.crc_error_statistics.get_summary()
+        if any(line_summary['errors'] != 0 for line_summary in crc_error_summary.values()):
+            print(f"CRC error bit positions: {tmag5170_crc_correction.tmag5170_crc_error_statistics.get_summary_str(crc_error_summary)}")
+        conversion_latency_summary = self.conversion_latency_statistics.get_summary()
+        conversion_latency_str = tmag5170_statistics.tmag5170_conversion_latency_statistics.get_summary_str(conversion_latency_summary)
+        print(f"Conversion latency: {conversion_latency_str}")
+        AnalyzerFrameDictionary = {
+            'timing_summary':summary_str,
+            'frame_count':summary['frame_count'],
+            'frame_rate_hz':summary['frame_rate_hz'],
+            'conversion_latency':conversion_latency_str,
+            'conversion_count':conversion_latency_summary['conversion_count'],
+            'FrameCnt_debug':self.counter,
+        }
+        if self.memory_accounting != None:
+            self.memory_accounting.add_frame_dictionary('tmag5170_timing_summary', AnalyzerFrameDictionary)
+            print(f"Memory report: {tmag5170_memory.tmag5170_memory_accounting.get_report_str(self.getMemoryReport())}")
+        return AnalyzerFrame('tmag5170_timing_summary', self.timing_statistics.last_frame_start_time, self.timing_statistics.last_frame_end_time, AnalyzerFrameDictionary)
+
+    def getMemoryReport(self):
+        '''
+        Memory accounting report on demand, None when Memory_accounting is disabled.
+        Cache sizes are computed by walking the caches, so it is not meant to be called for every frame.
+        '''
+        if self.memory_accounting == None:
+            return None
+        if self.background_worker != None:
+            self.memory_accounting.update_buffer_high_water_mark('background_worker_queue', self.background_worker.queue_high_water_mark)
+        raw_frame_record_cache_size = (0, 0)
+        if self.raw_frame_record_cache != None:
+            raw_frame_record_cache_size = (len(self.raw_frame_record_cache), tmag5170_memory.get_object_size(self.raw_frame_record_cache.raw_frame_records))
+        return self.memory_accounting.get_report({
+            'raw_frame_record_cache': raw_frame_record_cache_size,
+            'register_shadow': (len(self.device_context.register_shadow), tmag5170_memory.get_object_size(self.device_context.register_shadow)),
+        })
+
+    def updateDetailLevel(self, decode_seconds, frame_count, frame_time):
+        '''
+        Account decode time of frames of last transaction, returns load shedding marker frame when detail level changed, None otherwise.
+        '''
+        level_change = self.load_shedder.add_frames(frame_time, decode_seconds, frame_count)
+        if level_change == None:
+            return None
+        self.detail_level = level_change.level
+        level_change_str = tmag5170_load_shedding.tmag5170_load_shedder.get_level_change_str(level_change, self.load_shedder.budget)
+        print(f"Load shedding: {level_change_str}")
+        AnalyzerFrameDictionary = {
+            'load_shedding':level_change_str,
+            'detail_level':tmag5170_load_shedding.detail_level_names[level_change.level],
+            'previous_detail_level':tmag5170_load_shedding.detail_level_names[level_change.previous_level],
+            'load':level_change.load,
+            'degraded_frame_count':level_change.degraded_frame_count,
+            'FrameCnt_debug':self.counter,
+        }
+        return AnalyzerFrame('tmag5170_load_shedding', frame_time, frame_time, AnalyzerFrameDictionary)
+
+    @staticmethod
+    def appendAnalyzerFrame(retVal, analyzerFrame):
+        if retVal == None:
+            return analyzerFrame
+        if isinstance(retVal, list):
+            retVal.append(analyzerFrame)
+            return retVal
+        return [retVal, analyzerFrame]
+
+    def clearFrameBuffers(self):
+        if self.memory_accounting != None:
+            self.memory_accounting.update_buffer_high_water_mark('frame_data_bytes', len(self.frame_data_MOSI))
+        # Buffers are reused between transactions
+        del self.frame_data_MISO[:]
+        del self.frame_data_MOSI[:]
+        self.byte_start_times.clear()
+        self.byte_end_times.clear()
+        self.end_frame_label_time = None
+        self.start_frame_label_time = None
+
     def decode(self, frame: AnalyzerFrame):
         '''
         Process a frame from the input analyzer, and optionally return a single `AnalyzerFrame` or a list of `AnalyzerFrame`s.
@@ -229,18 +681,29 @@ class Hla(HighLevelAnalyzer):
 
         if(frame.type == "disable"):
             self.end_frame_label_time = frame.start_time
-            retVal = self.generateAnalyzerFrame()
+            if self.load_shedder != None:
+                decode_start = time.perf_counter()
+                first_frame_counter = self.counter
+            if self.Frame_length_verification == self.FRAME_LENGTH_VERIF_DISABLED and len(self.byte_start_times) > 0:
+                retVal = self.generateBurstAnalyzerFrames()
+            else:
+                retVal = self.generateAnalyzerFrame(self.frame_data_MOSI, self.frame_data_MISO, self.start_frame_label_time, self.end_frame_label_time)
+            if self.load_shedder != None:
+                marker_frame = self.updateDetailLevel(time.perf_counter() - decode_start, self.counter - first_frame_counter, self.end_frame_label_time)
+                if marker_frame != None:
+                    retVal = self.appendAnalyzerFrame(retVal, marker_frame)
+            self.clearFrameBuffers()
+            if self.timing_summary_period > 0 and self.counter >= self.next_timing_summary_counter:
+                while self.next_timing_summary_counter <= self.counter:
+                    self.next_timing_summary_counter = self.next_timing_summary_counter + self.timing_summary_period
+                retVal = self.appendAnalyzerFrame(retVal, self.generateTimingSummaryFrame())
 
 
         if(frame.type == "result"):
-            if self.Frame_length_verification == self.FRAME_LENGTH_VERIF_DISABLED:
-                if (len(self.frame_data_MISO) == lbr.TMAG5170_SINGLE_FRAME_BYTE_SIZE) or (len(self.frame_data_MOSI) == lbr.TMAG5170_SINGLE_FRAME_BYTE_SIZE):
-                    self.end_frame_label_time = frame.start_time
-                    retVal = self.generateAnalyzerFrame()
-                    self.start_frame_label_time = frame.start_time
-
             self.frame_data_MISO += frame.data['miso']
             self.frame_data_MOSI += frame.data['mosi']
+            self.byte_start_times.append(frame.start_time)
+            self.byte_end_times.append(frame.end_time)
 
         # Return the data frame itself
         return retVal
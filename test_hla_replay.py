@@ -0,0 +1,206 @@
+import os
+import contextlib
+import gc
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import hla_replay
+import main_tmag5170_spi_decoder
+import tmag5170_capture
+import tmag5170_shared_memory
+from main_tmag5170_spi_decoder import Hla
+
+
+class TestHlaReplay(unittest.TestCase):
+    def setUp(self):
+        self.mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(20)
+
+    def replay(self, settings_values = None, frames_per_transaction = 1):
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values, frames_per_transaction = frames_per_transaction)
+        return hla_replay.replay(hla_replay.create_hla(settings_values), hla_replay.convert_to_analyzer_frames(spi_frames))
+
+    def test_single_frame_transactions(self):
+        latencies, output_frames = self.replay()
+        self.assertEqual(len(latencies), 20 * 6)
+        self.assertEqual(len(output_frames), 20)
+        self.assertEqual(output_frames[0].data['register_name'], "X_THRX_CONFIG")
+        self.assertEqual(output_frames[1].data['register_name'], "X_CH_RESULT")
+        self.assertEqual([frame.data['FrameCnt_debug'] for frame in output_frames], list(range(20)))
+        self.assertTrue(all(frame.data['crc_miso_correct'] == "CRC_OK" for frame in output_frames))
+        self.assertEqual((output_frames[0].data['X_HI_THRESHOLD'], output_frames[0].data['X_LO_THRESHOLD']), (10, -10))
+        self.assertIsInstance(output_frames[1].data['X_CH_RESULT'], int)
+
+    def test_burst_transactions(self):
+        self.mosi_miso_values = self.mosi_miso_values[:3]
+        latencies, output_frames = self.replay({'Frame_length_verification': Hla.FRAME_LENGTH_VERIF_DISABLED}, frames_per_transaction = 3)
+        self.assertEqual([frame.data['register_name'] for frame in output_frames], ["X_THRX_CONFIG", "X_CH_RESULT", "Y_CH_RESULT"])
+        self.assertAlmostEqual(output_frames[1].start_time, 5e-6)
+        self.assertAlmostEqual(output_frames[1].end_time, 8.8e-6)
+
+    def test_background_worker(self):
+        hla = hla_replay.create_hla({'Background_worker': Hla.BACKGROUND_WORKER_BLOCK})
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values)
+        latencies, output_frames = hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(spi_frames))
+        self.assertEqual(len(output_frames), 20)
+        self.assertEqual(hla.background_worker.processed_count, 20)
+        self.assertEqual(hla.timing_statistics.frame_duration.count, 20)
+
+    def test_timing_summary_with_background_worker(self):
+        hla = hla_replay.create_hla({'Background_worker': Hla.BACKGROUND_WORKER_BLOCK, 'Timing_summary_period': 5})
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values)
+        latencies, output_frames = hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(spi_frames))
+        summary_frames = [frame for frame in output_frames if frame.type == 'tmag5170_timing_summary']
+        # Statistics are updated on decode thread, summary does not depend on progress of worker
+        self.assertEqual([frame.data['frame_count'] for frame in summary_frames], [5, 10, 15, 20])
+        self.assertTrue(all(frame.start_time != None and frame.end_time != None for frame in summary_frames))
+
+    def test_reinstantiation_releases_export_sink_and_worker(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "export.csv")
+            settings_values = {'Export_file_path': file_path, 'Export_fields': "FrameCnt_debug", 'Background_worker': Hla.BACKGROUND_WORKER_BLOCK}
+            previous_hla = hla_replay.create_hla(settings_values)
+            hla_replay.replay(previous_hla, hla_replay.convert_to_analyzer_frames(tmag5170_capture.generate_spi_frames(self.mosi_miso_values)))
+            previous_worker = previous_hla.background_worker
+            # Logic 2 creates new Hla when settings change, previous one may still be referenced
+            hla = hla_replay.create_hla(settings_values)
+            self.assertFalse(previous_worker.thread.is_alive())
+            self.assertEqual(previous_hla.export_sink.file, None)
+            hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(tmag5170_capture.generate_spi_frames(self.mosi_miso_values[:5])))
+            main_tmag5170_spi_decoder.export_file_releasers.pop(file_path)()
+            self.assertFalse(hla.background_worker.thread.is_alive())
+            with open(file_path, encoding = 'utf-8') as file:
+                self.assertEqual(file.read().split(), ["FrameCnt_debug", "0", "1", "2", "3", "4"])
+
+    def test_dropped_hla_exports_queued_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "export.csv")
+            hla = hla_replay.create_hla({'Export_file_path': file_path, 'Export_fields': "FrameCnt_debug", 'Background_worker': Hla.BACKGROUND_WORKER_BLOCK})
+            export_sink = hla.export_sink
+            frame_record_handler = hla.frame_record_handler
+            background_worker = hla.background_worker
+            write = export_sink.write
+            def slow_write(*args):
+                time.sleep(0.001)
+                write(*args)
+            export_sink.write = slow_write
+            self.mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(200)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                for analyzer_frame in hla_replay.convert_to_analyzer_frames(tmag5170_capture.generate_spi_frames(self.mosi_miso_values)):
+                    hla.decode(analyzer_frame)
+                # Hla is dropped while worker still exports queued records
+                self.assertGreater(len(background_worker.queue), 0)
+                del hla
+                gc.collect()
+                background_worker.thread.join(10)
+            self.assertFalse(background_worker.thread.is_alive())
+            self.assertEqual(export_sink.file, None)
+            self.assertEqual(sum(frame_record_handler.frame_type_counts.values()), 200)
+            with open(file_path, encoding = 'utf-8') as file:
+                self.assertEqual(file.read().split(), ["FrameCnt_debug"] + [str(counter) for counter in range(200)])
+            main_tmag5170_spi_decoder.export_file_releasers.pop(file_path, None)
+
+    def test_reinstantiated_hla_reuses_raw_frame_records(self):
+        analyzer_frames = hla_replay.convert_to_analyzer_frames(tmag5170_capture.generate_spi_frames(self.mosi_miso_values))
+        latencies, output_frames = hla_replay.replay(hla_replay.create_hla(), analyzer_frames)
+        # Logic 2 runs new Hla on the same capture after range change, only presentation phase is repeated
+        hla = hla_replay.create_hla({'X_RANGE': Hla.A2_150MT})
+        decoded_frames = []
+        decode_raw_frame = hla.decoder.decode_raw_frame
+        def counted_decode_raw_frame(frame_data_MOSI, frame_data_MISO):
+            decoded_frames.append(frame_data_MOSI)
+            return decode_raw_frame(frame_data_MOSI, frame_data_MISO)
+        hla.decoder.decode_raw_frame = counted_decode_raw_frame
+        latencies, reused_output_frames = hla_replay.replay(hla, analyzer_frames)
+        self.assertEqual(decoded_frames, [])
+        self.assertEqual([frame.data['crc_miso_correct'] for frame in reused_output_frames], [frame.data['crc_miso_correct'] for frame in output_frames])
+        self.assertEqual(reused_output_frames[1].data['X_CH_RESULT_mT'], 37 * 300 / 65536)
+        # Capture with the same first frame but other data further is decoded again from the first differing frame
+        self.mosi_miso_values[5] = (self.mosi_miso_values[5][0], self.mosi_miso_values[5][1] ^ (1 << 18))
+        hla = hla_replay.create_hla()
+        hla.decoder.decode_raw_frame = counted_decode_raw_frame
+        latencies, output_frames = hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(tmag5170_capture.generate_spi_frames(self.mosi_miso_values)))
+        self.assertEqual(len(decoded_frames), 15)
+        self.assertEqual(output_frames[5].data['crc_miso_correct'], "CRC_ERROR")
+        self.assertEqual(len(hla.raw_frame_record_cache), 20)
+
+    def test_crc_error_candidates(self):
+        self.mosi_miso_values[1] = (self.mosi_miso_values[1][0], self.mosi_miso_values[1][1] ^ (1 << 18))
+        hla = hla_replay.create_hla()
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values)
+        latencies, output_frames = hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(spi_frames))
+        self.assertEqual(output_frames[1].data['crc_error_candidates'], f"miso bit 18: 0x{self.mosi_miso_values[1][1] ^ (1 << 18):08X} 0x0025")
+        self.assertNotIn('crc_error_candidates', output_frames[2].data)
+        self.assertEqual(hla.crc_error_statistics.get_bit_position_histogram('miso'), {18: 1})
+
+    def test_shared_memory_samples(self):
+        name = f"tmag5170_test_{os.getpid()}_hla"
+        hla = hla_replay.create_hla({'Shared_memory_name': name, 'X_RANGE': Hla.A2_150MT})
+        reader = tmag5170_shared_memory.tmag5170_shared_memory_reader(name)
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values)
+        hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(spi_frames))
+        records = reader.read()
+        reader.close()
+        main_tmag5170_spi_decoder.shared_memory_writers.pop(name).close()
+        # 19 reads of X/Y/Z/TEMP_RESULT and CONV_STATUS, 3 of them are CONV_STATUS
+        self.assertEqual(len(records), 16)
+        self.assertEqual((tmag5170_shared_memory.channel_name_mapping[records[0].channel_id], records[0].raw_value), ("X", 37))
+        self.assertAlmostEqual(records[0].timestamp, 20e-6)
+        self.assertAlmostEqual(records[0].value, 37 * 300 / 65536)
+
+    def test_load_shedding(self):
+        self.mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(40)
+        hla = hla_replay.create_hla({'Load_shedding_budget': 1e-9})
+        hla.load_shedder.window_frame_count = 4
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values)
+        latencies, output_frames = hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(spi_frames))
+        frame_types = [frame.type for frame in output_frames]
+        self.assertEqual(frame_types[:3], ['tmag5170_regular'] * 3)
+        self.assertEqual(frame_types[4:6], ['tmag5170_load_shedding', 'tmag5170_compact'])
+        self.assertEqual(output_frames[4].data['detail_level'], "numeric")
+        self.assertIn('tmag5170_crc_address', frame_types)
+        self.assertEqual(output_frames[-1].data['detail_level'], "counted")
+        self.assertEqual(frame_types.count('tmag5170_load_shedding'), 3)
+        # Counted frames are not emitted, but they are numbered and counted in statistics
+        self.assertEqual(hla.counter, 40)
+        self.assertEqual(hla.timing_statistics.frame_duration.count, 40)
+
+    def test_load_shedding_keeps_error_frames_at_full_detail(self):
+        self.mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(40)
+        for index in (6, 30):
+            self.mosi_miso_values[index] = (self.mosi_miso_values[index][0], self.mosi_miso_values[index][1] ^ (1 << 18))
+        hla = hla_replay.create_hla({'Load_shedding_budget': 1e-9})
+        hla.load_shedder.window_frame_count = 4
+        spi_frames = tmag5170_capture.generate_spi_frames(self.mosi_miso_values)
+        latencies, output_frames = hla_replay.replay(hla, hla_replay.convert_to_analyzer_frames(spi_frames))
+        # Frame 30 is sent at counted level, frame 6 at numeric level
+        self.assertEqual(output_frames[-2].data['detail_level'], "counted")
+        error_frames = [frame for frame in output_frames if frame.data.get('crc_miso_correct') == "CRC_ERROR"]
+        self.assertEqual([frame.data['FrameCnt_debug'] for frame in error_frames], [6, 30])
+        self.assertEqual([frame.type for frame in error_frames], ['tmag5170_regular'] * 2)
+        self.assertIn('crc_error_candidates', error_frames[1].data)
+
+    def test_compact_display(self):
+        latencies, output_frames = self.replay({'Display_mode': Hla.DISPLAY_MODE_COMPACT})
+        self.assertEqual(output_frames[0].type, 'tmag5170_compact')
+        self.assertEqual(output_frames[0].data, {'length_err_msg': "", 'crc_mosi_correct': "CRC_OK", 'crc_miso_correct': "CRC_OK", 'FrameCnt_debug': 0,
+                                                 'read_write': "write", 'register_name': "X_THRX_CONFIG", 'register_value': 0x0AF6})
+        self.assertEqual((output_frames[1].data['register_name'], output_frames[1].data['register_value']), ("X_CH_RESULT", 37))
+
+        latencies, output_frames = self.replay({'Display_mode': Hla.DISPLAY_MODE_COMPACT, 'DATA_TYPE': Hla.DATA_TYPE_4h, 'X_RANGE': Hla.A2_150MT})
+        self.assertEqual(output_frames[1].type, 'tmag5170_compact_special')
+        self.assertNotIn('register_name', output_frames[1].data)
+        self.assertIsInstance(output_frames[1].data['ch1'], float)
+        self.assertIsInstance(output_frames[1].data['ch2'], float)
+
+    def test_report_for_every_settings_combination(self):
+        combinations = list(hla_replay.get_settings_combinations(('DATA_TYPE', 'X_RANGE')))
+        self.assertEqual(len(combinations), 8 * 7)
+        report = hla_replay.get_replay_report(*self.replay(combinations[-1]))
+        self.assertEqual(report['output_frames'], 20)
+        self.assertLessEqual(report['p50_us'], report['p99_us'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,14 @@
+import concurrent.futures
 import unittest
 
-from tmag5170 import tmga5170_frame_decoder
+from tmag5170 import tmga5170_frame_decoder, tmag5170_device_context, tmag5170_bus_decoder, split_burst_into_frames, tmag5170_threshold_evaluator, tmag5170_streaming_extractor, LENGTH_ERROR_TOKEN
+from tmag5170 import decode, tmag5170_decoder_config
+
+
+def build_tmag5170_frame(value: int) -> bytes:
+    frame = value & 0xFFFFFFF0
+    frame = frame | tmga5170_frame_decoder.calculate_tmag5170_crc(frame).crc_calculated
+    return frame.to_bytes(4, 'big')
 
 
 
@@ -121,6 +129,249 @@ class TestDecoder(unittest.TestCase):
         result = self.decoder.get_temperature_str(None)
         self.assertEqual(result, "")
 
+    def test_register_mapping_shared_between_instances(self):
+        other_decoder = tmga5170_frame_decoder(Br_X_axis_enum = tmga5170_frame_decoder.Br_range.TMAG5170A2_150mT_0h)
+        self.assertIs(self.decoder._tmga5170_frame_decoder__Tmag5170_register_mapping, other_decoder._tmga5170_frame_decoder__Tmag5170_register_mapping)
+        self.assertEqual(self.decoder.get_register_decoded_description(0x09, 0x00006400), "[15-0] X_CH_RESULT: 100 ")
+        self.assertEqual(other_decoder.get_register_decoded_description(0x09, 0x00006400), "[15-0] X_CH_RESULT: 100 [0.46 mT]")
+
+    def test_bus_decoder_routes_frames_to_device_contexts(self):
+        device_a = tmag5170_device_context(device_tag = "cs0", Br_X_axis_enum = tmga5170_frame_decoder.Br_range.TMAG5170A2_150mT_0h)
+        device_b = tmag5170_device_context(device_tag = "cs1", Br_X_axis_enum = tmga5170_frame_decoder.Br_range.TMAG5170A1_50mT_0h)
+        bus_decoder = tmag5170_bus_decoder((device_a, device_b))
+
+        length_err_msg, decoder = bus_decoder.set_mosi_miso_raw_data("cs0", build_tmag5170_frame(0x89000000), build_tmag5170_frame(0x00006400))
+        self.assertEqual(length_err_msg, "")
+        self.assertEqual(decoder.get_address_8bit_register_16bit_group().register_decoding, "[15-0] X_CH_RESULT: 100 [0.46 mT]")
+
+        length_err_msg, decoder = bus_decoder.set_mosi_miso_raw_data("cs1", build_tmag5170_frame(0x89000000), build_tmag5170_frame(0x00006400))
+        self.assertEqual(decoder.get_address_8bit_register_16bit_group().register_decoding, "[15-0] X_CH_RESULT: 100 [0.15 mT]")
+
+        bus_decoder.set_mosi_miso_raw_data("cs1", build_tmag5170_frame(0x04123400), build_tmag5170_frame(0x00000000))
+        bus_decoder.set_mosi_miso_raw_data("cs1", build_tmag5170_frame(0x04123400), b'\x00')
+        bus_decoder.set_mosi_miso_raw_data("cs1", bytes(4), bytes(4))
+        self.assertEqual(device_a.frame_count, 1)
+        self.assertEqual(device_a.register_shadow, {0x09: 0x0064})
+        self.assertEqual(device_b.frame_count, 4)
+        self.assertEqual(device_b.register_shadow, {0x09: 0x0064, 0x04: 0x1234})
+        self.assertEqual(device_b.length_error_count, 1)
+        self.assertEqual(device_b.crc_error_count, 1)
+
+    def test_split_burst_into_frames(self):
+        mosi = bytearray(build_tmag5170_frame(0x89000000) + build_tmag5170_frame(0x8A000000) + b'\x8B\x00')
+        miso = bytearray(build_tmag5170_frame(0x00006400) + build_tmag5170_frame(0x00006500) + b'\x00\x00')
+        frames = split_burst_into_frames(mosi, miso)
+        self.assertEqual([(frame.first_byte_index, frame.last_byte_index) for frame in frames], [(0, 3), (4, 7), (8, 9)])
+
+        self.assertEqual(self.decoder.set_mosi_miso_raw_data(frames[1].mosi_raw_data, frames[1].miso_raw_data), "")
+        self.assertEqual(self.decoder.get_address_8bit_register_16bit_group().register_name, "Y_CH_RESULT")
+        self.assertEqual(self.decoder.set_mosi_miso_raw_data(frames[2].mosi_raw_data, frames[2].miso_raw_data), LENGTH_ERROR_TOKEN)
+        self.assertEqual(split_burst_into_frames(bytearray(), bytearray()), [])
+
+    def decode_frame(self, mosi_value, miso_value):
+        self.decoder.set_mosi_miso_raw_data(build_tmag5170_frame(mosi_value), build_tmag5170_frame(miso_value))
+        miso_crc_group, mosi_crc_group, _ = self.decoder.get_4_bit_crc_cmd_stat_group()
+        return self.decoder.evaluate_thresholds(miso_crc_group, mosi_crc_group)
+
+    def test_evaluate_thresholds_32bit_access(self):
+        self.assertEqual(self.decode_frame(0x89000000, 0x007FFF00), ())
+        self.decode_frame(0x040AF600, 0x00000000)
+        self.decode_frame(0x07673200, 0x00000000)
+        self.assertEqual(self.decode_frame(0x89000000, 0x000A0000), ())
+        self.assertEqual(self.decode_frame(0x89000000, 0x000B0000), (tmag5170_threshold_evaluator.threshold_violation_type("X", "HI", 0x0B00, 0x0A00),))
+        self.assertEqual(self.decode_frame(0x89000000, 0x00F50000)[0].direction, "LO")
+        self.assertEqual(self.decode_frame(0x8A000000, 0x00F50000), ())
+        violations = self.decode_frame(0x8C000000, 0x00FFFF00)
+        self.assertEqual(violations[0].channel, "T")
+        self.assertAlmostEqual(violations[0].limit, 172, delta = 0.0001)
+        self.assertEqual(tmag5170_threshold_evaluator.get_threshold_violations_str(violations), "T HI: 825.217 (limit 172)")
+        evaluator = self.decoder.device_context.threshold_evaluator
+        self.assertEqual(evaluator.violation_counts[("X", "HI")], 1)
+        self.assertEqual(evaluator.violation_counts[("X", "LO")], 1)
+        self.assertEqual(evaluator.violation_counts[("T", "HI")], 1)
+
+    def test_evaluate_thresholds_12bit_access(self):
+        self.decoder.data_type = tmga5170_frame_decoder.DataType.magnetic_field_temperature_ZT
+        self.decode_frame(0x060AF600, 0x00000000)
+        # ch1 (Z) = 0x0B0 -> 0x0B00 in 16-bit scale, ch2 (T) = 0x440 -> 17 Celsius
+        self.assertEqual(self.decode_frame(0x80000000, 0x440B0000), (tmag5170_threshold_evaluator.threshold_violation_type("Z", "HI", 0x0B00, 0x0A00),))
+
+    def is_frame_decimated(self, mosi_value, miso_value, frame_time = None):
+        length_err_msg = self.decoder.set_mosi_miso_raw_data(build_tmag5170_frame(mosi_value), build_tmag5170_frame(miso_value))
+        miso_crc_group, mosi_crc_group, _ = self.decoder.get_4_bit_crc_cmd_stat_group()
+        return self.decoder.is_frame_decimated(length_err_msg, miso_crc_group, mosi_crc_group, frame_time)
+
+    def test_is_frame_decimated_every_nth_frame(self):
+        self.decoder.decimation_factor = 3
+        self.assertEqual([self.is_frame_decimated(0x89000000, 0x00006400) for _ in range(6)], [False, True, True, False, True, True])
+        self.assertFalse(self.is_frame_decimated(0x81000000, 0x00006400))
+        self.assertFalse(self.is_frame_decimated(0x09000000, 0x00006400))
+        length_err_msg = self.decoder.set_mosi_miso_raw_data(build_tmag5170_frame(0x89000000), bytes(4))
+        miso_crc_group, mosi_crc_group, _ = self.decoder.get_4_bit_crc_cmd_stat_group()
+        self.assertFalse(self.decoder.is_frame_decimated(length_err_msg, miso_crc_group, mosi_crc_group))
+        self.assertEqual(self.decoder.device_context.measurement_frame_count, 6)
+        self.assertEqual(self.decoder.device_context.decimated_frame_count, 4)
+
+    def test_bus_decoder_decimates_every_device_separately(self):
+        device_a = tmag5170_device_context(device_tag = "cs0")
+        device_b = tmag5170_device_context(device_tag = "cs1")
+        bus_decoder = tmag5170_bus_decoder((device_a, device_b), decimation_factor = 2)
+        decimated = []
+        for device_tag in ("cs0", "cs1", "cs0", "cs1", "cs0", "cs1"):
+            length_err_msg, decoder = bus_decoder.set_mosi_miso_raw_data(device_tag, build_tmag5170_frame(0x89000000), build_tmag5170_frame(0x00006400))
+            miso_crc_group, mosi_crc_group, _ = decoder.get_4_bit_crc_cmd_stat_group()
+            decimated.append(decoder.is_frame_decimated(length_err_msg, miso_crc_group, mosi_crc_group))
+        self.assertEqual(decimated, [False, False, True, True, False, False])
+        self.assertEqual((device_a.measurement_frame_count, device_a.decimated_frame_count), (3, 1))
+        self.assertEqual((device_b.measurement_frame_count, device_b.decimated_frame_count), (3, 1))
+
+    def test_is_frame_decimated_time_interval(self):
+        self.decoder.decimation_interval = 0.01
+        times = [0, 0.004, 0.008, 0.012, 0.02, 0.03]
+        self.assertEqual([self.is_frame_decimated(0x8C000000, 0x00440000, frame_time) for frame_time in times], [False, True, True, False, True, False])
+
+    def test_get_register_fields(self):
+        field_value_type = tmga5170_frame_decoder.field_value_type
+        self.assertEqual(self.decoder.get_register_fields(0x08, 0x2031 << 8),
+                         {"RDY": field_value_type(1, ""), "A": field_value_type(0, ""), "T": field_value_type(0, ""), "Z": field_value_type(0, ""),
+                          "Y": field_value_type(0, ""), "X": field_value_type(0, ""), "SET_COUNT": field_value_type(3, ""), "ALRT_STATUS": field_value_type(1, "")})
+        self.assertEqual(self.decoder.get_register_fields(0x09, 0xFF9C << 8), {"X_CH_RESULT": field_value_type(-100, "")})
+        self.assertEqual(self.decoder.get_register_fields(0x15, 0), {})
+
+        self.decoder.Br_X_axis_enum = tmga5170_frame_decoder.Br_range.TMAG5170A2_150mT_0h
+        fields = self.decoder.get_register_fields(0x09, 16000 << 8)
+        self.assertEqual(fields["X_CH_RESULT"], field_value_type(16000, ""))
+        self.assertAlmostEqual(fields["X_CH_RESULT_mT"].value, 73.2421875, delta = 0.0001)
+        fields = self.decoder.get_register_fields(0x04, 0x7F80 << 8)
+        self.assertEqual((fields["X_HI_THRESHOLD"].value, fields["X_LO_THRESHOLD"].value), (127, -128))
+        self.assertAlmostEqual(fields["X_LO_THRESHOLD_mT"].value, -150, delta = 0.0001)
+        fields = self.decoder.get_register_fields(0x0C, 17522 << 8)
+        self.assertEqual(fields["TEMP_RESULT_Celsius"], field_value_type(25, "Celsius"))
+
+    def test_register_fields_match_string_decoding(self):
+        Br_range = tmga5170_frame_decoder.Br_range
+        self.decoder.Br_X_axis_enum = Br_range.TMAG5170A2_150mT_0h
+        self.decoder.Br_Y_axis_enum = Br_range.TMAG5170A2_75mT_1h
+        self.decoder.Br_Z_axis_enum = Br_range.TMAG5170A2_300mT_2h
+        # CONV_AVG is 3 bits wide (14-12)
+        fields = self.decoder.get_register_fields(0x00, 0x5000 << 8)
+        self.assertEqual(fields["CONV_AVG"].value, 5)
+        self.assertIn("[14-12] CONV_AVG: 0x5,", self.decoder._tmga5170_frame_decoder__DEVICE_CONFIG_DecodingFunction(0x5000))
+        # GAIN_VALUE is bits 10-0
+        fields = self.decoder.get_register_fields(0x11, 0x4455 << 8)
+        self.assertEqual((fields["GAIN_SELECTION"].value, fields["GAIN_VALUE"].value), (1, 0x455))
+        self.assertIn("[10-0] GAIN_VALUE: 0x455", self.decoder._tmga5170_frame_decoder__MAG_GAIN_CONFIG_DecodingFunction(0x4455))
+        # Thresholds are scaled with range of their own axis
+        for register_index, axis, threshold_mT in ((0x04, "X", 150), (0x05, "Y", 75), (0x06, "Z", 300)):
+            fields = self.decoder.get_register_fields(register_index, 0x7F80 << 8)
+            self.assertAlmostEqual(fields[f"{axis}_LO_THRESHOLD_mT"].value, -threshold_mT, delta = 0.0001)
+            decoding_function = getattr(self.decoder, f"_tmga5170_frame_decoder__{axis}_THRX_CONFIG_DecodingFunction")
+            self.assertIn(f"{axis}_LO_THRESHOLD: -128 [{-threshold_mT:0.2f} mT]", decoding_function(0x7F80))
+
+    def test_register_fields_in_groups(self):
+        self.decoder.set_mosi_miso_raw_data(build_tmag5170_frame(0x02004000), build_tmag5170_frame(0))
+        self.assertEqual(self.decoder.get_address_8bit_register_16bit_group().register_fields["DATA_TYPE"].value, 1)
+        self.decoder.data_type = tmga5170_frame_decoder.DataType.magnetic_field_XY
+        self.assertEqual(self.decoder.get_24_bit_data_group().register_fields["DATA_TYPE"].value, 1)
+
+    def test_decode_raw_frame_and_load(self):
+        raw_frame_record = self.decoder.decode_raw_frame(build_tmag5170_frame(0x89000000), bytes(4))
+        self.assertEqual(raw_frame_record.length_err_msg, "")
+        other_decoder = tmga5170_frame_decoder(Br_X_axis_enum = tmga5170_frame_decoder.Br_range.TMAG5170A2_150mT_0h)
+        length_err_msg, miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = other_decoder.load_raw_frame_record(raw_frame_record)
+        self.assertEqual((miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group), self.decoder.get_4_bit_crc_cmd_stat_group())
+        self.assertEqual(miso_crc_group.crc_status, "CRC_ERROR")
+        self.assertEqual(other_decoder.get_address_8bit_register_16bit_group().register_name, "X_CH_RESULT")
+
+        raw_frame_record = self.decoder.decode_raw_frame(b'\x89', b'')
+        length_err_msg, miso_crc_group, _, _ = other_decoder.load_raw_frame_record(raw_frame_record)
+        self.assertEqual((length_err_msg, miso_crc_group.crc_status), (LENGTH_ERROR_TOKEN, ""))
+
+    def test_streaming_extractor_matches_24_bit_data_group(self):
+        Br_range = tmga5170_frame_decoder.Br_range
+        for data_type in tmag5170_streaming_extractor.data_type_channel_mapping:
+            decoder = tmga5170_frame_decoder(data_type = data_type, Br_X_axis_enum = Br_range.TMAG5170A2_150mT_0h,
+                                             Br_Y_axis_enum = Br_range.TMAG5170A2_150mT_0h, Br_Z_axis_enum = Br_range.TMAG5170A2_150mT_0h)
+            extractor = tmag5170_streaming_extractor(data_type, Br_range.TMAG5170A2_150mT_0h, Br_range.TMAG5170A2_150mT_0h, Br_range.TMAG5170A2_150mT_0h)
+            for miso_value in (0x44FB0300, 0x00000000, 0xFFFFFF00, 0x7F80F000):
+                decoder.set_mosi_miso_raw_data(build_tmag5170_frame(0x80000000), build_tmag5170_frame(miso_value))
+                data_24_bit_group = decoder.get_24_bit_data_group()
+                ch1, ch2 = extractor.extract(miso_value)
+                self.assertEqual(f"[{ch1:0.2f}", data_24_bit_group.ch1_si_value_str[:len(f"[{ch1:0.2f}")])
+                if extractor.channels[1] == tmag5170_streaming_extractor.MAGNITUDE:
+                    self.assertEqual(ch2, data_24_bit_group.ch2_value)
+                else:
+                    self.assertEqual(f"[{ch2:0.2f}", data_24_bit_group.ch2_si_value_str[:len(f"[{ch2:0.2f}")])
+
+    def test_streaming_extractor_matches_24_bit_data_group_per_axis_range(self):
+        Br_range = tmga5170_frame_decoder.Br_range
+        Temp_Angle_Conv = tmga5170_frame_decoder.Temp_Angle_Conv
+        axis_ranges = (Br_range.TMAG5170A1_25mT_1h, Br_range.TMAG5170A2_150mT_0h, Br_range.TMAG5170A2_300mT_2h)
+        for data_type in tmag5170_streaming_extractor.data_type_channel_mapping:
+            for TempAngleConvEn in Temp_Angle_Conv:
+                decoder = tmga5170_frame_decoder(data_type = data_type, Br_X_axis_enum = axis_ranges[0], Br_Y_axis_enum = axis_ranges[1],
+                                                 Br_Z_axis_enum = axis_ranges[2], TempAngleConvEn = TempAngleConvEn)
+                extractor = tmag5170_streaming_extractor(data_type, *axis_ranges, TempAngleConvEn)
+                for miso_value in (0x44FB0300, 0xFFFFFF00, 0x7F80F000):
+                    decoder.set_mosi_miso_raw_data(build_tmag5170_frame(0x80000000), build_tmag5170_frame(miso_value))
+                    data_24_bit_group = decoder.get_24_bit_data_group()
+                    for channel, value, value_str, raw_value in zip(extractor.channels, extractor.extract(miso_value),
+                                                                    (data_24_bit_group.ch1_si_value_str, data_24_bit_group.ch2_si_value_str),
+                                                                    (data_24_bit_group.ch1_value, data_24_bit_group.ch2_value)):
+                        if value_str == "":
+                            # Magnitude and temperature/angle with conversion disabled are raw
+                            self.assertTrue(channel == tmag5170_streaming_extractor.MAGNITUDE or TempAngleConvEn == Temp_Angle_Conv.disabled)
+                            self.assertEqual(value, raw_value)
+                        else:
+                            self.assertEqual(f"[{value:0.2f} ", value_str[:len(f"[{value:0.2f} ")])
+
+    def test_streaming_extractor_samples(self):
+        extractor = tmag5170_streaming_extractor(tmga5170_frame_decoder.DataType.magnetic_field_XY)
+        miso_value = int.from_bytes(build_tmag5170_frame(0x0FF12300), 'big')
+        samples = list(extractor.iter_samples([(0.5, miso_value), (0.6, None), (0.7, miso_value ^ 0x01)], verify_crc = True))
+        self.assertEqual(samples, [(0.5, -237, 0x0F2)])
+        ch1_samples = []
+        ch2_samples = []
+        extractor.extract_into((miso_value, miso_value), ch1_samples, ch2_samples)
+        self.assertEqual((ch1_samples, ch2_samples), ([-237, -237], [0x0F2, 0x0F2]))
+        with self.assertRaises(ValueError):
+            tmag5170_streaming_extractor(tmga5170_frame_decoder.DataType.default_32bit_access)
+
+    def test_decode_matches_stateful_decoder(self):
+        Br_range = tmga5170_frame_decoder.Br_range
+        for data_type in tmga5170_frame_decoder.DataType:
+            config = tmag5170_decoder_config(data_type = data_type, Br_X_axis_enum = Br_range.TMAG5170A2_150mT_0h, Br_Z_axis_enum = Br_range.TMAG5170A1_25mT_1h)
+            decoder = tmga5170_frame_decoder(data_type = data_type, Br_X_axis_enum = Br_range.TMAG5170A2_150mT_0h, Br_Z_axis_enum = Br_range.TMAG5170A1_25mT_1h)
+            for mosi_value, miso_value in ((0x89000000, 0x44FB0300), (0x040AF600, 0), (0x8C000000, 0x7F80F000), (0x02004000, 0xFFFFFF00)):
+                mosi_raw_data = build_tmag5170_frame(mosi_value)
+                miso_raw_data = build_tmag5170_frame(miso_value)
+                record = decode(int.from_bytes(mosi_raw_data, 'big'), int.from_bytes(miso_raw_data, 'big'), config)
+                self.assertEqual(record.length_err_msg, decoder.set_mosi_miso_raw_data(mosi_raw_data, miso_raw_data))
+                miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = decoder.get_4_bit_crc_cmd_stat_group()
+                self.assertEqual((record.miso_crc_group, record.mosi_crc_group, record.cmd_stat_4_bit_group), (miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group))
+                if data_type == tmga5170_frame_decoder.DataType.default_32bit_access:
+                    self.assertEqual((record.register_group, record.stat_8_bit_group), decoder.get_register_16_bit_address_stat_8_bit_group())
+                else:
+                    self.assertEqual(record.register_group, decoder.get_24_bit_data_group())
+        record = decode(None, None)
+        self.assertEqual((record.length_err_msg, record.miso_crc_group.crc_status), (LENGTH_ERROR_TOKEN, ""))
+        for data_type in tmga5170_frame_decoder.DataType:
+            config = tmag5170_decoder_config(data_type = data_type)
+            for mosi_word, miso_word in ((0x89000000, None), (None, 0x44FB0300)):
+                record = decode(mosi_word, miso_word, config)
+                self.assertEqual((record.mosi_value, record.miso_value, record.length_err_msg), (mosi_word, miso_word, LENGTH_ERROR_TOKEN))
+                self.assertEqual((record.mosi_crc_group.crc_status, record.miso_crc_group.crc_status), ("", ""))
+
+    def test_decode_config_is_immutable_and_shared_by_threads(self):
+        config = tmag5170_decoder_config(Br_X_axis_enum = tmga5170_frame_decoder.Br_range.TMAG5170A2_300mT_2h)
+        with self.assertRaises(AttributeError):
+            config.data_type = tmga5170_frame_decoder.DataType.magnetic_field_XY
+        words = [(0x89000000 | (i << 4), (i * 37) << 8) for i in range(200)]
+        serial_records = [decode(mosi_value, miso_value, config) for mosi_value, miso_value in words]
+        with concurrent.futures.ThreadPoolExecutor(max_workers = 4) as executor:
+            records = list(executor.map(decode, [mosi_value for mosi_value, _ in words], [miso_value for _, miso_value in words], [config] * len(words)))
+        self.assertEqual(records, serial_records)
+        self.assertEqual(records[1].register_group.register_decoding, "[15-0] X_CH_RESULT: 37 [0.34 mT]")
 
     def tearDown(self):
         pass
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import tmag5170 as lbr
+import tmag5170_archive
+import tmag5170_capture
+import tmag5170_offline
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive_path = os.path.join(self.directory.name, "session.tmag5170")
+
+    def test_varint_zigzag_round_trip(self):
+        buffer = bytearray()
+        values = [0, -1, 1, -64, 63, 64, -65, 1 << 40, -(1 << 40)]
+        for value in values:
+            tmag5170_archive.append_varint(buffer, tmag5170_archive.zigzag_encode(value))
+        self.assertEqual(buffer[:3], b'\x00\x01\x02')
+        position = 0
+        decoded = []
+        for value in values:
+            encoded, position = tmag5170_archive.read_varint(buffer, position)
+            decoded.append(tmag5170_archive.zigzag_decode(encoded))
+        self.assertEqual(decoded, values)
+        self.assertEqual(position, len(buffer))
+
+    def test_chunk_round_trip(self):
+        timestamps = [1000, 1100, 1200, 1305, 1400, 5000]
+        values = [-5, -3, 2, 2, -32768, 32767]
+        data = tmag5170_archive.encode_chunk(timestamps, values)
+        self.assertEqual(tmag5170_archive.decode_chunk(data), (timestamps, values))
+
+    def test_writer_reader_time_range(self):
+        archive_writer = tmag5170_archive.tmag5170_archive_writer(self.archive_path, chunk_size = 10, metadata = {'data_type': 0})
+        for i in range(100):
+            archive_writer.add_sample("X_CH_RESULT", i * 1e-3, i - 50)
+            if i % 2 == 0:
+                archive_writer.add_sample("TEMP_RESULT", i * 1e-3, 1000 + i)
+        archive_writer.close()
+        archive_reader = tmag5170_archive.tmag5170_archive_reader(self.archive_path)
+        self.assertEqual(sorted(archive_reader.get_stream_names()), ["TEMP_RESULT", "X_CH_RESULT"])
+        self.assertEqual(archive_reader.metadata, {'data_type': 0})
+        self.assertEqual(archive_reader.get_sample_count("X_CH_RESULT"), 100)
+        self.assertEqual(len(archive_reader.stream_chunks["X_CH_RESULT"]), 10)
+        self.assertEqual([value for timestamp, value in archive_reader.read_samples("X_CH_RESULT")], list(range(-50, 50)))
+        samples = list(archive_reader.read_samples("X_CH_RESULT", 0.0255, 0.0305))
+        self.assertEqual([value for timestamp, value in samples], [-24, -23, -22, -21, -20])
+        self.assertAlmostEqual(samples[0][0], 0.026)
+        self.assertEqual(list(archive_reader.read_samples("TEMP_RESULT", 0.2)), [])
+        self.assertEqual(list(archive_reader.read_samples("Y_CH_RESULT")), [])
+        archive_reader.close()
+
+    def test_not_archive(self):
+        path = os.path.join(self.directory.name, "other.bin")
+        with open(path, 'wb') as file:
+            file.write(b'0' * 100)
+        with self.assertRaises(ValueError):
+            tmag5170_archive.tmag5170_archive_reader(path)
+
+    def test_archive_samples_of_frames(self):
+        decoder = lbr.tmga5170_frame_decoder()
+        def record(mosi_value, miso_value):
+            return decoder.decode_raw_frame(tmag5170_capture.add_tmag5170_crc(mosi_value).to_bytes(4, 'big'),
+                                            tmag5170_capture.add_tmag5170_crc(miso_value).to_bytes(4, 'big'))
+        DataType = lbr.tmga5170_frame_decoder.DataType
+        self.assertEqual(tmag5170_archive.get_archive_samples(record(0x89000000, 0x00FFFF00), DataType.default_32bit_access), (("X_CH_RESULT", -1),))
+        self.assertEqual(tmag5170_archive.get_archive_samples(record(0x8C000000, 0x00FFFF00), DataType.default_32bit_access), (("TEMP_RESULT", 0xFFFF),))
+        self.assertEqual(tmag5170_archive.get_archive_samples(record(0x88000000, 0x00FFFF00), DataType.default_32bit_access), ())
+        self.assertEqual(tmag5170_archive.get_archive_samples(record(0x09000000, 0x00FFFF00), DataType.default_32bit_access), ())
+        self.assertEqual(tmag5170_archive.get_archive_samples(record(0x89000000, 0x44FB0300), DataType.magnetic_field_temperature_XT), (("X", -77), ("T", 1088)))
+        self.assertEqual(tmag5170_archive.get_archive_samples(decoder.decode_raw_frame(b'\x89\x00\x00\x00', b'\x00\xFF\xFF\x00'), DataType.default_32bit_access), ())
+
+    def test_offline_archive(self):
+        capture_path = os.path.join(self.directory.name, "capture.csv")
+        tmag5170_capture.write_logic2_spi_export(capture_path, tmag5170_capture.generate_spi_frames(tmag5170_capture.generate_synthetic_mosi_miso_values(1000)))
+        tmag5170_offline.main([capture_path, '--output', self.archive_path, '--archive'])
+        archive_reader = tmag5170_archive.tmag5170_archive_reader(self.archive_path)
+        self.assertEqual(sum(archive_reader.get_sample_count(stream_name) for stream_name in archive_reader.get_stream_names()), 800)
+        self.assertLess(os.path.getsize(self.archive_path) * 10, os.path.getsize(capture_path))
+        archive_reader.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
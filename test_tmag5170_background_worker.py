@@ -0,0 +1,60 @@
+import threading
+import unittest
+
+import tmag5170_background_worker
+
+
+class TestBackgroundWorker(unittest.TestCase):
+    def test_all_records_processed_in_order(self):
+        records = []
+        worker = tmag5170_background_worker.tmag5170_background_worker(records.append, queue_size = 4, queue_full_policy = tmag5170_background_worker.QUEUE_FULL_BLOCK)
+        for i in range(100):
+            self.assertTrue(worker.put(i))
+        worker.stop()
+        self.assertEqual(records, list(range(100)))
+        counters = worker.get_counters()
+        self.assertEqual((counters['queued'], counters['dropped'], counters['processed']), (100, 0, 100))
+        self.assertLessEqual(counters['queue_high_water_mark'], 4)
+
+    def test_records_dropped_when_queue_is_full(self):
+        release_handler = threading.Event()
+        records = []
+        def handler(record):
+            release_handler.wait()
+            records.append(record)
+        worker = tmag5170_background_worker.tmag5170_background_worker(handler, queue_size = 2, queue_full_policy = tmag5170_background_worker.QUEUE_FULL_DROP)
+        results = [worker.put(i) for i in range(10)]
+        release_handler.set()
+        worker.stop()
+        self.assertEqual(results.count(True), len(records))
+        self.assertEqual(worker.dropped_count, results.count(False))
+        self.assertGreaterEqual(worker.dropped_count, 10 - 3)
+
+    def test_handler_errors_are_counted(self):
+        def handler(record):
+            raise ValueError(record)
+        worker = tmag5170_background_worker.tmag5170_background_worker(handler)
+        worker.put(1)
+        worker.stop()
+        self.assertEqual(worker.handler_error_count, 1)
+
+    def test_stop_from_worker_thread(self):
+        all_queued = threading.Event()
+        records = []
+        stopped_records = []
+        def handler(record):
+            if record == 0:
+                all_queued.wait()
+                worker.stop()
+            records.append(record)
+        worker = tmag5170_background_worker.tmag5170_background_worker(handler, on_stop = lambda: stopped_records.extend(records))
+        for i in range(10):
+            worker.put(i)
+        all_queued.set()
+        worker.thread.join(5)
+        self.assertFalse(worker.thread.is_alive())
+        self.assertEqual(records, list(range(10)))
+        self.assertEqual(stopped_records, list(range(10)))
+
+if __name__ == "__main__":
+    unittest.main()
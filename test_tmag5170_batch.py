@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+import tmag5170_batch
+import tmag5170_capture
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.capture_directory = os.path.join(self.directory.name, "captures")
+        os.makedirs(os.path.join(self.capture_directory, "night"))
+        self.progress_path = os.path.join(self.directory.name, "progress.jsonl")
+        mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(50)
+        # X_CH_RESULT read with corrupted MISO crc and frame with status bits set
+        mosi_miso_values[1] = (mosi_miso_values[1][0], mosi_miso_values[1][1] ^ 0x01)
+        mosi_miso_values[2] = (mosi_miso_values[2][0], tmag5170_capture.add_tmag5170_crc(0x41000000))
+        self.write_capture("a.csv", mosi_miso_values)
+        self.write_capture(os.path.join("night", "b.csv"), tmag5170_capture.generate_synthetic_mosi_miso_values(30))
+        self.file_paths = tmag5170_batch.get_capture_files(self.capture_directory)
+
+    def write_capture(self, name, mosi_miso_values):
+        tmag5170_capture.write_logic2_spi_export(os.path.join(self.capture_directory, name), tmag5170_capture.generate_spi_frames(mosi_miso_values))
+
+    def test_analyze_capture(self):
+        result = tmag5170_batch.analyze_capture(self.file_paths[0])
+        self.assertEqual((result['frames'], result['length_errors'], result['mosi_crc_errors'], result['miso_crc_errors']), (50, 0, 0, 1))
+        self.assertEqual(result['registers']['X_CH_RESULT'], {'frames': 10, 'mosi_crc_errors': 0, 'miso_crc_errors': 1})
+        self.assertEqual((result['status_events']['cfg_reset_stat'], result['status_events']['t_stat']), (1, 1))
+
+    def test_run_batch_resumes(self):
+        self.assertEqual([os.path.relpath(file_path, self.capture_directory) for file_path in self.file_paths], ["a.csv", os.path.join("night", "b.csv")])
+        report, decoded_count = tmag5170_batch.run_batch(self.file_paths, self.progress_path, jobs = 2)
+        self.assertEqual(decoded_count, 2)
+        self.assertEqual((report['totals']['files'], report['totals']['frames'], report['totals']['miso_crc_errors']), (2, 80, 1))
+        self.assertEqual(report['registers']['X_CH_RESULT']['frames'], 16)
+        self.assertAlmostEqual(report['registers']['X_CH_RESULT']['miso_crc_error_rate'], 1 / 16)
+        self.assertAlmostEqual(report['files'][self.file_paths[0]]['miso_crc_error_rate'], 1 / 50)
+        self.assertEqual([bit_position for bit_position, count in enumerate(report['crc_error_bit_positions']['miso']) if count != 0], [0, 11, 26])
+
+        # Interrupted write of progress record is ignored
+        with open(self.progress_path, 'a') as file:
+            file.write('{"file": ')
+        self.write_capture(os.path.join("night", "b.csv"), tmag5170_capture.generate_synthetic_mosi_miso_values(40))
+        os.utime(self.file_paths[1], ns = (0, 1))
+        resumed_report, decoded_count = tmag5170_batch.run_batch(self.file_paths, self.progress_path, jobs = 1)
+        self.assertEqual(decoded_count, 1)
+        self.assertEqual(resumed_report['totals']['frames'], 90)
+        self.assertEqual(resumed_report['totals']['run_frames'], 40)
+        self.assertEqual(tmag5170_batch.run_batch(self.file_paths, self.progress_path)[1], 0)
+
+    def test_run_batch_with_other_settings_does_not_reuse_progress(self):
+        tmag5170_batch.run_batch(self.file_paths, self.progress_path, jobs = 1)
+        report, decoded_count = tmag5170_batch.run_batch(self.file_paths, self.progress_path, jobs = 1, data_type_value = 1)
+        self.assertEqual(decoded_count, 2)
+        # 12-bit data access has no 8-bit status, results of 32-bit run are not mixed in
+        self.assertEqual(report['status_events']['cfg_reset_stat'], 0)
+        self.assertEqual(tmag5170_batch.run_batch(self.file_paths, self.progress_path, data_type_value = 1)[1], 0)
+        self.assertEqual(tmag5170_batch.run_batch(self.file_paths, self.progress_path, split_bursts = True, data_type_value = 1)[1], 2)
+
+    def test_main(self):
+        report_path = os.path.join(self.directory.name, "report.json")
+        tmag5170_batch.main([self.capture_directory, '--report', report_path, '--jobs', '1'])
+        with open(report_path) as file:
+            self.assertEqual(json.load(file)['totals']['frames'], 80)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import tmag5170 as lbr
+import tmag5170_capture
+import tmag5170_crc_correction
+
+
+class TestCrcCorrection(unittest.TestCase):
+    def test_syndrome_table_covers_all_bits(self):
+        bit_positions = sorted(bit_position for bit_positions in tmag5170_crc_correction.CRC_SYNDROME_TABLE.values() for bit_position in bit_positions)
+        self.assertEqual(bit_positions, list(range(32)))
+        self.assertEqual(len(tmag5170_crc_correction.CRC_SYNDROME_TABLE), 15)
+        self.assertNotIn(0, tmag5170_crc_correction.CRC_SYNDROME_TABLE)
+        self.assertEqual(tmag5170_crc_correction.CRC_SYNDROME_TABLE[1], (0, 11, 26))
+
+    def test_every_single_bit_error_is_localized(self):
+        for value in (0x89123400, 0x040AF600, 0x00000000, 0xFFFFFFF0):
+            word = tmag5170_capture.add_tmag5170_crc(value)
+            self.assertEqual(tmag5170_crc_correction.get_single_bit_error_candidates(word), ())
+            for bit_position in range(32):
+                candidates = tmag5170_crc_correction.get_single_bit_error_candidates(word ^ (1 << bit_position))
+                self.assertIn(bit_position, [candidate.bit_position for candidate in candidates])
+                for candidate in candidates:
+                    self.assertEqual(lbr.tmga5170_frame_decoder.calculate_tmag5170_crc(candidate.corrected_word).crc_status, lbr.CRC_OK_TOKEN)
+
+    def test_candidate_values(self):
+        word = tmag5170_capture.add_tmag5170_crc(0x89123400)
+        candidates = tmag5170_crc_correction.get_single_bit_error_candidates(word ^ (1 << 18))
+        self.assertEqual(candidates, (tmag5170_crc_correction.crc_correction_candidate_type(18, word, 0x09, 0x1234),))
+        self.assertEqual(tmag5170_crc_correction.get_single_bit_error_candidates(None), ())
+        decoder = lbr.tmga5170_frame_decoder()
+        self.assertEqual(tmag5170_crc_correction.get_candidates_str(tmag5170_crc_correction.MOSI_LINE_TOKEN, candidates, decoder.get_register_acronym),
+                         f"mosi bit 18: {lbr.int_to_hex_string(word, 8)} X_CH_RESULT 0x1234")
+
+    def test_statistics(self):
+        crc_error_statistics = tmag5170_crc_correction.tmag5170_crc_error_statistics()
+        word = tmag5170_capture.add_tmag5170_crc(0x00123400)
+        for i in range(3):
+            corrupted_word = word ^ 1
+            crc_calculated = lbr.tmga5170_frame_decoder.calculate_tmag5170_crc(corrupted_word).crc_calculated
+            self.assertEqual(len(crc_error_statistics.add_error(tmag5170_crc_correction.MISO_LINE_TOKEN, corrupted_word, crc_calculated)), 3)
+        self.assertEqual(crc_error_statistics.add_error(tmag5170_crc_correction.MISO_LINE_TOKEN, word, word & 0x0F), ())
+        summary = crc_error_statistics.get_summary()
+        self.assertEqual(summary['miso'], {'errors': 3, 'bit_positions': {0: 3, 11: 3, 26: 3}})
+        self.assertEqual(summary['mosi'], {'errors': 0, 'bit_positions': {}})
+        self.assertEqual(tmag5170_crc_correction.tmag5170_crc_error_statistics.get_summary_str(summary),
+                         "mosi crc errors: 0, candidate bits: , miso crc errors: 3, candidate bits: 26:3 11:3 0:3")
+
+if __name__ == "__main__":
+    unittest.main()
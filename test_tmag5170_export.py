@@ -0,0 +1,71 @@
+import csv
+import json
+import itertools
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import hla_replay
+import tmag5170_capture
+import tmag5170_export
+from main_tmag5170_spi_decoder import Hla
+
+
+class TestExportSink(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.frame_data = {'FrameCnt_debug': 7, 'register_name': "X_CH_RESULT", 'register_value': "0x0064", 'crc_miso_correct': "CRC_OK"}
+
+    def test_parse_export_fields(self):
+        self.assertEqual(tmag5170_export.parse_export_fields(""), tmag5170_export.EXPORT_ALL_FIELDS)
+        self.assertEqual(tmag5170_export.parse_export_fields(" start_time, register_name ,"), ('start_time', 'register_name'))
+
+    def test_json_lines_export(self):
+        file_path = os.path.join(self.directory.name, "frames.jsonl")
+        sink = tmag5170_export.tmag5170_export_sink(file_path, ('start_time', 'FrameCnt_debug', 'register_name', 'ch1_value'), batch_size = 2)
+        for i in range(3):
+            sink.write('tmag5170_regular', i, i + 0.5, self.frame_data)
+        self.assertEqual(sink.record_count, 2)
+        sink.close()
+        sink.close()
+        with open(file_path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[2], {'start_time': 2, 'FrameCnt_debug': 7, 'register_name': "X_CH_RESULT", 'ch1_value': ""})
+
+    def test_csv_export(self):
+        file_path = os.path.join(self.directory.name, "frames.csv")
+        sink = tmag5170_export.tmag5170_export_sink(file_path, ('frame_type', 'register_value', 'crc_miso_correct'))
+        sink.write('tmag5170_regular', 0, 1, self.frame_data)
+        sink.close()
+        with open(file_path, newline = '') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows, [['frame_type', 'register_value', 'crc_miso_correct'], ['tmag5170_regular', "0x0064", "CRC_OK"]])
+
+    def test_all_fields_cover_frame_dictionaries(self):
+        # Read of every register and write with corrupted MISO crc
+        mosi_miso_values = [(0x80000000 | (register_index << 24), 0x12345600) for register_index in range(0x15)] + [(0x040AF600, 0x00000040)]
+        analyzer_frames = list(hla_replay.convert_to_analyzer_frames(tmag5170_capture.generate_spi_frames(mosi_miso_values)))
+        frame_keys = set()
+        for data_type, display_mode, load_shedding_budget in itertools.product((Hla.DATA_TYPE_0h, Hla.DATA_TYPE_1h, Hla.DATA_TYPE_4h, Hla.DATA_TYPE_7h),
+                                                                               (Hla.DISPLAY_MODE_VERBOSE, Hla.DISPLAY_MODE_COMPACT), (0, 1e-9)):
+            hla = hla_replay.create_hla({'DATA_TYPE': data_type, 'Display_mode': display_mode, 'Load_shedding_budget': load_shedding_budget, 'Device_tag': "U1",
+                                         'X_RANGE': Hla.A2_150MT, 'Y_RANGE': Hla.A2_150MT, 'Z_RANGE': Hla.A2_150MT,
+                                         'Frame_length_verification': Hla.FRAME_LENGTH_VERIF_DISABLED})
+            if hla.load_shedder != None:
+                hla.load_shedder.window_frame_count = 4
+            latencies, output_frames = hla_replay.replay(hla, analyzer_frames)
+            for frame in output_frames:
+                if frame.type in Hla.result_types and frame.type not in ('tmag5170_timing_summary', 'tmag5170_load_shedding'):
+                    frame_keys.update(frame.data)
+        self.assertIn('X_CH_RESULT_mT', frame_keys)
+        self.assertIn('crc_error_candidates', frame_keys)
+        self.assertEqual(frame_keys - set(tmag5170_export.EXPORT_ALL_FIELDS), set())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
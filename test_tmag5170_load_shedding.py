@@ -0,0 +1,46 @@
+import unittest
+
+import tmag5170_load_shedding
+
+
+class TestLoadShedder(unittest.TestCase):
+    def add_window(self, load_shedder, frame_time, cost_per_frame, frame_period = 1e-5):
+        level_change = None
+        for _ in range(load_shedder.window_frame_count):
+            frame_time = frame_time + frame_period
+            level_change = load_shedder.add_frames(frame_time, cost_per_frame) or level_change
+        return frame_time, level_change
+
+    def test_steps_down_and_restores_with_hysteresis(self):
+        load_shedder = tmag5170_load_shedding.tmag5170_load_shedder(0.5, window_frame_count = 10)
+        frame_time = 0.0
+        # Decode cost equal to frame period: load 1 s/s, one level down per window until counted
+        levels = []
+        for _ in range(4):
+            frame_time, level_change = self.add_window(load_shedder, frame_time, 1e-5)
+            levels.append(load_shedder.level)
+        self.assertEqual(levels, [tmag5170_load_shedding.DETAIL_NUMERIC, tmag5170_load_shedding.DETAIL_CRC_ADDRESS,
+                                  tmag5170_load_shedding.DETAIL_COUNTED, tmag5170_load_shedding.DETAIL_COUNTED])
+        self.assertAlmostEqual(load_shedder.last_load, 1.0)
+
+        # Counted frames are cheap, but crc+address costs 1e-5 at this rate, so level stays
+        frame_time, level_change = self.add_window(load_shedder, frame_time, 1e-7)
+        self.assertEqual((load_shedder.level, level_change), (tmag5170_load_shedding.DETAIL_COUNTED, None))
+
+        # Frame rate drops 100 times, levels are restored one per window
+        for level in (tmag5170_load_shedding.DETAIL_CRC_ADDRESS, tmag5170_load_shedding.DETAIL_NUMERIC, tmag5170_load_shedding.DETAIL_FULL):
+            frame_time, level_change = self.add_window(load_shedder, frame_time, 1e-7, frame_period = 1e-3)
+            self.assertEqual(load_shedder.level, level)
+        self.assertEqual(level_change.degraded_frame_count, 70)
+        self.assertIn("70 frames with reduced detail", tmag5170_load_shedding.tmag5170_load_shedder.get_level_change_str(level_change, 0.5))
+        self.assertEqual(load_shedder.degraded_frame_count, 0)
+        self.assertEqual(sum(load_shedder.level_frame_counts.values()), 80)
+
+    def test_load_below_budget_keeps_full_detail(self):
+        load_shedder = tmag5170_load_shedding.tmag5170_load_shedder(0.5, window_frame_count = 10)
+        frame_time, level_change = self.add_window(load_shedder, 0.0, 1e-6)
+        self.assertEqual((load_shedder.level, level_change), (tmag5170_load_shedding.DETAIL_FULL, None))
+        self.assertEqual(load_shedder.add_frames(None, 1e-6), None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import hla_replay
+import tmag5170_capture
+import tmag5170_memory
+from main_tmag5170_spi_decoder import Hla
+
+# Budget of mean/max bytes of single frame dictionary for every output mode
+FRAME_DICTIONARY_BUDGETS = {
+    'tmag5170_regular': (6 * 1024, 7 * 1024),
+    'tmag5170_special': (5 * 1024, 6 * 1024),
+    'tmag5170_compact': (1280, 1536),
+    'tmag5170_compact_special': (1280, 1536),
+    'tmag5170_timing_summary': (1536, 1536),
+}
+
+
+class TestMemoryAccounting(unittest.TestCase):
+    def test_object_size_counts_shared_objects_once(self):
+        value = "x" * 1000
+        self.assertEqual(tmag5170_memory.get_object_size([value, value]), sys.getsizeof([value, value]) + sys.getsizeof(value))
+        self.assertGreater(tmag5170_memory.get_object_size({'a': value}), sys.getsizeof(value))
+
+    def test_accounting(self):
+        memory_accounting = tmag5170_memory.tmag5170_memory_accounting()
+        self.assertEqual(memory_accounting.get_bytes_per_frame(), None)
+        memory_accounting.add_frame_dictionary('a', {'x': 1})
+        memory_accounting.add_frame_dictionary('b', {'x': 1, 'y': "text"})
+        memory_accounting.update_buffer_high_water_mark('buffer', 8)
+        memory_accounting.update_buffer_high_water_mark('buffer', 4)
+        report = memory_accounting.get_report({'cache': (1, 100)})
+        self.assertEqual(report['frame_dictionary_counts'], {'a': 1, 'b': 1})
+        self.assertLess(report['bytes_per_frame']['a'], report['bytes_per_frame']['b'])
+        self.assertEqual(memory_accounting.get_bytes_per_frame(), (report['bytes_per_frame']['a'] + report['bytes_per_frame']['b']) / 2)
+        self.assertEqual(report['buffer_high_water_marks'], {'buffer': 8})
+        self.assertEqual(report['traced_memory'], None)
+        self.assertIn("cache: 1 entries 100 B", tmag5170_memory.tmag5170_memory_accounting.get_report_str(report))
+
+    def test_tracemalloc_snapshot(self):
+        memory_accounting = tmag5170_memory.tmag5170_memory_accounting(trace_allocations = True)
+        kept = [bytearray(1000) for i in range(10)]
+        report = memory_accounting.get_report()
+        memory_accounting.stop()
+        self.assertGreaterEqual(report['traced_memory']['current_bytes'], 10000)
+        self.assertGreater(len(report['traced_memory']['top_growth']), 0)
+        self.assertEqual(memory_accounting.get_report()['traced_memory'], None)
+        del kept
+
+    def test_compact_display_is_smaller(self):
+        spi_frames = tmag5170_capture.generate_spi_frames(tmag5170_capture.generate_synthetic_mosi_miso_values(100))
+        analyzer_frames = hla_replay.convert_to_analyzer_frames(spi_frames)
+        bytes_per_frame = []
+        for display_mode in (Hla.DISPLAY_MODE_VERBOSE, Hla.DISPLAY_MODE_COMPACT):
+            hla = hla_replay.create_hla({'Display_mode': display_mode, 'Memory_accounting': Hla.MEMORY_ACCOUNTING_ENABLED})
+            hla_replay.replay(hla, analyzer_frames)
+            bytes_per_frame.append(hla.memory_accounting.get_bytes_per_frame())
+        self.assertLess(bytes_per_frame[1] * 4, bytes_per_frame[0])
+
+    def test_hla_memory_report_disabled(self):
+        self.assertEqual(hla_replay.create_hla().getMemoryReport(), None)
+
+    def test_hla_frame_dictionary_budgets(self):
+        spi_frames = tmag5170_capture.generate_spi_frames(tmag5170_capture.generate_synthetic_mosi_miso_values(200), frames_per_transaction = 2)
+        analyzer_frames = hla_replay.convert_to_analyzer_frames(spi_frames)
+        for data_type, display_mode in itertools.product((Hla.DATA_TYPE_0h, Hla.DATA_TYPE_1h, Hla.DATA_TYPE_4h, Hla.DATA_TYPE_7h),
+                                                         (Hla.DISPLAY_MODE_VERBOSE, Hla.DISPLAY_MODE_COMPACT)):
+            hla = hla_replay.create_hla({'DATA_TYPE': data_type, 'Display_mode': display_mode, 'X_RANGE': Hla.A2_150MT, 'Y_RANGE': Hla.A2_150MT, 'Z_RANGE': Hla.A2_150MT,
+                                         'Frame_length_verification': Hla.FRAME_LENGTH_VERIF_DISABLED,
+                                         'Timing_summary_period': 50, 'Memory_accounting': Hla.MEMORY_ACCOUNTING_ENABLED})
+            hla_replay.replay(hla, analyzer_frames)
+            report = hla.getMemoryReport()
+            self.assertEqual(sum(report['frame_dictionary_counts'].values()), 204)
+            self.assertEqual(report['buffer_high_water_marks']['frame_data_bytes'], 8)
+            self.assertEqual(set(report['cache_sizes']), {'raw_frame_record_cache', 'register_shadow'})
+            # Raw phase records of all frames of the capture are kept
+            raw_frame_record_count, raw_frame_record_bytes = report['cache_sizes']['raw_frame_record_cache']
+            self.assertEqual(raw_frame_record_count, 200)
+            self.assertGreater(raw_frame_record_bytes, raw_frame_record_count * 64)
+            for frame_type, bytes_per_frame in report['bytes_per_frame'].items():
+                mean_budget, max_budget = FRAME_DICTIONARY_BUDGETS[frame_type]
+                self.assertLessEqual(bytes_per_frame, mean_budget, (data_type, frame_type))
+                self.assertLessEqual(report['max_bytes_per_frame'][frame_type], max_budget, (data_type, frame_type))
+
+if __name__ == "__main__":
+    unittest.main()
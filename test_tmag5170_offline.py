@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+
+import tmag5170 as lbr
+import tmag5170_capture
+import tmag5170_offline
+
+
+class TestOfflineDecoding(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.capture_path = os.path.join(self.directory.name, "capture.csv")
+        self.cache_directory = os.path.join(self.directory.name, "cache")
+        mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(12)
+        tmag5170_capture.write_logic2_spi_export(self.capture_path, tmag5170_capture.generate_spi_frames(mosi_miso_values, frames_per_transaction = 2))
+
+    def test_raw_phase_is_cached(self):
+        offline_frames = tmag5170_offline.decode_capture_raw(self.capture_path, True, self.cache_directory)
+        self.assertEqual(len(offline_frames), 12)
+        self.assertEqual(os.listdir(self.cache_directory), [tmag5170_offline.get_capture_hash(self.capture_path, True) + ".pickle"])
+        self.assertEqual(tmag5170_offline.decode_capture_raw(self.capture_path, True, self.cache_directory), offline_frames)
+        self.assertEqual(len(tmag5170_offline.decode_capture_raw(self.capture_path, False, self.cache_directory)), 6)
+
+    def test_presentation_phase_applies_settings(self):
+        offline_frames = tmag5170_offline.decode_capture_raw(self.capture_path, True)
+        decoder = lbr.tmga5170_frame_decoder()
+        frames = list(tmag5170_offline.present_capture(decoder, offline_frames))
+        self.assertEqual(frames[1][3]['register_decoding'], "[15-0] X_CH_RESULT: 37 ")
+        self.assertEqual(frames[1][3]['crc_miso_correct'], lbr.CRC_OK_TOKEN)
+        decoder.Br_X_axis_enum = lbr.tmga5170_frame_decoder.Br_range.TMAG5170A2_300mT_2h
+        frames = list(tmag5170_offline.present_capture(decoder, offline_frames))
+        self.assertEqual(frames[1][3]['register_decoding'], "[15-0] X_CH_RESULT: 37 [0.34 mT]")
+        self.assertAlmostEqual(frames[1][1], 5e-6)
+
+    def test_main(self):
+        output_path = os.path.join(self.directory.name, "frames.jsonl")
+        tmag5170_offline.main([self.capture_path, '--output', output_path, '--split-bursts', '--fields', 'FrameCnt_debug,register_name'])
+        with open(output_path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records[2], {'FrameCnt_debug': 2, 'register_name': "Y_CH_RESULT"})
+
+    def test_main_samples_only(self):
+        output_path = os.path.join(self.directory.name, "samples.csv")
+        tmag5170_offline.main([self.capture_path, '--output', output_path, '--split-bursts', '--data-type', '1', '--samples-only'])
+        with open(output_path) as file:
+            rows = file.read().splitlines()
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[0], "timestamp,X,Y")
+        self.assertEqual(rows[2].split(',')[1:], ["5", "2"])
+
+    def test_checkpoint_resume_gives_identical_output(self):
+        mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(250)
+        tmag5170_capture.write_logic2_spi_export(self.capture_path, tmag5170_capture.generate_spi_frames(mosi_miso_values, frames_per_transaction = 3))
+        for output_name in ("frames.csv", "frames.jsonl"):
+            reference_path = os.path.join(self.directory.name, "reference_" + output_name)
+            output_path = os.path.join(self.directory.name, output_name)
+            checkpoint_path = output_path + ".checkpoint"
+            tmag5170_offline.main([self.capture_path, '--output', reference_path, '--split-bursts'])
+            arguments = [self.capture_path, '--output', output_path, '--split-bursts', '--checkpoint', checkpoint_path, '--checkpoint-interval', '20']
+            tmag5170_offline.main(arguments + ['--max-frames', '100'])
+            self.assertEqual(tmag5170_offline.load_checkpoint(checkpoint_path)['frame_counter'], 102)
+            # Records written after last checkpoint of interrupted run are dropped on resume
+            with open(output_path, 'a') as file:
+                file.write("partial record")
+            tmag5170_offline.main(arguments + ['--max-frames', '60'])
+            tmag5170_offline.main(arguments)
+            self.assertFalse(os.path.exists(checkpoint_path))
+            with open(reference_path) as reference_file, open(output_path) as file:
+                self.assertEqual(file.read(), reference_file.read())
+
+    def test_checkpoint_of_other_settings_is_rejected(self):
+        output_path = os.path.join(self.directory.name, "frames.jsonl")
+        checkpoint_path = os.path.join(self.directory.name, "frames.checkpoint")
+        tmag5170_offline.main([self.capture_path, '--output', output_path, '--checkpoint', checkpoint_path, '--max-frames', '2'])
+        with self.assertRaises(ValueError):
+            tmag5170_offline.main([self.capture_path, '--output', output_path, '--checkpoint', checkpoint_path, '--data-type', '1'])
+
+    def test_export_reader_resumes_at_offset(self):
+        spi_frames = list(tmag5170_capture.read_logic2_spi_export(self.capture_path))
+        reader = tmag5170_capture.logic2_spi_export_reader(self.capture_path)
+        reader_rows = iter(reader)
+        self.assertEqual([next(reader_rows) for _ in range(5)], spi_frames[:5])
+        resumed_reader = tmag5170_capture.logic2_spi_export_reader(self.capture_path, reader.offset)
+        self.assertEqual(list(resumed_reader), spi_frames[5:])
+        reader.close()
+        resumed_reader.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import unittest
+import uuid
+
+import tmag5170 as lbr
+import tmag5170_capture
+import tmag5170_shared_memory
+
+TOOLS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools')
+
+
+class TestSharedMemory(unittest.TestCase):
+    def setUp(self):
+        self.name = f"tmag5170_test_{uuid.uuid4().hex[:12]}"
+        self.writer = tmag5170_shared_memory.tmag5170_shared_memory_writer(self.name, capacity = 8)
+
+    def test_read_published_records(self):
+        reader = tmag5170_shared_memory.tmag5170_shared_memory_reader(self.name)
+        self.assertEqual(reader.read(), [])
+        for i in range(5):
+            self.writer.publish(i * 0.5, tmag5170_shared_memory.MAGNETIC_X_CHANNEL_ID, -i, -i * 0.25)
+        records = reader.read(max_records = 3)
+        self.assertEqual(records[0], tmag5170_shared_memory.sample_record_type(0, 0.0, 0, 0, 0.0))
+        self.assertEqual([record.sequence for record in records], [0, 1, 2])
+        self.assertEqual([record.value for record in reader.read()], [-0.75, -1.0])
+        self.assertEqual(reader.lost_count, 0)
+        reader.close()
+
+    def test_ring_overrun_and_wrap(self):
+        reader = tmag5170_shared_memory.tmag5170_shared_memory_reader(self.name)
+        for i in range(20):
+            self.writer.publish(float(i), tmag5170_shared_memory.TEMPERATURE_CHANNEL_ID, i, float(i))
+        records = reader.read()
+        self.assertEqual([record.raw_value for record in records], list(range(12, 20)))
+        self.assertEqual(reader.lost_count, 12)
+        oldest_reader = tmag5170_shared_memory.tmag5170_shared_memory_reader(self.name, start_at_oldest = True)
+        self.assertEqual([record.sequence for record in oldest_reader.read()], list(range(12, 20)))
+        oldest_reader.close()
+        reader.close()
+
+    def test_not_ring_buffer(self):
+        self.writer.buffer[0:4] = bytes(4)
+        with self.assertRaises(ValueError):
+            tmag5170_shared_memory.tmag5170_shared_memory_reader(self.name)
+
+    def test_sample_publisher(self):
+        reader = tmag5170_shared_memory.tmag5170_shared_memory_reader(self.name)
+        decoder = lbr.tmga5170_frame_decoder()
+        publisher = tmag5170_shared_memory.tmag5170_sample_publisher(self.writer, Br_X_axis_enum = lbr.tmga5170_frame_decoder.Br_range.TMAG5170A2_150mT_0h)
+        for mosi_value, miso_value in ((0x89000000, 0x00FF0000), (0x8C000000, 0x00447200), (0x04000000, 0x00000000), (0x93000000, 0x000B4000)):
+            raw_frame_record = decoder.decode_raw_frame(tmag5170_capture.add_tmag5170_crc(mosi_value).to_bytes(4, 'big'),
+                                                        tmag5170_capture.add_tmag5170_crc(miso_value).to_bytes(4, 'big'))
+            publisher.publish_raw_frame_record(1.0, raw_frame_record)
+        records = reader.read()
+        self.assertEqual([(tmag5170_shared_memory.channel_name_mapping[record.channel_id], record.raw_value) for record in records],
+                         [("X", -256), ("T", 0x4472), ("A", 0x0B40)])
+        self.assertAlmostEqual(records[0].value, -256 * 300 / 65536)
+        self.assertAlmostEqual(records[1].value, 25.0)
+        self.assertAlmostEqual(records[2].value, 180.0)
+        self.assertEqual(publisher.published_count, 3)
+        reader.close()
+
+    def test_reference_reader_process(self):
+        for i in range(3):
+            self.writer.publish(i * 1e-3, tmag5170_shared_memory.MAGNETIC_Z_CHANNEL_ID, i, i * 2.0)
+        output = subprocess.run([sys.executable, os.path.join(TOOLS_DIRECTORY, 'shared_memory_reader.py'), self.name, '--oldest', '--count', '3', '--timeout', '5'],
+                                capture_output = True, text = True, check = True).stdout
+        self.assertEqual(output.splitlines(), ["0,0.0,Z,0,0.0", "1,0.001,Z,1,2.0", "2,0.002,Z,2,4.0"])
+
+    def tearDown(self):
+        self.writer.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+import tmag5170_statistics
+
+
+class TestLogHistogram(unittest.TestCase):
+    def test_add_and_percentile(self):
+        histogram = tmag5170_statistics.log_histogram()
+        for value in (1e-6, 1.5e-6, 3e-6, 100e-6):
+            histogram.add(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.get_mean(), 26.375e-6)
+        self.assertEqual(histogram.min_value, 1e-6)
+        self.assertEqual(histogram.max_value, 100e-6)
+        self.assertAlmostEqual(histogram.get_percentile(50), 2 ** -19)
+        self.assertEqual(histogram.get_percentile(100), 100e-6)
+        self.assertEqual(sum(count for _, count in histogram.get_buckets()), 4)
+
+    def test_out_of_range_values(self):
+        histogram = tmag5170_statistics.log_histogram(min_exponent = -3, max_exponent = 3)
+        histogram.add(0)
+        histogram.add(1e-9)
+        histogram.add(1e9)
+        self.assertEqual(histogram.bucket_counts, [2, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(tmag5170_statistics.log_histogram().get_percentile(50), None)
+
+
+class TestBusTimingStatistics(unittest.TestCase):
+    def test_summary(self):
+        statistics = tmag5170_statistics.tmag5170_bus_timing_statistics()
+        for i in range(10):
+            start_time = i * 0.001
+            statistics.add_frame(start_time, start_time + 0.0001, "X_CH_RESULT" if i % 2 else "CONV_STATUS", True)
+        statistics.add_frame(0.0101, 0.0102)
+        summary = statistics.get_summary()
+        self.assertEqual(summary['frame_count'], 11)
+        self.assertAlmostEqual(summary['frame_duration_mean_s'], 0.0001)
+        self.assertAlmostEqual(summary['inter_frame_gap_max_s'], 0.001)
+        self.assertAlmostEqual(summary['inter_frame_gap_min_s'], 0.0009)
+        self.assertAlmostEqual(summary['register_read_rates_hz']['X_CH_RESULT'], 5 / 0.0102)
+        self.assertIn("X_CH_RESULT: 490.2 Hz", tmag5170_statistics.tmag5170_bus_timing_statistics.get_summary_str(summary))
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+def get_frame(register_address: int, is_read: bool, data = 0, cmd0 = False) -> int:
+    return (int(is_read) << 31) | (register_address << 24) | (data << 8) | (int(cmd0) << 4)
+
+
+class TestConversionLatencyStatistics(unittest.TestCase):
+    CONV_STATUS_READY = 1 << 13
+
+    def test_triggered_conversions_with_polling(self):
+        statistics = tmag5170_statistics.tmag5170_conversion_latency_statistics()
+        for conversion in range(3):
+            time = conversion * 0.001
+            # Trigger by CMD0 of dummy read, then two polls without RDY and one with RDY
+            statistics.add_frame(time, time + 0.00001, get_frame(0x08, True, cmd0 = True), 0)
+            statistics.add_frame(time + 0.0001, time + 0.00011, get_frame(0x08, True), 0)
+            statistics.add_frame(time + 0.0002, time + 0.00021, get_frame(0x08, True), 0)
+            statistics.add_frame(time + 0.0003, time + 0.00031, get_frame(0x08, True), get_frame(0, False, self.CONV_STATUS_READY))
+            statistics.add_frame(time + 0.0004, time + 0.00041, get_frame(0x09, True), 0)
+            # Further result reads belong to the same conversion
+            statistics.add_frame(time + 0.0005, time + 0.00051, get_frame(0x0A, True), 0)
+        summary = statistics.get_summary()
+        self.assertEqual(summary['conversion_count'], 3)
+        self.assertEqual(summary['incomplete_conversion_count'], 0)
+        self.assertAlmostEqual(summary['trigger_to_ready_mean_s'], 0.00029)
+        self.assertAlmostEqual(summary['trigger_to_result_max_s'], 0.0004)
+        self.assertAlmostEqual(summary['ready_to_result_mean_s'], 0.00011)
+        self.assertEqual(summary['polls_per_conversion'], {3: 3})
+        self.assertAlmostEqual(summary['polling_time_total_s'], 9 * 0.00001)
+        self.assertIn("polls per conversion mean: 3.00", tmag5170_statistics.tmag5170_conversion_latency_statistics.get_summary_str(summary))
+
+    def test_result_read_with_next_trigger(self):
+        statistics = tmag5170_statistics.tmag5170_conversion_latency_statistics()
+        statistics.add_frame(0.0, 0.00001, get_frame(0x09, True, cmd0 = True), 0)
+        statistics.add_frame(0.001, 0.00101, get_frame(0x09, True, cmd0 = True), 0)
+        # Triggers without result read are incomplete
+        statistics.add_frame(0.002, 0.00201, get_frame(0x08, True, cmd0 = True), 0)
+        statistics.add_frame(0.003, 0.00301, get_frame(0x08, True, cmd0 = True), 0)
+        summary = statistics.get_summary()
+        self.assertEqual(summary['conversion_count'], 1)
+        self.assertEqual(summary['incomplete_conversion_count'], 2)
+        self.assertAlmostEqual(summary['trigger_to_result_mean_s'], 0.001)
+        self.assertEqual(summary['polls_per_conversion'], {0: 1})
+        self.assertEqual(summary['trigger_to_ready_mean_s'], None)
+
+    def test_trigger_mode_and_continuous_mode(self):
+        statistics = tmag5170_statistics.tmag5170_conversion_latency_statistics()
+        # TRIGGER_MODE = 1h (chip select pulse), CMD0 does not start conversion
+        statistics.add_frame(0.0, 0.00001, get_frame(0x02, False, 1 << 9), 0)
+        statistics.add_frame(0.001, 0.00101, get_frame(0x08, True, cmd0 = True), get_frame(0, False, self.CONV_STATUS_READY))
+        statistics.add_frame(0.002, 0.00201, get_frame(0x09, True), 0)
+        statistics.add_frame(0.003, 0.00301, get_frame(0x09, True), 0)
+        summary = statistics.get_summary()
+        self.assertEqual(summary['conversion_count'], 1)
+        self.assertEqual(summary['trigger_to_result_mean_s'], None)
+        self.assertAlmostEqual(summary['ready_to_result_mean_s'], 0.00101)
+        self.assertEqual(summary['polls_per_conversion'], {1: 1})
+
+    def test_12_bit_data_access(self):
+        statistics = tmag5170_statistics.tmag5170_conversion_latency_statistics(is_12_bit_data_access = True)
+        statistics.add_frame(0.0, 0.00001, get_frame(0x08, True, cmd0 = True), 0)
+        statistics.add_frame(0.001, 0.00101, get_frame(0x08, True), 0xFFFFFFFF)
+        summary = statistics.get_summary()
+        self.assertEqual(summary['conversion_count'], 1)
+        self.assertEqual(summary['polls_per_conversion'], {0: 1})
+        self.assertAlmostEqual(summary['trigger_to_result_mean_s'], 0.001)
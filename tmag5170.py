@@ -17,6 +17,35 @@ TMAG5170_16_BIT_SPI_DATA_MASK = 0xFFFF
 
 TMAG5170_SINGLE_FRAME_BYTE_SIZE = 4
 
+SYSTEM_CONFIG_ADDRESS = 0x02
+X_THRX_CONFIG_ADDRESS = 0x04
+Y_THRX_CONFIG_ADDRESS = 0x05
+Z_THRX_CONFIG_ADDRESS = 0x06
+T_THRX_CONFIG_ADDRESS = 0x07
+CONV_STATUS_ADDRESS = 0x08
+X_CH_RESULT_ADDRESS = 0x09
+Y_CH_RESULT_ADDRESS = 0x0A
+Z_CH_RESULT_ADDRESS = 0x0B
+TEMP_RESULT_ADDRESS = 0x0C
+ANGLE_RESULT_ADDRESS = 0x13
+MAGNITUDE_RESULT_ADDRESS = 0x14
+
+MEASUREMENT_REGISTER_ADDRESSES = frozenset((X_CH_RESULT_ADDRESS, Y_CH_RESULT_ADDRESS, Z_CH_RESULT_ADDRESS, TEMP_RESULT_ADDRESS, ANGLE_RESULT_ADDRESS, MAGNITUDE_RESULT_ADDRESS))
+
+# CMD0 of MOSI frame starts conversion (TRIGGER_MODE = 0h), RDY of CONV_STATUS signals finished conversion
+CONVERSION_START_CMD_BIT_POSITION = 4
+CONV_STATUS_RDY_BIT_POSITION = 13
+TRIGGER_MODE_POSITION = 9
+TRIGGER_MODE_MASK = 0x03
+TRIGGER_MODE_SPI_COMMAND = 0x00
+
+CHANNEL_X_TOKEN = "X"
+CHANNEL_Y_TOKEN = "Y"
+CHANNEL_Z_TOKEN = "Z"
+CHANNEL_T_TOKEN = "T"
+THRESHOLD_HI_TOKEN = "HI"
+THRESHOLD_LO_TOKEN = "LO"
+
 def get_masked_value (value: int, position: int, mask: int) -> int:
     return ((value  >> position)& mask) 
 
@@ -57,6 +86,22 @@ def int_to_hex_string(value:int, leadingZeros:int = 0):
         hex_string = f"{value:X}"
         return f"0x{hex_string:0>{leadingZeros}}"
     
+burst_frame_type = collections.namedtuple('burst_frame_type', ['first_byte_index', 'last_byte_index', 'mosi_raw_data', 'miso_raw_data'])
+
+def split_burst_into_frames(mosi_raw_data, miso_raw_data):
+    '''
+    Slice data of one chip select transaction into 4 byte tmag5170 frames.
+    Bytes left after last full frame are returned as last, shorter frame, so length error can be reported for them.
+    '''
+    frames = []
+    byte_count = max(len(mosi_raw_data), len(miso_raw_data))
+    for first_byte_index in range(0, byte_count, TMAG5170_SINGLE_FRAME_BYTE_SIZE):
+        end_byte_index = min(first_byte_index + TMAG5170_SINGLE_FRAME_BYTE_SIZE, byte_count)
+        frames.append(burst_frame_type(first_byte_index, end_byte_index - 1,
+                                       mosi_raw_data[first_byte_index:end_byte_index],
+                                       miso_raw_data[first_byte_index:end_byte_index]))
+    return frames
+
 def int_none_verificatio(value:int):
     if value == None:
         return ""
@@ -107,49 +152,97 @@ class tmga5170_frame_decoder:
     __tmag5170_mapping_type = collections.namedtuple('__tmag5170_mapping_type', ['Acronym', 'DecodingFunction'])
     crc_4_bit_group_type = collections.namedtuple('crc_4_bit_group_type', ['crc_status','crc_calculated','crc_from_bus'])
     cmd_stat_4_bit_group_type = collections.namedtuple('cmd_stat_4_bit_group_type', ['cmd3', 'cmd2', 'cmd1', 'cmd0', 'error_stat', 'stat_2_0'])
-    address_8bit_register_16bit_group_type = collections.namedtuple('address_8bit_register_16bit_group_type', ['read_write','register_address','register_name','register_decoding','register_value'])
+    address_8bit_register_16bit_group_type = collections.namedtuple('address_8bit_register_16bit_group_type', ['read_write','register_address','register_name','register_decoding','register_value','register_fields'], defaults = (None,))
     stat_8_bit_group_type = collections.namedtuple('stat_8_bit_group_type', ['prev_crc_stat','cfg_reset_stat','sys_alrt_status1_stat','afe_alrt_status0_stat','x_stat','y_stat','z_stat','t_stat'])
-    data_24_bit_group_type = collections.namedtuple('data_24_bit_group_type', ['read_write', 'ch1_value', 'ch2_value','register_address','register_name','register_decoding','register_value', 'ch1_si_value_str', 'ch2_si_value_str'])
+    data_24_bit_group_type = collections.namedtuple('data_24_bit_group_type', ['read_write', 'ch1_value', 'ch2_value','register_address','register_name','register_decoding','register_value', 'ch1_si_value_str', 'ch2_si_value_str', 'register_fields'], defaults = (None,))
+    register_field_type = collections.namedtuple('register_field_type', ['name', 'position', 'mask', 'signed_bits'])
+    field_value_type = collections.namedtuple('field_value_type', ['value', 'unit'])
+    # Result of settings independent decoding phase, only plain values so it can be cached and pickled
+    raw_frame_record_type = collections.namedtuple('raw_frame_record_type', ['mosi_value', 'miso_value', 'length_err_msg', 'mosi_crc_calculated', 'miso_crc_calculated'])
 
     def __init__(self, enable__cmd_stat_4_bit_group = True, enable__stat_8_bit_group = True, crc_enabled = True, 
                  data_type: DataType  = DataType.default_32bit_access, 
                  Br_X_axis_enum :Br_range = Br_range.TMAG5170_NotSelected,
                  Br_Y_axis_enum :Br_range = Br_range.TMAG5170_NotSelected,
                  Br_Z_axis_enum :Br_range = Br_range.TMAG5170_NotSelected,
-                 TempAngleConvEn:Temp_Angle_Conv = Temp_Angle_Conv.enabled):
-        self.__Tmag5170_register_mapping = {
-            0x00: self.__tmag5170_mapping_type("DEVICE_CONFIG"    ,    self.__DEVICE_CONFIG_DecodingFunction)     ,
-            0x01: self.__tmag5170_mapping_type("SENSOR_CONFIG"    ,    self.__SENSOR_CONFIG_DecodingFunction)     ,
-            0x02: self.__tmag5170_mapping_type("SYSTEM_CONFIG"    ,    self.__SYSTEM_CONFIG_DecodingFunction)     ,
-            0x03: self.__tmag5170_mapping_type("ALERT_CONFIG"     ,    self.__ALERT_CONFIG_DecodingFunction)      ,
-            0x04: self.__tmag5170_mapping_type("X_THRX_CONFIG"    ,    self.__X_THRX_CONFIG_DecodingFunction)     ,
-            0x05: self.__tmag5170_mapping_type("Y_THRX_CONFIG"    ,    self.__Y_THRX_CONFIG_DecodingFunction)     ,
-            0x06: self.__tmag5170_mapping_type("Z_THRX_CONFIG"    ,    self.__Z_THRX_CONFIG_DecodingFunction)     ,
-            0x07: self.__tmag5170_mapping_type("T_THRX_CONFIG"    ,    self.__T_THRX_CONFIG_DecodingFunction)     ,
-            0x08: self.__tmag5170_mapping_type("CONV_STATUS"      ,    self.__CONV_STATUS_DecodingFunction)       ,
-            0x09: self.__tmag5170_mapping_type("X_CH_RESULT"      ,    self.__X_CH_RESULT_DecodingFunction)       ,
-            0x0A: self.__tmag5170_mapping_type("Y_CH_RESULT"      ,    self.__Y_CH_RESULT_DecodingFunction)       ,
-            0x0B: self.__tmag5170_mapping_type("Z_CH_RESULT"      ,    self.__Z_CH_RESULT_DecodingFunction)       ,
-            0x0C: self.__tmag5170_mapping_type("TEMP_RESULT"      ,    self.__TEMP_RESULT_DecodingFunction)       ,
-            0x0D: self.__tmag5170_mapping_type("AFE_STATUS"       ,    self.__AFE_STATUS_DecodingFunction)        ,
-            0x0E: self.__tmag5170_mapping_type("SYS_STATUS"       ,    self.__SYS_STATUS_DecodingFunction)        ,
-            0x0F: self.__tmag5170_mapping_type("TEST_CONFIG"      ,    self.__TEST_CONFIG_DecodingFunction)       ,
-            0x10: self.__tmag5170_mapping_type("OSC_MONITOR"      ,    self.__OSC_MONITOR_DecodingFunction)       ,
-            0x11: self.__tmag5170_mapping_type("MAG_GAIN_CONFIG"  ,    self.__MAG_GAIN_CONFIG_DecodingFunction)   ,
-            0x12: self.__tmag5170_mapping_type("MAG_OFFSET_CONFIG",    self.__MAG_OFFSET_CONFIG_DecodingFunction) ,
-            0x13: self.__tmag5170_mapping_type("ANGLE_RESULT"     ,    self.__ANGLE_RESULT_DecodingFunction)      ,
-            0x14: self.__tmag5170_mapping_type("MAGNITUDE_RESULT" ,    self.__MAGNITUDE_RESULT_DecodingFunction)
-        }
+                 TempAngleConvEn:Temp_Angle_Conv = Temp_Angle_Conv.enabled,
+                 device_context = None,
+                 decimation_factor = 1,
+                 decimation_interval = 0):
         self.mosi_value = None
         self.miso_value = None
+        # Only every decimation_factor-th measurement frame, not closer than decimation_interval [s] to previous one, is fully decoded,
+        # counters are kept in device context, so every device on the bus is decimated separately
+        self.decimation_factor = decimation_factor
+        self.decimation_interval = decimation_interval
         self.enable__cmd_stat_4_bit_group = enable__cmd_stat_4_bit_group
         self.enable__stat_8_bit_group = enable__stat_8_bit_group
         self.crc_enabled = crc_enabled
-        self.data_type = data_type
-        self.Br_X_axis_enum = Br_X_axis_enum
-        self.Br_Y_axis_enum = Br_Y_axis_enum
-        self.Br_Z_axis_enum = Br_Z_axis_enum
-        self.TempAngleConvEn = TempAngleConvEn
+        if device_context == None:
+            device_context = tmag5170_device_context(data_type = data_type,
+                                                     Br_X_axis_enum = Br_X_axis_enum,
+                                                     Br_Y_axis_enum = Br_Y_axis_enum,
+                                                     Br_Z_axis_enum = Br_Z_axis_enum,
+                                                     TempAngleConvEn = TempAngleConvEn)
+        self.device_context = device_context
+
+    @classmethod
+    def from_config(cls, config, mosi_value = None, miso_value = None):
+        '''
+        Decoder of single frame over immutable tmag5170_decoder_config, used by decode().
+        Config is used as device context, so data_type, Br_*_axis_enum and TempAngleConvEn read it and setting them raises AttributeError.
+        '''
+        decoder = cls(enable__cmd_stat_4_bit_group = config.enable__cmd_stat_4_bit_group,
+                      enable__stat_8_bit_group = config.enable__stat_8_bit_group,
+                      device_context = config)
+        decoder.mosi_value = mosi_value
+        decoder.miso_value = miso_value
+        return decoder
+
+    # Device configuration lives in the selected device context, so one decoder can serve several sensors
+    @property
+    def data_type(self):
+        return self.device_context.data_type
+
+    @data_type.setter
+    def data_type(self, value):
+        self.device_context.data_type = value
+
+    @property
+    def Br_X_axis_enum(self):
+        return self.device_context.Br_X_axis_enum
+
+    @Br_X_axis_enum.setter
+    def Br_X_axis_enum(self, value):
+        self.device_context.Br_X_axis_enum = value
+
+    @property
+    def Br_Y_axis_enum(self):
+        return self.device_context.Br_Y_axis_enum
+
+    @Br_Y_axis_enum.setter
+    def Br_Y_axis_enum(self, value):
+        self.device_context.Br_Y_axis_enum = value
+
+    @property
+    def Br_Z_axis_enum(self):
+        return self.device_context.Br_Z_axis_enum
+
+    @Br_Z_axis_enum.setter
+    def Br_Z_axis_enum(self, value):
+        self.device_context.Br_Z_axis_enum = value
+
+    @property
+    def TempAngleConvEn(self):
+        return self.device_context.TempAngleConvEn
+
+    @TempAngleConvEn.setter
+    def TempAngleConvEn(self, value):
+        self.device_context.TempAngleConvEn = value
+
+    def select_device_context(self, device_context):
+        self.device_context = device_context
+
     @staticmethod 
     def __MAG_OFFSET_CONFIG_DecodingFunction(data: int):
         OFFSET_SELECTION_15_14 = get_masked_value(data, 14,    0x0003)
@@ -164,7 +257,7 @@ f"[15-14] OFFSET_SELECTION: {int_to_hex_string(OFFSET_SELECTION_15_14)}, \
     def __MAG_GAIN_CONFIG_DecodingFunction(data: int):
         GAIN_SELECTION_15_14 = get_masked_value(data, 14,    0x0003)
         RESERVED_13_11       = get_masked_value(data, 11,    0x0007)
-        GAIN_VALUE_10_0      = get_masked_value(data, 10,    0x07FF)
+        GAIN_VALUE_10_0      = get_masked_value(data, 0,     0x07FF)
         return    \
 f"[15-14] GAIN_SELECTION: {int_to_hex_string(GAIN_SELECTION_15_14)}, \
 [13-11] RESERVED: {int_to_hex_string(RESERVED_13_11)}, \
@@ -241,7 +334,7 @@ f"[15-14] ANGLE_EN: {int_to_hex_string(ANGLE_EN_15_14)}, \
     @staticmethod
     def __DEVICE_CONFIG_DecodingFunction(data: int):
         RESERVED_15         = get_masked_value(data, 15,    0x0001)
-        CONV_AVG_14_12      = get_masked_value(data, 12,    0x0003)
+        CONV_AVG_14_12      = get_masked_value(data, 12,    0x0007)
         RESERVED_11_10      = get_masked_value(data, 10,    0x0003)
         MAG_TEMPCO_9_8      = get_masked_value(data, 8,     0x0003)
         RESERVED_7          = get_masked_value(data, 7,     0x0001)
@@ -249,7 +342,7 @@ f"[15-14] ANGLE_EN: {int_to_hex_string(ANGLE_EN_15_14)}, \
         T_CH_EN_3           = get_masked_value(data, 3,     0x0001)
         T_RATE_2            = get_masked_value(data, 2,     0x0001)
         T_HLT_EN_1          = get_masked_value(data, 1,     0x0001)
-        RESERVED_0          = get_masked_value(data, 0,     0x0003)
+        RESERVED_0          = get_masked_value(data, 0,     0x0001)
         return    \
 f"[15] RESERVED: {int_to_hex_string(RESERVED_15)}, \
 [14-12] CONV_AVG: {int_to_hex_string(CONV_AVG_14_12)}, \
@@ -308,18 +401,18 @@ f"[15-14] RESERVED: {int_to_hex_string(RESERVED_15_14)}, \
     def __Y_THRX_CONFIG_DecodingFunction(self, data: int):
         Y_HI_THRESHOLD_15_8 = uint8_to_int8(get_masked_value(data, 8, 0xFF))
         Y_LO_THRESHOLD_7_0  = uint8_to_int8(get_masked_value(data, 0, 0xFF))
-        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Y_HI_THRESHOLD_15_8, self.Br_X_axis_enum)
+        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Y_HI_THRESHOLD_15_8, self.Br_Y_axis_enum)
         hi_threshold_str = tmga5170_frame_decoder.get_magnetic_field_str(threshold_si)
-        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Y_LO_THRESHOLD_7_0, self.Br_X_axis_enum)
+        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Y_LO_THRESHOLD_7_0, self.Br_Y_axis_enum)
         lo_threshold_str = tmga5170_frame_decoder.get_magnetic_field_str(threshold_si)
         return f"[15-8] Y_HI_THRESHOLD: {Y_HI_THRESHOLD_15_8} {hi_threshold_str}, [7-0] Y_LO_THRESHOLD: {Y_LO_THRESHOLD_7_0} {lo_threshold_str}"
 
     def __Z_THRX_CONFIG_DecodingFunction(self, data: int):
         Z_HI_THRESHOLD_15_8 = uint8_to_int8(get_masked_value(data, 8, 0xFF))
         Z_LO_THRESHOLD_7_0  = uint8_to_int8(get_masked_value(data, 0, 0xFF))
-        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Z_HI_THRESHOLD_15_8, self.Br_X_axis_enum)
+        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Z_HI_THRESHOLD_15_8, self.Br_Z_axis_enum)
         hi_threshold_str = tmga5170_frame_decoder.get_magnetic_field_str(threshold_si)
-        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Z_LO_THRESHOLD_7_0, self.Br_X_axis_enum)
+        threshold_si = tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(Z_LO_THRESHOLD_7_0, self.Br_Z_axis_enum)
         lo_threshold_str = tmga5170_frame_decoder.get_magnetic_field_str(threshold_si)
         return f"[15-8] Z_HI_THRESHOLD: {Z_HI_THRESHOLD_15_8} {hi_threshold_str}, [7-0] Z_LO_THRESHOLD: {Z_LO_THRESHOLD_7_0} {lo_threshold_str}"
 
@@ -528,6 +621,138 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
     def __dummyDecodingFunction(data: int):
         return "Not yet implemented"
     
+    # Shared by all decoder instances, DecodingFunction is bound to the decoder on call
+    __Tmag5170_register_mapping = {
+        0x00: __tmag5170_mapping_type("DEVICE_CONFIG"    ,    __DEVICE_CONFIG_DecodingFunction)     ,
+        0x01: __tmag5170_mapping_type("SENSOR_CONFIG"    ,    __SENSOR_CONFIG_DecodingFunction)     ,
+        0x02: __tmag5170_mapping_type("SYSTEM_CONFIG"    ,    __SYSTEM_CONFIG_DecodingFunction)     ,
+        0x03: __tmag5170_mapping_type("ALERT_CONFIG"     ,    __ALERT_CONFIG_DecodingFunction)      ,
+        0x04: __tmag5170_mapping_type("X_THRX_CONFIG"    ,    __X_THRX_CONFIG_DecodingFunction)     ,
+        0x05: __tmag5170_mapping_type("Y_THRX_CONFIG"    ,    __Y_THRX_CONFIG_DecodingFunction)     ,
+        0x06: __tmag5170_mapping_type("Z_THRX_CONFIG"    ,    __Z_THRX_CONFIG_DecodingFunction)     ,
+        0x07: __tmag5170_mapping_type("T_THRX_CONFIG"    ,    __T_THRX_CONFIG_DecodingFunction)     ,
+        0x08: __tmag5170_mapping_type("CONV_STATUS"      ,    __CONV_STATUS_DecodingFunction)       ,
+        0x09: __tmag5170_mapping_type("X_CH_RESULT"      ,    __X_CH_RESULT_DecodingFunction)       ,
+        0x0A: __tmag5170_mapping_type("Y_CH_RESULT"      ,    __Y_CH_RESULT_DecodingFunction)       ,
+        0x0B: __tmag5170_mapping_type("Z_CH_RESULT"      ,    __Z_CH_RESULT_DecodingFunction)       ,
+        0x0C: __tmag5170_mapping_type("TEMP_RESULT"      ,    __TEMP_RESULT_DecodingFunction)       ,
+        0x0D: __tmag5170_mapping_type("AFE_STATUS"       ,    __AFE_STATUS_DecodingFunction)        ,
+        0x0E: __tmag5170_mapping_type("SYS_STATUS"       ,    __SYS_STATUS_DecodingFunction)        ,
+        0x0F: __tmag5170_mapping_type("TEST_CONFIG"      ,    __TEST_CONFIG_DecodingFunction)       ,
+        0x10: __tmag5170_mapping_type("OSC_MONITOR"      ,    __OSC_MONITOR_DecodingFunction)       ,
+        0x11: __tmag5170_mapping_type("MAG_GAIN_CONFIG"  ,    __MAG_GAIN_CONFIG_DecodingFunction)   ,
+        0x12: __tmag5170_mapping_type("MAG_OFFSET_CONFIG",    __MAG_OFFSET_CONFIG_DecodingFunction) ,
+        0x13: __tmag5170_mapping_type("ANGLE_RESULT"     ,    __ANGLE_RESULT_DecodingFunction)      ,
+        0x14: __tmag5170_mapping_type("MAGNITUDE_RESULT" ,    __MAGNITUDE_RESULT_DecodingFunction)
+    }
+
+    # Numeric fields of every register, same layout as used by DecodingFunctions, RESERVED fields are skipped.
+    # signed_bits != 0 marks two's complement field of given width.
+    __Tmag5170_register_fields = {
+        0x00: (register_field_type("CONV_AVG", 12, 0x0007, 0), register_field_type("MAG_TEMPCO", 8, 0x0003, 0), register_field_type("OPERATING_MODE", 4, 0x0007, 0),
+               register_field_type("T_CH_EN", 3, 0x0001, 0), register_field_type("T_RATE", 2, 0x0001, 0), register_field_type("T_HLT_EN", 1, 0x0001, 0)),
+        0x01: (register_field_type("ANGLE_EN", 14, 0x0003, 0), register_field_type("SLEEPTIME", 10, 0x000F, 0), register_field_type("MAG_CH_EN", 6, 0x000F, 0),
+               register_field_type("Z_RANGE", 4, 0x0003, 0), register_field_type("Y_RANGE", 2, 0x0003, 0), register_field_type("X_RANGE", 0, 0x0003, 0)),
+        0x02: (register_field_type("DIAG_SEL", 12, 0x0003, 0), register_field_type("TRIGGER_MODE", 9, 0x0003, 0), register_field_type("DATA_TYPE", 6, 0x0007, 0),
+               register_field_type("DIAG_EN", 5, 0x0001, 0), register_field_type("Z_HLT_EN", 2, 0x0001, 0), register_field_type("Y_HLT_EN", 1, 0x0001, 0),
+               register_field_type("X_HLT_EN", 0, 0x0001, 0)),
+        0x03: (register_field_type("ALERT_LATCH", 13, 0x0001, 0), register_field_type("ALERT_MODE", 12, 0x0001, 0), register_field_type("STATUS_ALRT", 11, 0x0001, 0),
+               register_field_type("RSLT_ALRT", 8, 0x0001, 0), register_field_type("THRX_COUNT", 4, 0x0003, 0), register_field_type("T_THRX_ALRT", 3, 0x0001, 0),
+               register_field_type("Z_THRX_ALRT", 2, 0x0001, 0), register_field_type("Y_THRX_ALRT", 1, 0x0001, 0), register_field_type("X_THRX_ALRT", 0, 0x0001, 0)),
+        0x04: (register_field_type("X_HI_THRESHOLD", 8, 0x00FF, 8), register_field_type("X_LO_THRESHOLD", 0, 0x00FF, 8)),
+        0x05: (register_field_type("Y_HI_THRESHOLD", 8, 0x00FF, 8), register_field_type("Y_LO_THRESHOLD", 0, 0x00FF, 8)),
+        0x06: (register_field_type("Z_HI_THRESHOLD", 8, 0x00FF, 8), register_field_type("Z_LO_THRESHOLD", 0, 0x00FF, 8)),
+        0x07: (register_field_type("T_HI_THRESHOLD", 8, 0x00FF, 8), register_field_type("T_LO_THRESHOLD", 0, 0x00FF, 8)),
+        0x08: (register_field_type("RDY", 13, 0x0001, 0), register_field_type("A", 12, 0x0001, 0), register_field_type("T", 11, 0x0001, 0),
+               register_field_type("Z", 10, 0x0001, 0), register_field_type("Y", 9, 0x0001, 0), register_field_type("X", 8, 0x0001, 0),
+               register_field_type("SET_COUNT", 4, 0x0007, 0), register_field_type("ALRT_STATUS", 0, 0x0003, 0)),
+        0x09: (register_field_type("X_CH_RESULT", 0, 0xFFFF, 16),),
+        0x0A: (register_field_type("Y_CH_RESULT", 0, 0xFFFF, 16),),
+        0x0B: (register_field_type("Z_CH_RESULT", 0, 0xFFFF, 16),),
+        0x0C: (register_field_type("TEMP_RESULT", 0, 0xFFFF, 0),),
+        0x0D: (register_field_type("CFG_RESET", 15, 0x0001, 0), register_field_type("SENS_STAT", 12, 0x0001, 0), register_field_type("TEMP_STAT", 11, 0x0001, 0),
+               register_field_type("ZHS_STAT", 10, 0x0001, 0), register_field_type("YHS_STAT", 9, 0x0001, 0), register_field_type("XHS_STAT", 8, 0x0001, 0),
+               register_field_type("TRIM_STAT", 1, 0x0001, 0), register_field_type("LDO_STAT", 0, 0x0001, 0)),
+        0x0E: (register_field_type("ALRT_LVL", 15, 0x0001, 0), register_field_type("ALRT_DRV", 14, 0x0001, 0), register_field_type("SDO_DRV", 13, 0x0001, 0),
+               register_field_type("CRC_STAT", 12, 0x0001, 0), register_field_type("FRAME_STAT", 11, 0x0001, 0), register_field_type("OPERATING_STAT", 8, 0x0007, 0),
+               register_field_type("VCC_OV", 5, 0x0001, 0), register_field_type("VCC_UV", 4, 0x0001, 0), register_field_type("TEMP_THX", 3, 0x0001, 0),
+               register_field_type("ZCH_THX", 2, 0x0001, 0), register_field_type("YCH_THX", 1, 0x0001, 0), register_field_type("XCH_THX", 0, 0x0001, 0)),
+        0x0F: (register_field_type("VER", 4, 0x0003, 0), register_field_type("CRC_DIS", 2, 0x0001, 0), register_field_type("OSC_CNT_CTL", 0, 0x0003, 0)),
+        0x10: (register_field_type("OSC_COUNT", 0, 0xFFFF, 0),),
+        0x11: (register_field_type("GAIN_SELECTION", 14, 0x0003, 0), register_field_type("GAIN_VALUE", 0, 0x07FF, 0)),
+        0x12: (register_field_type("OFFSET_SELECTION", 14, 0x0003, 0), register_field_type("OFFSET_VALUE1", 7, 0x007F, 7), register_field_type("OFFSET_VALUE2", 0, 0x007F, 7)),
+        0x13: (register_field_type("ANGLE_RESULT", 0, 0xFFFF, 0),),
+        0x14: (register_field_type("MAGNITUDE_RESULT", 0, 0xFFFF, 0),),
+    }
+
+    MILI_TESLA_UNIT = "mT"
+    CELSIUS_UNIT = "Celsius"
+    DEGREE_UNIT = "Degrees"
+
+    # Unit of SI fields added by get_register_fields (temperature and angle only with TempAngleConvEn enabled)
+    __Tmag5170_register_field_si_units = {
+        X_THRX_CONFIG_ADDRESS: MILI_TESLA_UNIT,
+        Y_THRX_CONFIG_ADDRESS: MILI_TESLA_UNIT,
+        Z_THRX_CONFIG_ADDRESS: MILI_TESLA_UNIT,
+        T_THRX_CONFIG_ADDRESS: CELSIUS_UNIT,
+        X_CH_RESULT_ADDRESS: MILI_TESLA_UNIT,
+        Y_CH_RESULT_ADDRESS: MILI_TESLA_UNIT,
+        Z_CH_RESULT_ADDRESS: MILI_TESLA_UNIT,
+        TEMP_RESULT_ADDRESS: CELSIUS_UNIT,
+        ANGLE_RESULT_ADDRESS: DEGREE_UNIT,
+    }
+
+    @classmethod
+    def get_register_field_names(cls):
+        '''
+        Names of all fields get_register_fields can return, in register order, SI field follows its raw field.
+        '''
+        names = []
+        for register_index, register_fields in cls.__Tmag5170_register_fields.items():
+            for register_field in register_fields:
+                names.append(register_field.name)
+                if register_index in cls.__Tmag5170_register_field_si_units:
+                    names.append(f"{register_field.name}_{cls.__Tmag5170_register_field_si_units[register_index]}")
+        return tuple(names)
+
+    def get_register_fields(self, register_index, data_32_bit_spi):
+        '''
+        Numeric fields of register as dictionary name -> field_value_type(value, unit).
+        Raw fields have empty unit, SI values are added as separate fields with unit suffix in name, e.g. X_CH_RESULT_mT.
+        '''
+        fields = {}
+        if register_index not in self.__Tmag5170_register_fields or data_32_bit_spi == None:
+            return fields
+        data_16_bit_spi = self.get_16_bit_spi_data_tmag5170(data_32_bit_spi)
+        for register_field in self.__Tmag5170_register_fields[register_index]:
+            value = (data_16_bit_spi >> register_field.position) & register_field.mask
+            if register_field.signed_bits != 0:
+                sign = 1 << (register_field.signed_bits - 1)
+                value = (value ^ sign) - sign
+            fields[register_field.name] = tmga5170_frame_decoder.field_value_type(value, "")
+
+        si_values = ()
+        if register_index in (X_THRX_CONFIG_ADDRESS, Y_THRX_CONFIG_ADDRESS, Z_THRX_CONFIG_ADDRESS):
+            Br_range = (self.Br_X_axis_enum, self.Br_Y_axis_enum, self.Br_Z_axis_enum)[register_index - X_THRX_CONFIG_ADDRESS]
+            si_values = tuple((name, tmga5170_frame_decoder.convert_magnetic_field_threshold_to_miliTeslas(field.value, Br_range), tmga5170_frame_decoder.MILI_TESLA_UNIT)
+                              for name, field in fields.items())
+        elif register_index == T_THRX_CONFIG_ADDRESS and self.TempAngleConvEn == tmga5170_frame_decoder.Temp_Angle_Conv.enabled:
+            si_values = (("T_HI_THRESHOLD", tmga5170_frame_decoder.convert_temparature_threshold_to_celsius(fields["T_HI_THRESHOLD"].value, tmga5170_frame_decoder.DEFAULT_VALUE_HI_THR, tmga5170_frame_decoder.DEFAULT_VALUE_HI_THR_TEMP), tmga5170_frame_decoder.CELSIUS_UNIT),
+                         ("T_LO_THRESHOLD", tmga5170_frame_decoder.convert_temparature_threshold_to_celsius(fields["T_LO_THRESHOLD"].value, tmga5170_frame_decoder.DEFAULT_VALUE_LO_THR, tmga5170_frame_decoder.DEFAULT_VALUE_LO_THR_TEMP), tmga5170_frame_decoder.CELSIUS_UNIT))
+        elif register_index in (X_CH_RESULT_ADDRESS, Y_CH_RESULT_ADDRESS, Z_CH_RESULT_ADDRESS):
+            Br_range = (self.Br_X_axis_enum, self.Br_Y_axis_enum, self.Br_Z_axis_enum)[register_index - X_CH_RESULT_ADDRESS]
+            name, field = next(iter(fields.items()))
+            si_values = ((name, tmga5170_frame_decoder.convert_raw_magnetic_field_to_miliTeslas(field.value, tmga5170_frame_decoder.DataType.default_32bit_access, Br_range), tmga5170_frame_decoder.MILI_TESLA_UNIT),)
+        elif register_index == TEMP_RESULT_ADDRESS and self.TempAngleConvEn == tmga5170_frame_decoder.Temp_Angle_Conv.enabled:
+            si_values = (("TEMP_RESULT", tmga5170_frame_decoder.convert_raw_temp_to_celsius(data_16_bit_spi, tmga5170_frame_decoder.DataType.default_32bit_access), tmga5170_frame_decoder.CELSIUS_UNIT),)
+        elif register_index == ANGLE_RESULT_ADDRESS and self.TempAngleConvEn == tmga5170_frame_decoder.Temp_Angle_Conv.enabled:
+            si_values = (("ANGLE_RESULT", tmga5170_frame_decoder.convert_raw_angle_to_deg(data_16_bit_spi, tmga5170_frame_decoder.DataType.default_32bit_access), tmga5170_frame_decoder.DEGREE_UNIT),)
+
+        for name, value, unit in si_values:
+            if value != None:
+                fields[f"{name}_{unit}"] = tmga5170_frame_decoder.field_value_type(value, unit)
+        return fields
+
     @staticmethod
     def get_16_bit_spi_data_tmag5170 (value):
         if(value != None):
@@ -547,7 +772,7 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
         retString = "Error, not possible index value"
         if register_index in self.__Tmag5170_register_mapping:
             data_16_bit_spi = self.get_16_bit_spi_data_tmag5170(data_32_bit_spi)
-            retString = self.__Tmag5170_register_mapping[register_index].DecodingFunction(data_16_bit_spi)
+            retString = self.__Tmag5170_register_mapping[register_index].DecodingFunction.__get__(self)(data_16_bit_spi)
         return retString
 
     @staticmethod
@@ -583,6 +808,100 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
             str_value = LENGTH_ERROR_TOKEN
         return str_value
         
+    def update_device_context(self, length_err_msg, miso_crc_group, mosi_crc_group):
+        context = self.device_context
+        context.frame_count = context.frame_count + 1
+        if length_err_msg != "":
+            context.length_error_count = context.length_error_count + 1
+            return
+        if miso_crc_group.crc_status == CRC_ERROR_TOKEN or mosi_crc_group.crc_status == CRC_ERROR_TOKEN:
+            context.crc_error_count = context.crc_error_count + 1
+            return
+        register_address = self.get_register_index_from_tmag5170_frame(self.mosi_value)
+        if get_bit(self.mosi_value, READ_WRITE_BIT_POSITION) == 1:
+            # In 12-bit data access MISO carries channel data instead of the register content
+            if self.data_type == tmga5170_frame_decoder.DataType.default_32bit_access:
+                context.register_shadow[register_address] = tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.miso_value)
+        else:
+            context.register_shadow[register_address] = tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.mosi_value)
+
+    def is_measurement_frame(self):
+        if get_bit(self.mosi_value, READ_WRITE_BIT_POSITION) == 0:
+            return False
+        if self.data_type == tmga5170_frame_decoder.DataType.default_32bit_access:
+            return self.get_register_index_from_tmag5170_frame(self.mosi_value) in MEASUREMENT_REGISTER_ADDRESSES
+        # In 12-bit data access every read carries channel data
+        return True
+
+    def is_frame_decimated(self, length_err_msg, miso_crc_group, mosi_crc_group, frame_time = None):
+        '''
+        Decide if full decoding of current frame can be skipped.
+        Writes, reads of configuration and frames with length or crc errors are never skipped.
+        Measurement frames are counted in selected device context.
+        frame_time can be any type which difference converts to seconds with float().
+        '''
+        if length_err_msg != "" or miso_crc_group.crc_status != CRC_OK_TOKEN or mosi_crc_group.crc_status != CRC_OK_TOKEN:
+            return False
+        if not self.is_measurement_frame():
+            return False
+        device_context = self.device_context
+        device_context.measurement_frame_count = device_context.measurement_frame_count + 1
+        decimated = False
+        if self.decimation_factor > 1 and (device_context.measurement_frame_count - 1) % self.decimation_factor != 0:
+            decimated = True
+        elif self.decimation_interval > 0 and frame_time != None and device_context.last_decoded_measurement_time != None:
+            decimated = float(frame_time - device_context.last_decoded_measurement_time) < self.decimation_interval
+        if decimated:
+            device_context.decimated_frame_count = device_context.decimated_frame_count + 1
+        else:
+            device_context.last_decoded_measurement_time = frame_time
+        return decimated
+
+    def evaluate_thresholds(self, miso_crc_group, mosi_crc_group):
+        '''
+        Capture X/Y/Z/T_THRX_CONFIG writes and reads of selected device and check measurement results against them.
+        Returns tuple of threshold violations found in current frame.
+        '''
+        if miso_crc_group.crc_status != CRC_OK_TOKEN or mosi_crc_group.crc_status != CRC_OK_TOKEN:
+            return ()
+        evaluator = self.device_context.threshold_evaluator
+        register_address = self.get_register_index_from_tmag5170_frame(self.mosi_value)
+        if get_bit(self.mosi_value, READ_WRITE_BIT_POSITION) == 0:
+            evaluator.set_threshold_config(register_address, tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.mosi_value))
+            return ()
+
+        if self.data_type == tmga5170_frame_decoder.DataType.default_32bit_access:
+            data_16_bit_spi = tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.miso_value)
+            if register_address in tmag5170_threshold_evaluator.result_register_channel_mapping:
+                channel = tmag5170_threshold_evaluator.result_register_channel_mapping[register_address]
+                violation = evaluator.evaluate(channel, uint16_to_int16(data_16_bit_spi))
+            elif register_address == TEMP_RESULT_ADDRESS:
+                violation = evaluator.evaluate(CHANNEL_T_TOKEN, tmga5170_frame_decoder.convert_raw_temp_to_celsius(data_16_bit_spi, self.data_type))
+            else:
+                evaluator.set_threshold_config(register_address, data_16_bit_spi)
+                violation = None
+            if violation != None:
+                return (violation,)
+            return ()
+
+        if self.data_type not in tmag5170_threshold_evaluator.data_type_channel_mapping:
+            return ()
+        ch1_channel, ch2_channel = tmag5170_threshold_evaluator.data_type_channel_mapping[self.data_type]
+        all_12_bits_ch1 = (get_masked_value(self.miso_value, 16, 0xFF) << 4) | get_masked_value(self.miso_value, 8, 0x0F)
+        all_12_bits_ch2 = (get_masked_value(self.miso_value, 24, 0xFF) << 4) | get_masked_value(self.miso_value, 12, 0x0F)
+        # 12-bit results are the upper bits of 16-bit results, thresholds are compared in 16-bit scale
+        violations = []
+        violation = evaluator.evaluate(ch1_channel, uintX_to_intX_represented_on_Y_bytes(all_12_bits_ch1, 12, 2) * 16)
+        if violation != None:
+            violations.append(violation)
+        if ch2_channel == CHANNEL_T_TOKEN:
+            violation = evaluator.evaluate(CHANNEL_T_TOKEN, tmga5170_frame_decoder.convert_raw_temp_to_celsius(all_12_bits_ch2, self.data_type))
+        else:
+            violation = evaluator.evaluate(ch2_channel, uintX_to_intX_represented_on_Y_bytes(all_12_bits_ch2, 12, 2) * 16)
+        if violation != None:
+            violations.append(violation)
+        return tuple(violations)
+
     def get_mosi_miso_str(self):
         str_mosi_value = tmga5170_frame_decoder.convert_uint_to_mosi_miso_str(self.mosi_value)
         str_miso_value = tmga5170_frame_decoder.convert_uint_to_mosi_miso_str(self.miso_value)
@@ -636,6 +955,42 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
 
         return tmga5170_frame_decoder.cmd_stat_4_bit_group_type(cmd3, cmd2, cmd1, cmd0, error_stat, stat_2_0)
 
+    @staticmethod
+    def get_crc_group_from_calculated(data, crc_calculated):
+        if data == None:
+            return tmga5170_frame_decoder.crc_4_bit_group_type("", None, None)
+        crc_from_bus = data & 0x0F
+        if crc_calculated == crc_from_bus:
+            crc_status = CRC_OK_TOKEN
+        else:
+            crc_status = CRC_ERROR_TOKEN
+        return tmga5170_frame_decoder.crc_4_bit_group_type(crc_status, crc_calculated, crc_from_bus)
+
+    def decode_raw_frame(self, mosi_raw_data, miso_raw_data):
+        '''
+        Settings independent decoding phase: frame words, length verification and crc.
+        Returned record does not depend on data type, ranges or SI conversion, so it can be cached and later loaded with load_raw_frame_record().
+        '''
+        length_err_msg = self.set_mosi_miso_raw_data(mosi_raw_data, miso_raw_data)
+        miso_crc_group = tmga5170_frame_decoder.calculate_tmag5170_crc(self.miso_value)
+        mosi_crc_group = tmga5170_frame_decoder.calculate_tmag5170_crc(self.mosi_value)
+        return tmga5170_frame_decoder.raw_frame_record_type(self.mosi_value, self.miso_value, length_err_msg, mosi_crc_group.crc_calculated, miso_crc_group.crc_calculated)
+
+    def load_raw_frame_record(self, raw_frame_record):
+        '''
+        Presentation phase entry: restore frame from raw record, get_* methods can be used afterwards.
+        Returns length error message and the same groups as get_4_bit_crc_cmd_stat_group().
+        '''
+        self.mosi_value = raw_frame_record.mosi_value
+        self.miso_value = raw_frame_record.miso_value
+        miso_crc_group = tmga5170_frame_decoder.get_crc_group_from_calculated(self.miso_value, raw_frame_record.miso_crc_calculated)
+        mosi_crc_group = tmga5170_frame_decoder.get_crc_group_from_calculated(self.mosi_value, raw_frame_record.mosi_crc_calculated)
+        if self.enable__cmd_stat_4_bit_group == True:
+            cmd_stat_4_bit_group = tmga5170_frame_decoder.retrieve_4_bit_cmd_stat(self.miso_value, self.mosi_value)
+        else:
+            cmd_stat_4_bit_group = tmga5170_frame_decoder.cmd_stat_4_bit_group_type(None, None, None, None, None, None)
+        return raw_frame_record.length_err_msg, miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group
+
     def get_4_bit_crc_cmd_stat_group(self):
         miso_crc_group = tmga5170_frame_decoder.calculate_tmag5170_crc(self.miso_value)
         mosi_crc_group = tmga5170_frame_decoder.calculate_tmag5170_crc(self.mosi_value)
@@ -653,15 +1008,18 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
                 read_write = READ_REGISTER_TOKEN
                 register_value = tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.miso_value)
                 register_decoding = self.get_register_decoded_description(register_address, self.miso_value)
+                register_fields = self.get_register_fields(register_address, self.miso_value)
             else:
                 read_write = WRITE_REGISTER_TOKEN
                 register_value = tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.mosi_value)
                 register_decoding = self.get_register_decoded_description(register_address, self.mosi_value)
+                register_fields = self.get_register_fields(register_address, self.mosi_value)
         else:
             read_write = ""
             register_value = None
             register_decoding = ""
-        return tmga5170_frame_decoder.address_8bit_register_16bit_group_type(read_write, register_address, register_name, register_decoding, register_value)
+            register_fields = {}
+        return tmga5170_frame_decoder.address_8bit_register_16bit_group_type(read_write, register_address, register_name, register_decoding, register_value, register_fields)
 
     def get_stat_8_bit_group(self):
         prev_crc_stat           = None
@@ -716,15 +1074,16 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
             Br_range_ch1 = self.Br_X_axis_enum
             temperature_to_conversion = True
         elif data_type ==  self.DataType.magnetic_field_temperature_YT:
-            Br_range_ch1 = self.Br_X_axis_enum
+            Br_range_ch1 = self.Br_Y_axis_enum
             temperature_to_conversion = True
         elif data_type ==  self.DataType.magnetic_field_temperature_ZT:
-            Br_range_ch1 = self.Br_X_axis_enum
+            Br_range_ch1 = self.Br_Z_axis_enum
             temperature_to_conversion = True
         elif data_type ==  self.DataType.angle_magnitude:
             ch1_value = all_12_bits_ch1
-            ch1_value_deg = tmga5170_frame_decoder.convert_raw_angle_to_deg(ch1_value, data_type)
-            ch1_si_value_str = tmga5170_frame_decoder.get_angle_str(ch1_value_deg)
+            if self.TempAngleConvEn == tmga5170_frame_decoder.Temp_Angle_Conv.enabled:
+                ch1_value_deg = tmga5170_frame_decoder.convert_raw_angle_to_deg(ch1_value, data_type)
+                ch1_si_value_str = tmga5170_frame_decoder.get_angle_str(ch1_value_deg)
             ch2_value = all_12_bits_ch2
         else:
             data_type_correct = False
@@ -740,6 +1099,7 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
                 ch2_si_value_str = tmga5170_frame_decoder.get_magnetic_field_str(ch2_value_mT)
             if temperature_to_conversion == True:
                 ch2_value = all_12_bits_ch2
+            if temperature_to_conversion == True and self.TempAngleConvEn == tmga5170_frame_decoder.Temp_Angle_Conv.enabled:
                 ch2_value_c = tmga5170_frame_decoder.convert_raw_temp_to_celsius(all_12_bits_ch2, data_type)
                 ch2_si_value_str = tmga5170_frame_decoder.get_temperature_str(ch2_value_c)
 
@@ -755,8 +1115,7 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
         read_write = ""
         ch1_si_value_str = ""
         ch2_si_value_str = ""
-
-
+        register_fields = {}
 
         if self.mosi_value != None:
             if get_bit(self.mosi_value, READ_WRITE_BIT_POSITION) == 1:
@@ -767,6 +1126,7 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
                 register_name = self.get_register_acronym(register_address)
                 register_value = tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(self.mosi_value)
                 register_decoding = self.get_register_decoded_description(register_address, self.mosi_value)
+                register_fields = self.get_register_fields(register_address, self.mosi_value)
 
         if self.miso_value != None:
             first_4_bits_ch1 = get_masked_value(self.miso_value, 8, 0x0F)
@@ -779,4 +1139,264 @@ f"[15-6] RESERVED: {int_to_hex_string(RESERVED_15_6)}, \
             ch1_value, ch2_value, ch1_si_value_str, ch2_si_value_str = self.convert_data_to_raw_and_SI_units_24bit(self.data_type, all_12_bits_ch1, all_12_bits_ch2)
 
 
-        return tmga5170_frame_decoder.data_24_bit_group_type(read_write, ch1_value, ch2_value, register_address, register_name, register_decoding, register_value, ch1_si_value_str, ch2_si_value_str)
+        return tmga5170_frame_decoder.data_24_bit_group_type(read_write, ch1_value, ch2_value, register_address, register_name, register_decoding, register_value, ch1_si_value_str, ch2_si_value_str, register_fields)
+
+
+class tmag5170_streaming_extractor:
+    '''
+    Fast path for 12-bit data access (DATA_TYPE 1h-7h): numeric (ch1, ch2) samples from MISO words.
+
+    Channel to axis mapping and scaling are computed once in constructor, extraction is a few bit operations
+    and one multiply-add per channel, no strings or namedtuples are created.
+    Magnetic channels are in mT (raw LSB when range is not selected), temperature in Celsius, angle in degrees,
+    magnitude raw. With temperature/angle conversion disabled these channels are raw too.
+    '''
+    # (ch1, ch2) content for every data type
+    MAGNETIC_X = "X"
+    MAGNETIC_Y = "Y"
+    MAGNETIC_Z = "Z"
+    TEMPERATURE = "T"
+    ANGLE = "A"
+    MAGNITUDE = "M"
+    data_type_channel_mapping = {
+        tmga5170_frame_decoder.DataType.magnetic_field_XY: (MAGNETIC_X, MAGNETIC_Y),
+        tmga5170_frame_decoder.DataType.magnetic_field_XZ: (MAGNETIC_X, MAGNETIC_Z),
+        tmga5170_frame_decoder.DataType.magnetic_field_ZY: (MAGNETIC_Z, MAGNETIC_Y),
+        tmga5170_frame_decoder.DataType.magnetic_field_temperature_XT: (MAGNETIC_X, TEMPERATURE),
+        tmga5170_frame_decoder.DataType.magnetic_field_temperature_YT: (MAGNETIC_Y, TEMPERATURE),
+        tmga5170_frame_decoder.DataType.magnetic_field_temperature_ZT: (MAGNETIC_Z, TEMPERATURE),
+        tmga5170_frame_decoder.DataType.angle_magnitude: (ANGLE, MAGNITUDE),
+        }
+
+    def __init__(self, data_type: tmga5170_frame_decoder.DataType,
+                 Br_X_axis_enum: tmga5170_frame_decoder.Br_range = tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 Br_Y_axis_enum: tmga5170_frame_decoder.Br_range = tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 Br_Z_axis_enum: tmga5170_frame_decoder.Br_range = tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 TempAngleConvEn: tmga5170_frame_decoder.Temp_Angle_Conv = tmga5170_frame_decoder.Temp_Angle_Conv.enabled):
+        if data_type not in self.data_type_channel_mapping:
+            raise ValueError(f"{data_type} is not 12-bit data access")
+        self.data_type = data_type
+        self.channels = self.data_type_channel_mapping[data_type]
+        axis_ranges = {self.MAGNETIC_X: Br_X_axis_enum, self.MAGNETIC_Y: Br_Y_axis_enum, self.MAGNETIC_Z: Br_Z_axis_enum}
+        convert_temp_angle = TempAngleConvEn == tmga5170_frame_decoder.Temp_Angle_Conv.enabled
+        scaling = []
+        for channel in self.channels:
+            signed = False
+            scale = 1
+            offset = 0
+            if channel in axis_ranges:
+                signed = True
+                magnetic_field_per_lsb = tmga5170_frame_decoder.convert_raw_magnetic_field_to_miliTeslas(1, data_type, axis_ranges[channel])
+                if magnetic_field_per_lsb != None:
+                    scale = magnetic_field_per_lsb
+            elif channel == self.TEMPERATURE and convert_temp_angle:
+                offset = tmga5170_frame_decoder.convert_raw_temp_to_celsius(0, data_type)
+                scale = tmga5170_frame_decoder.convert_raw_temp_to_celsius(1, data_type) - offset
+            elif channel == self.ANGLE and convert_temp_angle:
+                scale = 1 / 8
+            scaling.append((signed, scale, offset))
+        (self.ch1_signed, self.ch1_scale, self.ch1_offset), (self.ch2_signed, self.ch2_scale, self.ch2_offset) = scaling
+
+    def extract(self, miso_value: int):
+        ch1 = ((miso_value >> 12) & 0x0FF0) | ((miso_value >> 8) & 0x000F)
+        ch2 = ((miso_value >> 20) & 0x0FF0) | ((miso_value >> 12) & 0x000F)
+        if self.ch1_signed:
+            ch1 = (ch1 ^ 0x800) - 0x800
+        if self.ch2_signed:
+            ch2 = (ch2 ^ 0x800) - 0x800
+        return ch1 * self.ch1_scale + self.ch1_offset, ch2 * self.ch2_scale + self.ch2_offset
+
+    def iter_samples(self, timed_miso_values, verify_crc = False):
+        '''
+        Yields (timestamp, ch1, ch2) for every (timestamp, miso_value), None values (length errors) are skipped.
+        With verify_crc frames with wrong MISO crc are skipped too.
+        '''
+        extract = self.extract
+        for timestamp, miso_value in timed_miso_values:
+            if miso_value == None:
+                continue
+            if verify_crc and tmga5170_frame_decoder.calculate_tmag5170_crc(miso_value).crc_status != CRC_OK_TOKEN:
+                continue
+            ch1, ch2 = extract(miso_value)
+            yield timestamp, ch1, ch2
+
+    def extract_into(self, miso_values, ch1_samples, ch2_samples):
+        '''
+        Append samples of all MISO values to given sequences, e.g. array.array('d') used for plotting.
+        '''
+        extract = self.extract
+        for miso_value in miso_values:
+            ch1, ch2 = extract(miso_value)
+            ch1_samples.append(ch1)
+            ch2_samples.append(ch2)
+
+
+class tmag5170_device_context:
+    '''
+    Per-device state: static configuration, register shadow and frame counters.
+
+    Contexts are cheap, the register mapping is shared on class level of tmga5170_frame_decoder,
+    so one decoder can be switched between several sensors with select_device_context().
+    '''
+    def __init__(self, device_tag = "",
+                 data_type: tmga5170_frame_decoder.DataType = tmga5170_frame_decoder.DataType.default_32bit_access,
+                 Br_X_axis_enum: tmga5170_frame_decoder.Br_range = tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 Br_Y_axis_enum: tmga5170_frame_decoder.Br_range = tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 Br_Z_axis_enum: tmga5170_frame_decoder.Br_range = tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 TempAngleConvEn: tmga5170_frame_decoder.Temp_Angle_Conv = tmga5170_frame_decoder.Temp_Angle_Conv.enabled):
+        self.device_tag = device_tag
+        self.data_type = data_type
+        self.Br_X_axis_enum = Br_X_axis_enum
+        self.Br_Y_axis_enum = Br_Y_axis_enum
+        self.Br_Z_axis_enum = Br_Z_axis_enum
+        self.TempAngleConvEn = TempAngleConvEn
+        self.register_shadow = {}
+        self.threshold_evaluator = tmag5170_threshold_evaluator()
+        self.frame_count = 0
+        self.length_error_count = 0
+        self.crc_error_count = 0
+        # Decimation state, see tmga5170_frame_decoder.is_frame_decimated()
+        self.measurement_frame_count = 0
+        self.decimated_frame_count = 0
+        self.last_decoded_measurement_time = None
+
+
+class tmag5170_threshold_evaluator:
+    '''
+    Streaming check of measurement results against thresholds configured in X/Y/Z/T_THRX_CONFIG.
+
+    Magnetic thresholds are kept in 16-bit result LSB (8-bit threshold * 256), so check does not depend on selected range,
+    temperature thresholds are kept in Celsius. Every check is single comparison pair.
+    '''
+    threshold_violation_type = collections.namedtuple('threshold_violation_type', ['channel', 'direction', 'value', 'limit'])
+
+    threshold_register_channel_mapping = {
+        X_THRX_CONFIG_ADDRESS: CHANNEL_X_TOKEN,
+        Y_THRX_CONFIG_ADDRESS: CHANNEL_Y_TOKEN,
+        Z_THRX_CONFIG_ADDRESS: CHANNEL_Z_TOKEN,
+        }
+
+    result_register_channel_mapping = {
+        X_CH_RESULT_ADDRESS: CHANNEL_X_TOKEN,
+        Y_CH_RESULT_ADDRESS: CHANNEL_Y_TOKEN,
+        Z_CH_RESULT_ADDRESS: CHANNEL_Z_TOKEN,
+        }
+
+    data_type_channel_mapping = {
+        tmga5170_frame_decoder.DataType.magnetic_field_XY: (CHANNEL_X_TOKEN, CHANNEL_Y_TOKEN),
+        tmga5170_frame_decoder.DataType.magnetic_field_XZ: (CHANNEL_X_TOKEN, CHANNEL_Z_TOKEN),
+        tmga5170_frame_decoder.DataType.magnetic_field_ZY: (CHANNEL_Z_TOKEN, CHANNEL_Y_TOKEN),
+        tmga5170_frame_decoder.DataType.magnetic_field_temperature_XT: (CHANNEL_X_TOKEN, CHANNEL_T_TOKEN),
+        tmga5170_frame_decoder.DataType.magnetic_field_temperature_YT: (CHANNEL_Y_TOKEN, CHANNEL_T_TOKEN),
+        tmga5170_frame_decoder.DataType.magnetic_field_temperature_ZT: (CHANNEL_Z_TOKEN, CHANNEL_T_TOKEN),
+        }
+
+    def __init__(self):
+        # (lo, hi) limits, None until threshold register is seen on bus
+        self.limits = {CHANNEL_X_TOKEN: None, CHANNEL_Y_TOKEN: None, CHANNEL_Z_TOKEN: None, CHANNEL_T_TOKEN: None}
+        self.violation_counts = {}
+        for channel in self.limits:
+            self.violation_counts[(channel, THRESHOLD_HI_TOKEN)] = 0
+            self.violation_counts[(channel, THRESHOLD_LO_TOKEN)] = 0
+
+    def set_threshold_config(self, register_address, data_16_bit_spi):
+        hi_threshold = uint8_to_int8(get_masked_value(data_16_bit_spi, 8, 0xFF))
+        lo_threshold = uint8_to_int8(get_masked_value(data_16_bit_spi, 0, 0xFF))
+        if register_address in self.threshold_register_channel_mapping:
+            channel = self.threshold_register_channel_mapping[register_address]
+            self.limits[channel] = (lo_threshold * 256, hi_threshold * 256)
+        elif register_address == T_THRX_CONFIG_ADDRESS:
+            self.limits[CHANNEL_T_TOKEN] = (
+                tmga5170_frame_decoder.convert_temparature_threshold_to_celsius(lo_threshold, tmga5170_frame_decoder.DEFAULT_VALUE_LO_THR, tmga5170_frame_decoder.DEFAULT_VALUE_LO_THR_TEMP),
+                tmga5170_frame_decoder.convert_temparature_threshold_to_celsius(hi_threshold, tmga5170_frame_decoder.DEFAULT_VALUE_HI_THR, tmga5170_frame_decoder.DEFAULT_VALUE_HI_THR_TEMP))
+
+    def evaluate(self, channel, value):
+        limits = self.limits[channel]
+        if limits == None:
+            return None
+        if value > limits[1]:
+            direction = THRESHOLD_HI_TOKEN
+            limit = limits[1]
+        elif value < limits[0]:
+            direction = THRESHOLD_LO_TOKEN
+            limit = limits[0]
+        else:
+            return None
+        self.violation_counts[(channel, direction)] = self.violation_counts[(channel, direction)] + 1
+        return self.threshold_violation_type(channel, direction, value, limit)
+
+    @staticmethod
+    def get_threshold_violations_str(violations)->str:
+        return ", ".join(f"{violation.channel} {violation.direction}: {violation.value:.6g} (limit {violation.limit:.6g})" for violation in violations)
+
+
+class tmag5170_bus_decoder:
+    '''
+    Routes frames of several TMAG5170 sharing one SPI bus (chip select or any other device tag)
+    through a single tmga5170_frame_decoder.
+    '''
+    def __init__(self, device_contexts = (), enable__cmd_stat_4_bit_group = True, enable__stat_8_bit_group = True,
+                 decimation_factor = 1, decimation_interval = 0):
+        self.decoder = tmga5170_frame_decoder(enable__cmd_stat_4_bit_group = enable__cmd_stat_4_bit_group,
+                                              enable__stat_8_bit_group = enable__stat_8_bit_group,
+                                              decimation_factor = decimation_factor,
+                                              decimation_interval = decimation_interval)
+        self.device_contexts = {}
+        for device_context in device_contexts:
+            self.add_device(device_context)
+
+    def add_device(self, device_context: tmag5170_device_context):
+        self.device_contexts[device_context.device_tag] = device_context
+
+    def set_mosi_miso_raw_data(self, device_tag, mosi_raw_data, miso_raw_data):
+        '''
+        Select device by tag, load frame into decoder and update device counters and register shadow.
+        Returns length error message and decoder ready for get_* calls.
+        '''
+        self.decoder.select_device_context(self.device_contexts[device_tag])
+        length_err_msg = self.decoder.set_mosi_miso_raw_data(mosi_raw_data, miso_raw_data)
+        miso_crc_group, mosi_crc_group, _ = self.decoder.get_4_bit_crc_cmd_stat_group()
+        self.decoder.update_device_context(length_err_msg, miso_crc_group, mosi_crc_group)
+        return length_err_msg, self.decoder
+
+
+# Immutable decoding configuration of decode(), field names match tmag5170_device_context, so decoding methods read it the same way
+tmag5170_decoder_config = collections.namedtuple('tmag5170_decoder_config',
+                                                 ['data_type', 'Br_X_axis_enum', 'Br_Y_axis_enum', 'Br_Z_axis_enum', 'TempAngleConvEn',
+                                                  'enable__cmd_stat_4_bit_group', 'enable__stat_8_bit_group'],
+                                                 defaults = (tmga5170_frame_decoder.DataType.default_32bit_access,
+                                                             tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                                                             tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                                                             tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                                                             tmga5170_frame_decoder.Temp_Angle_Conv.enabled,
+                                                             True, True))
+
+# register_group is address_8bit_register_16bit_group_type in 32-bit access and data_24_bit_group_type in 12-bit data access,
+# stat_8_bit_group is None in 12-bit data access
+decoded_frame_record_type = collections.namedtuple('decoded_frame_record_type',
+                                                   ['mosi_value', 'miso_value', 'length_err_msg', 'mosi_crc_group', 'miso_crc_group',
+                                                    'cmd_stat_4_bit_group', 'register_group', 'stat_8_bit_group'])
+
+DEFAULT_DECODER_CONFIG = tmag5170_decoder_config()
+
+
+def decode(mosi_word, miso_word, config: tmag5170_decoder_config = DEFAULT_DECODER_CONFIG) -> decoded_frame_record_type:
+    '''
+    Pure decoding of one frame: result depends only on arguments and nothing is kept between calls,
+    so one config can be shared by any number of threads. Words are 32-bit ints, None marks frame with length error.
+    Decoder is created for every call and never shared, so get_* methods run without any state shared between calls.
+    '''
+    length_err_msg = ""
+    if mosi_word == None or miso_word == None:
+        # Frame with length error has no valid word, the other word is not decoded either
+        length_err_msg = LENGTH_ERROR_TOKEN
+        frame = tmga5170_frame_decoder.from_config(config)
+    else:
+        frame = tmga5170_frame_decoder.from_config(config, mosi_word, miso_word)
+    miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = frame.get_4_bit_crc_cmd_stat_group()
+    if config.data_type == tmga5170_frame_decoder.DataType.default_32bit_access:
+        register_group, stat_8_bit_group = frame.get_register_16_bit_address_stat_8_bit_group()
+    else:
+        register_group = frame.get_24_bit_data_group()
+        stat_8_bit_group = None
+    return decoded_frame_record_type(mosi_word, miso_word, length_err_msg, mosi_crc_group, miso_crc_group, cmd_stat_4_bit_group, register_group, stat_8_bit_group)
@@ -0,0 +1,279 @@
+'''
+Compact archive of measurement sample streams of decoded tmag5170 sessions.
+
+Every stream (register name in 32-bit access, channel in 12-bit data access) is stored in chunks.
+Chunk holds sample count, first timestamp and value, then timestamp delta-of-delta and value delta,
+all zigzag encoded varints. Regular polling gives 1-2 bytes per sample instead of ~1 kB of text export.
+Index with time range, file offset and size of every chunk is stored at the end of file,
+so reading a time range decodes only chunks which overlap it.
+
+Layout: MAGIC, chunks..., index (JSON), index offset (8 bytes, big endian), MAGIC
+
+Usage:
+    python tmag5170_offline.py export.csv --output session.tmag5170 --archive
+    python tmag5170_archive.py session.tmag5170 --stream X_CH_RESULT --start 1.0 --end 2.0
+'''
+import argparse
+import bisect
+import collections
+import json
+import sys
+
+import tmag5170 as lbr
+
+ARCHIVE_MAGIC = b'TMAG5170ARC1'
+ARCHIVE_FOOTER_OFFSET_SIZE = 8
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_TIME_RESOLUTION = 1e-9
+
+# 16-bit result registers which are two's complement, deltas across zero stay small
+SIGNED_RESULT_REGISTER_ADDRESSES = frozenset((lbr.X_CH_RESULT_ADDRESS, lbr.Y_CH_RESULT_ADDRESS, lbr.Z_CH_RESULT_ADDRESS))
+
+def zigzag_encode(value: int) -> int:
+    if value >= 0:
+        return value << 1
+    return ((-value) << 1) - 1
+
+def zigzag_decode(value: int) -> int:
+    if value & 1:
+        return -((value + 1) >> 1)
+    return value >> 1
+
+def append_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value = value >> 7
+    buffer.append(value)
+
+def read_varint(data, position: int):
+    '''
+    Returns (value, position after varint).
+    '''
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position = position + 1
+        value = value | ((byte & 0x7F) << shift)
+        if byte < 0x80:
+            return value, position
+        shift = shift + 7
+
+def encode_chunk(timestamps, values) -> bytes:
+    '''
+    timestamps and values are lists of ints with the same length.
+    '''
+    buffer = bytearray()
+    append_varint(buffer, len(timestamps))
+    append_varint(buffer, zigzag_encode(timestamps[0]))
+    append_varint(buffer, zigzag_encode(values[0]))
+    previous_timestamp = timestamps[0]
+    previous_delta = 0
+    previous_value = values[0]
+    for timestamp, value in zip(timestamps[1:], values[1:]):
+        delta = timestamp - previous_timestamp
+        append_varint(buffer, zigzag_encode(delta - previous_delta))
+        append_varint(buffer, zigzag_encode(value - previous_value))
+        previous_timestamp = timestamp
+        previous_delta = delta
+        previous_value = value
+    return bytes(buffer)
+
+def decode_chunk(data):
+    '''
+    Returns (timestamps, values) lists of ints.
+    '''
+    count, position = read_varint(data, 0)
+    timestamp, position = read_varint(data, position)
+    value, position = read_varint(data, position)
+    timestamp = zigzag_decode(timestamp)
+    value = zigzag_decode(value)
+    timestamps = [timestamp]
+    values = [value]
+    delta = 0
+    for i in range(count - 1):
+        delta_of_delta, position = read_varint(data, position)
+        value_delta, position = read_varint(data, position)
+        delta = delta + zigzag_decode(delta_of_delta)
+        timestamp = timestamp + delta
+        value = value + zigzag_decode(value_delta)
+        timestamps.append(timestamp)
+        values.append(value)
+    return timestamps, values
+
+
+class tmag5170_archive_writer:
+    '''
+    Collects samples per stream and writes full chunks as they fill up, index is written by close().
+    Timestamps of one stream must not decrease.
+    '''
+    def __init__(self, file_path: str, chunk_size = DEFAULT_CHUNK_SIZE, time_resolution = DEFAULT_TIME_RESOLUTION, metadata = None):
+        self.chunk_size = chunk_size
+        self.time_resolution = time_resolution
+        self.metadata = dict(metadata or {})
+        self.pending_timestamps = {}
+        self.pending_values = {}
+        self.chunks = []
+        self.sample_count = 0
+        self.file = open(file_path, 'wb')
+        self.file.write(ARCHIVE_MAGIC)
+
+    def add_sample(self, stream_name: str, timestamp, value: int):
+        timestamps = self.pending_timestamps.get(stream_name)
+        if timestamps == None:
+            timestamps = self.pending_timestamps[stream_name] = []
+            self.pending_values[stream_name] = []
+        timestamps.append(round(float(timestamp) / self.time_resolution))
+        self.pending_values[stream_name].append(value)
+        self.sample_count = self.sample_count + 1
+        if len(timestamps) >= self.chunk_size:
+            self.write_chunk(stream_name)
+
+    def write_chunk(self, stream_name: str):
+        timestamps = self.pending_timestamps[stream_name]
+        values = self.pending_values[stream_name]
+        if len(timestamps) == 0:
+            return
+        data = encode_chunk(timestamps, values)
+        self.chunks.append((stream_name, timestamps[0], timestamps[-1], len(timestamps), self.file.tell(), len(data)))
+        self.file.write(data)
+        self.pending_timestamps[stream_name] = []
+        self.pending_values[stream_name] = []
+
+    def close(self):
+        if self.file == None:
+            return
+        for stream_name in list(self.pending_timestamps):
+            self.write_chunk(stream_name)
+        index_offset = self.file.tell()
+        index = {'time_resolution': self.time_resolution, 'metadata': self.metadata, 'chunks': self.chunks}
+        self.file.write(json.dumps(index).encode())
+        self.file.write(index_offset.to_bytes(ARCHIVE_FOOTER_OFFSET_SIZE, 'big'))
+        self.file.write(ARCHIVE_MAGIC)
+        self.file.close()
+        self.file = None
+
+
+class tmag5170_archive_reader:
+    '''
+    Loads only the index on open, chunks are read and decoded when samples of their time range are requested.
+    '''
+    chunk_index_type = collections.namedtuple('chunk_index_type', ['stream_name', 'first_time', 'last_time', 'count', 'offset', 'size'])
+
+    def __init__(self, file_path: str):
+        self.file = open(file_path, 'rb')
+        if self.file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            self.file.close()
+            raise ValueError(f"{file_path} is not tmag5170 archive")
+        footer_size = ARCHIVE_FOOTER_OFFSET_SIZE + len(ARCHIVE_MAGIC)
+        self.file.seek(-footer_size, 2)
+        footer = self.file.read(footer_size)
+        if footer[ARCHIVE_FOOTER_OFFSET_SIZE:] != ARCHIVE_MAGIC:
+            self.file.close()
+            raise ValueError(f"{file_path} has no index, archive was not closed")
+        index_offset = int.from_bytes(footer[:ARCHIVE_FOOTER_OFFSET_SIZE], 'big')
+        index_end = self.file.seek(-footer_size, 2)
+        self.file.seek(index_offset)
+        index = json.loads(self.file.read(index_end - index_offset))
+        self.time_resolution = index['time_resolution']
+        self.metadata = index['metadata']
+        self.stream_chunks = {}
+        for chunk in index['chunks']:
+            chunk = self.chunk_index_type(*chunk)
+            self.stream_chunks.setdefault(chunk.stream_name, []).append(chunk)
+        self.stream_chunk_last_times = {stream_name: [chunk.last_time for chunk in chunks] for stream_name, chunks in self.stream_chunks.items()}
+
+    def get_stream_names(self):
+        return list(self.stream_chunks)
+
+    def get_sample_count(self, stream_name: str) -> int:
+        return sum(chunk.count for chunk in self.stream_chunks.get(stream_name, ()))
+
+    def read_samples(self, stream_name: str, start_time = None, end_time = None):
+        '''
+        Yields (timestamp [s], value) of stream samples with start_time <= timestamp <= end_time.
+        '''
+        chunks = self.stream_chunks.get(stream_name, [])
+        start = None if start_time == None else round(start_time / self.time_resolution)
+        end = None if end_time == None else round(end_time / self.time_resolution)
+        first_chunk_index = 0
+        if start != None:
+            first_chunk_index = bisect.bisect_left(self.stream_chunk_last_times[stream_name], start)
+        for chunk in chunks[first_chunk_index:]:
+            if end != None and chunk.first_time > end:
+                return
+            self.file.seek(chunk.offset)
+            timestamps, values = decode_chunk(self.file.read(chunk.size))
+            for timestamp, value in zip(timestamps, values):
+                if (start == None or timestamp >= start) and (end == None or timestamp <= end):
+                    yield timestamp * self.time_resolution, value
+
+    def close(self):
+        self.file.close()
+
+
+# Stream names of result registers and 12-bit channels which are two's complement
+archive_register_names = {register_address: lbr.tmga5170_frame_decoder().get_register_acronym(register_address) for register_address in lbr.MEASUREMENT_REGISTER_ADDRESSES}
+archive_signed_channels = frozenset((lbr.tmag5170_streaming_extractor.MAGNETIC_X, lbr.tmag5170_streaming_extractor.MAGNETIC_Y, lbr.tmag5170_streaming_extractor.MAGNETIC_Z))
+
+def get_archive_samples(raw_frame_record, data_type):
+    '''
+    (stream name, value) pairs of measurement data in frame, frames with length or crc errors and writes have none.
+    32-bit access: result register read, stream is register name, value 16-bit (signed for X/Y/Z).
+    12-bit data access: both channels as raw 12-bit values, streams are channel names of tmag5170_streaming_extractor.
+    '''
+    mosi_value = raw_frame_record.mosi_value
+    miso_value = raw_frame_record.miso_value
+    if raw_frame_record.length_err_msg != "":
+        return ()
+    if raw_frame_record.mosi_crc_calculated != mosi_value & 0x0F or raw_frame_record.miso_crc_calculated != miso_value & 0x0F:
+        return ()
+    if lbr.get_bit(mosi_value, lbr.READ_WRITE_BIT_POSITION) == 0:
+        return ()
+    if data_type == lbr.tmga5170_frame_decoder.DataType.default_32bit_access:
+        register_address = lbr.tmga5170_frame_decoder.get_register_index_from_tmag5170_frame(mosi_value)
+        if register_address not in lbr.MEASUREMENT_REGISTER_ADDRESSES:
+            return ()
+        value = lbr.tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(miso_value)
+        if register_address in SIGNED_RESULT_REGISTER_ADDRESSES:
+            value = lbr.uint16_to_int16(value)
+        return ((archive_register_names[register_address], value),)
+    ch1_name, ch2_name = lbr.tmag5170_streaming_extractor.data_type_channel_mapping[data_type]
+    ch1 = ((miso_value >> 12) & 0x0FF0) | ((miso_value >> 8) & 0x000F)
+    ch2 = ((miso_value >> 20) & 0x0FF0) | ((miso_value >> 12) & 0x000F)
+    if ch1_name in archive_signed_channels:
+        ch1 = (ch1 ^ 0x800) - 0x800
+    if ch2_name in archive_signed_channels:
+        ch2 = (ch2 ^ 0x800) - 0x800
+    return ((ch1_name, ch1), (ch2_name, ch2))
+
+def write_archive(file_path: str, offline_frames, data_type = lbr.tmga5170_frame_decoder.DataType.default_32bit_access, chunk_size = DEFAULT_CHUNK_SIZE):
+    '''
+    Archive measurement samples of tmag5170_offline frames, returns number of samples.
+    '''
+    archive_writer = tmag5170_archive_writer(file_path, chunk_size, metadata = {'data_type': data_type.value})
+    for offline_frame in offline_frames:
+        for stream_name, value in get_archive_samples(offline_frame.raw_frame_record, data_type):
+            archive_writer.add_sample(stream_name, offline_frame.start_time, value)
+    archive_writer.close()
+    return archive_writer.sample_count
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archive', help = "archive written by tmag5170_offline.py --archive")
+    parser.add_argument('--stream', help = "stream name, list of streams is printed when not given")
+    parser.add_argument('--start', type = float, help = "first timestamp [s]")
+    parser.add_argument('--end', type = float, help = "last timestamp [s]")
+    args = parser.parse_args(argv)
+    archive_reader = tmag5170_archive_reader(args.archive)
+    if args.stream == None:
+        for stream_name in archive_reader.get_stream_names():
+            print(f"{stream_name}: {archive_reader.get_sample_count(stream_name)} samples")
+    else:
+        print(f"timestamp,{args.stream}")
+        for timestamp, value in archive_reader.read_samples(args.stream, args.start, args.end):
+            sys.stdout.write(f"{timestamp!r},{value}\n")
+    archive_reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import collections
+import threading
+
+QUEUE_FULL_DROP = "drop"
+QUEUE_FULL_BLOCK = "block"
+
+DEFAULT_QUEUE_SIZE = 65536
+IDLE_WAIT_TIMEOUT = 0.05
+
+
+class tmag5170_background_worker:
+    '''
+    Daemon thread which takes frame records from bounded queue and passes them to handler,
+    so terminal formatting and file export are not done on decode path.
+
+    Queue is deque (append/popleft are atomic). Producer acquires free slot semaphore for every record (it waits only when
+    queue is full with QUEUE_FULL_BLOCK policy) and sets wakeup event only when worker sleeps.
+    With QUEUE_FULL_DROP policy new record is dropped and counted.
+    on_stop (e.g. closing of export file) is called on worker thread after the queue is drained.
+    '''
+    def __init__(self, handler, queue_size = DEFAULT_QUEUE_SIZE, queue_full_policy = QUEUE_FULL_DROP, on_stop = None):
+        self.handler = handler
+        self.on_stop = on_stop
+        self.queue_size = queue_size
+        self.queue_full_policy = queue_full_policy
+        self.queue = collections.deque()
+        self.free_slots = threading.Semaphore(queue_size)
+        self.wakeup = threading.Event()
+        self.worker_waiting = False
+        self.running = True
+        self.queued_count = 0
+        self.dropped_count = 0
+        self.processed_count = 0
+        self.handler_error_count = 0
+        self.queue_high_water_mark = 0
+        self.thread = threading.Thread(target = self.run, name = "tmag5170_background_worker", daemon = True)
+        self.thread.start()
+
+    def put(self, record) -> bool:
+        '''
+        Queue record for handler, returns False when record was dropped (queue full or worker stopped).
+        '''
+        if not self.running:
+            self.dropped_count = self.dropped_count + 1
+            return False
+        if not self.free_slots.acquire(blocking = self.queue_full_policy == QUEUE_FULL_BLOCK):
+            self.dropped_count = self.dropped_count + 1
+            return False
+        self.queue.append(record)
+        self.queued_count = self.queued_count + 1
+        queue_length = len(self.queue)
+        if queue_length > self.queue_high_water_mark:
+            self.queue_high_water_mark = queue_length
+        if self.worker_waiting:
+            self.wakeup.set()
+        return True
+
+    def run(self):
+        while True:
+            try:
+                record = self.queue.popleft()
+            except IndexError:
+                if not self.running:
+                    if self.on_stop != None:
+                        self.on_stop()
+                    return
+                self.worker_waiting = True
+                # Timeout covers record appended between empty check and setting worker_waiting
+                self.wakeup.wait(IDLE_WAIT_TIMEOUT)
+                self.wakeup.clear()
+                self.worker_waiting = False
+                continue
+            self.free_slots.release()
+            try:
+                self.handler(record)
+            except Exception:
+                self.handler_error_count = self.handler_error_count + 1
+            self.processed_count = self.processed_count + 1
+
+    def stop(self, timeout = None):
+        '''
+        Process all queued records and stop thread.
+        When called from worker thread itself (e.g. by finalizer run by garbage collection in handler) it does not wait,
+        remaining records are processed after return.
+        '''
+        self.running = False
+        self.wakeup.set()
+        if threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+
+    def get_counters(self):
+        return {
+            'queued': self.queued_count,
+            'dropped': self.dropped_count,
+            'processed': self.processed_count,
+            'handler_errors': self.handler_error_count,
+            'queue_length': len(self.queue),
+            'queue_high_water_mark': self.queue_high_water_mark,
+        }
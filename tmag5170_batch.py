@@ -0,0 +1,240 @@
+'''
+Batch decoding of directory of Logic 2 SPI analyzer exports with process pool.
+
+Every capture is decoded with tmga5170_frame_decoder in separate process, results are aggregated to one report:
+crc error rates per file and per register, length errors, status bit events and throughput.
+Result of every finished capture is appended to progress file, interrupted run started again with the same
+progress file skips captures which did not change since and were decoded with the same settings.
+
+Usage:
+    python tmag5170_batch.py captures/ --report report.json --progress progress.jsonl --jobs 8
+'''
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import os
+import time
+
+import tmag5170 as lbr
+import tmag5170_crc_correction
+import tmag5170_offline
+
+DEFAULT_PATTERN = "*.csv"
+
+STATUS_EVENT_FIELDS = ('error_stat', 'prev_crc_stat', 'cfg_reset_stat', 'sys_alrt_status1_stat', 'afe_alrt_status0_stat', 'x_stat', 'y_stat', 'z_stat', 't_stat')
+
+def get_capture_files(directory: str, pattern = DEFAULT_PATTERN):
+    file_paths = []
+    for root, directories, file_names in os.walk(directory):
+        directories.sort()
+        for file_name in sorted(file_names):
+            if fnmatch.fnmatch(file_name, pattern):
+                file_paths.append(os.path.join(root, file_name))
+    return file_paths
+
+def get_file_signature(file_path: str):
+    '''
+    (size, modification time) used to detect captures changed after they were processed.
+    '''
+    file_stat = os.stat(file_path)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+def get_progress_settings(split_bursts = False, data_type_value = 0):
+    '''
+    Arguments which change result of analyze_capture(), progress record of other settings is not reused.
+    '''
+    return {'split_bursts': split_bursts, 'data_type_value': data_type_value}
+
+def analyze_capture(file_path: str, split_bursts = False, data_type_value = 0):
+    '''
+    Decode one capture, returns dictionary with counters only (plain values, so it can be returned from worker process).
+    '''
+    start = time.perf_counter()
+    data_type = lbr.tmga5170_frame_decoder.DataType(data_type_value)
+    decoder = lbr.tmga5170_frame_decoder(data_type = data_type)
+    frame_count = 0
+    length_error_count = 0
+    mosi_crc_error_count = 0
+    miso_crc_error_count = 0
+    registers = {}
+    status_events = dict.fromkeys(STATUS_EVENT_FIELDS, 0)
+    crc_error_statistics = tmag5170_crc_correction.tmag5170_crc_error_statistics()
+    for offline_frame in tmag5170_offline.decode_capture_raw(file_path, split_bursts):
+        frame_count = frame_count + 1
+        length_err_msg, miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = decoder.load_raw_frame_record(offline_frame.raw_frame_record)
+        if length_err_msg != "":
+            length_error_count = length_error_count + 1
+            continue
+        register_name = decoder.get_register_acronym(decoder.get_register_index_from_tmag5170_frame(decoder.mosi_value))
+        register = registers.get(register_name)
+        if register == None:
+            register = registers[register_name] = {'frames': 0, 'mosi_crc_errors': 0, 'miso_crc_errors': 0}
+        register['frames'] = register['frames'] + 1
+        if mosi_crc_group.crc_status == lbr.CRC_ERROR_TOKEN:
+            mosi_crc_error_count = mosi_crc_error_count + 1
+            register['mosi_crc_errors'] = register['mosi_crc_errors'] + 1
+            crc_error_statistics.add_error(tmag5170_crc_correction.MOSI_LINE_TOKEN, decoder.mosi_value, mosi_crc_group.crc_calculated)
+        if miso_crc_group.crc_status == lbr.CRC_ERROR_TOKEN:
+            miso_crc_error_count = miso_crc_error_count + 1
+            register['miso_crc_errors'] = register['miso_crc_errors'] + 1
+            crc_error_statistics.add_error(tmag5170_crc_correction.MISO_LINE_TOKEN, decoder.miso_value, miso_crc_group.crc_calculated)
+            # Status bits of corrupted MISO are not counted
+            continue
+        if cmd_stat_4_bit_group.error_stat == 1:
+            status_events['error_stat'] = status_events['error_stat'] + 1
+        if data_type == lbr.tmga5170_frame_decoder.DataType.default_32bit_access:
+            stat_8_bit_group = decoder.get_stat_8_bit_group()
+            for name in stat_8_bit_group._fields:
+                if getattr(stat_8_bit_group, name) == 1:
+                    status_events[name] = status_events[name] + 1
+    return {
+        'frames': frame_count,
+        'length_errors': length_error_count,
+        'mosi_crc_errors': mosi_crc_error_count,
+        'miso_crc_errors': miso_crc_error_count,
+        'registers': registers,
+        'status_events': status_events,
+        'crc_error_bit_positions': crc_error_statistics.bit_position_counts,
+        'decode_seconds': time.perf_counter() - start,
+    }
+
+def load_progress(progress_path: str):
+    '''
+    file path -> progress record of finished captures, incomplete last line (interrupted write) is ignored.
+    '''
+    progress = {}
+    if progress_path == None or not os.path.exists(progress_path):
+        return progress
+    with open(progress_path, encoding = 'utf-8') as file:
+        for line in file:
+            try:
+                progress_record = json.loads(line)
+            except ValueError:
+                continue
+            progress[progress_record['file']] = progress_record
+    return progress
+
+def progress_file_ends_with_newline(progress_path: str) -> bool:
+    with open(progress_path, 'rb') as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+def append_progress(file, progress_record):
+    file.write(json.dumps(progress_record) + "\n")
+    file.flush()
+    os.fsync(file.fileno())
+
+def get_error_rate(error_count: int, frame_count: int):
+    if frame_count == 0:
+        return 0.0
+    return error_count / frame_count
+
+def aggregate_results(results, wall_seconds: float, decoded_file_paths = ()):
+    '''
+    results: file path -> result of analyze_capture(), decoded_file_paths: captures decoded in this run (wall clock throughput).
+    '''
+    totals = {'files': len(results), 'frames': 0, 'length_errors': 0, 'mosi_crc_errors': 0, 'miso_crc_errors': 0, 'decode_seconds': 0.0}
+    registers = {}
+    status_events = dict.fromkeys(STATUS_EVENT_FIELDS, 0)
+    crc_error_bit_positions = {line: [0] * tmag5170_crc_correction.TMAG5170_FRAME_BIT_COUNT
+                               for line in (tmag5170_crc_correction.MOSI_LINE_TOKEN, tmag5170_crc_correction.MISO_LINE_TOKEN)}
+    files = {}
+    for file_path, result in sorted(results.items()):
+        for name in ('frames', 'length_errors', 'mosi_crc_errors', 'miso_crc_errors', 'decode_seconds'):
+            totals[name] = totals[name] + result[name]
+        for register_name, register in result['registers'].items():
+            total_register = registers.setdefault(register_name, {'frames': 0, 'mosi_crc_errors': 0, 'miso_crc_errors': 0})
+            for name, value in register.items():
+                total_register[name] = total_register[name] + value
+        for name, value in result['status_events'].items():
+            status_events[name] = status_events.get(name, 0) + value
+        for line, bit_position_counts in result.get('crc_error_bit_positions', {}).items():
+            crc_error_bit_positions[line] = [total + count for total, count in zip(crc_error_bit_positions[line], bit_position_counts)]
+        files[file_path] = {
+            'frames': result['frames'],
+            'length_errors': result['length_errors'],
+            'mosi_crc_error_rate': get_error_rate(result['mosi_crc_errors'], result['frames']),
+            'miso_crc_error_rate': get_error_rate(result['miso_crc_errors'], result['frames']),
+            'status_events': result['status_events'],
+        }
+    for register in registers.values():
+        register['mosi_crc_error_rate'] = get_error_rate(register['mosi_crc_errors'], register['frames'])
+        register['miso_crc_error_rate'] = get_error_rate(register['miso_crc_errors'], register['frames'])
+    totals['mosi_crc_error_rate'] = get_error_rate(totals['mosi_crc_errors'], totals['frames'])
+    totals['miso_crc_error_rate'] = get_error_rate(totals['miso_crc_errors'], totals['frames'])
+    totals['frames_per_decode_s'] = totals['frames'] / totals['decode_seconds'] if totals['decode_seconds'] > 0 else 0.0
+    totals['run_frames'] = sum(results[file_path]['frames'] for file_path in decoded_file_paths)
+    totals['wall_seconds'] = wall_seconds
+    totals['frames_per_s'] = totals['run_frames'] / wall_seconds if wall_seconds > 0 else 0.0
+    return {'totals': totals, 'registers': registers, 'status_events': status_events, 'crc_error_bit_positions': crc_error_bit_positions, 'files': files}
+
+def run_batch(file_paths, progress_path = None, jobs = None, split_bursts = False, data_type_value = 0):
+    '''
+    Decode captures not finished in previous run, returns (aggregated report, number of captures decoded in this run).
+    '''
+    start = time.perf_counter()
+    progress = load_progress(progress_path)
+    settings = get_progress_settings(split_bursts, data_type_value)
+    results = {}
+    pending_file_paths = []
+    for file_path in file_paths:
+        progress_record = progress.get(file_path)
+        if progress_record != None and progress_record['signature'] == get_file_signature(file_path) and progress_record.get('settings') == settings:
+            results[file_path] = progress_record['result']
+        else:
+            pending_file_paths.append(file_path)
+
+    progress_file = None
+    if progress_path != None:
+        progress_file = open(progress_path, 'a', encoding = 'utf-8')
+        if progress_file.tell() > 0 and not progress_file_ends_with_newline(progress_path):
+            # Terminate incomplete record of interrupted run, so next record starts on new line
+            progress_file.write("\n")
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+            futures = {executor.submit(analyze_capture, file_path, split_bursts, data_type_value): file_path for file_path in pending_file_paths}
+            for future in concurrent.futures.as_completed(futures):
+                file_path = futures[future]
+                results[file_path] = future.result()
+                if progress_file != None:
+                    append_progress(progress_file, {'file': file_path, 'signature': get_file_signature(file_path), 'settings': settings, 'result': results[file_path]})
+    finally:
+        if progress_file != None:
+            progress_file.close()
+    return aggregate_results(results, time.perf_counter() - start, pending_file_paths), len(pending_file_paths)
+
+def get_report_str(report)->str:
+    totals = report['totals']
+    lines = [f"files: {totals['files']}, frames: {totals['frames']}, length errors: {totals['length_errors']}, \
+crc error rate mosi/miso: {totals['mosi_crc_error_rate']:0.6f}/{totals['miso_crc_error_rate']:0.6f}, \
+throughput: {totals['frames_per_s']:0.0f} frames/s ({totals['frames_per_decode_s']:0.0f} frames/s per process)"]
+    for register_name, register in sorted(report['registers'].items()):
+        lines.append(f"  {register_name}: {register['frames']} frames, crc error rate mosi/miso: {register['mosi_crc_error_rate']:0.6f}/{register['miso_crc_error_rate']:0.6f}")
+    status_events = ", ".join(f"{name}: {count}" for name, count in report['status_events'].items() if count != 0)
+    lines.append(f"  status events: {status_events}")
+    for line, bit_position_counts in report['crc_error_bit_positions'].items():
+        bit_positions = " ".join(f"{bit_position}:{count}" for bit_position, count in reversed(list(enumerate(bit_position_counts))) if count != 0)
+        lines.append(f"  {line} crc error candidate bits: {bit_positions}")
+    return "\n".join(lines)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help = "directory with Logic 2 SPI analyzer exports, searched recursively")
+    parser.add_argument('--pattern', default = DEFAULT_PATTERN, help = "file name pattern of captures")
+    parser.add_argument('--report', help = "aggregated report (JSON)")
+    parser.add_argument('--progress', help = "progress file (JSON Lines), finished captures are skipped on next run")
+    parser.add_argument('--jobs', type = int, help = "number of worker processes, number of CPUs when not given")
+    parser.add_argument('--data-type', type = int, default = 0, choices = range(8), help = "DATA_TYPE of SYSTEM_CONFIG")
+    parser.add_argument('--split-bursts', action = 'store_true', help = "decode every 4 bytes of held chip select as separate frame")
+    args = parser.parse_args(argv)
+
+    report, decoded_count = run_batch(get_capture_files(args.directory, args.pattern), args.progress, args.jobs, args.split_bursts, args.data_type)
+    print(f"{decoded_count} captures decoded, {report['totals']['files'] - decoded_count} taken from progress file")
+    print(get_report_str(report))
+    if args.report != None:
+        with open(args.report, 'w', encoding = 'utf-8') as file:
+            json.dump(report, file, indent = 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import collections
+import csv
+
+import tmag5170 as lbr
+
+SPI_ENABLE_TOKEN = "enable"
+SPI_RESULT_TOKEN = "result"
+SPI_DISABLE_TOKEN = "disable"
+
+# One frame of Logic 2 SPI analyzer, mosi/miso are single bytes for result frames, None otherwise
+spi_frame_type = collections.namedtuple('spi_frame_type', ['type', 'start_time', 'end_time', 'mosi', 'miso'])
+
+def parse_export_byte(value: str):
+    if value == None or value.strip() == "":
+        return None
+    return int(value, 0)
+
+def read_logic2_spi_export(file_path: str):
+    '''
+    Yields spi_frame_type for every row of Logic 2 SPI analyzer data table export (CSV with type, start_time, duration, mosi, miso columns).
+    '''
+    with open(file_path, newline = '') as file:
+        for row in csv.DictReader(file):
+            yield parse_export_row(row)
+
+def parse_export_row(row) -> spi_frame_type:
+    start_time = float(row['start_time'])
+    end_time = start_time + float(row.get('duration') or 0)
+    return spi_frame_type(row['type'], start_time, end_time, parse_export_byte(row.get('mosi')), parse_export_byte(row.get('miso')))
+
+
+class logic2_spi_export_reader:
+    '''
+    Iterates spi_frame_type rows of export like read_logic2_spi_export(), reading can start at byte offset of any row.
+    offset is byte offset of the first row not returned yet, so interrupted reading is resumed there.
+    '''
+    def __init__(self, file_path: str, offset = None):
+        self.file = open(file_path, 'rb')
+        self.field_names = next(csv.reader([self.file.readline().decode('utf-8')]))
+        if offset == None:
+            offset = self.file.tell()
+        self.offset = offset
+        self.file.seek(offset)
+
+    def __iter__(self):
+        for line in self.file:
+            self.offset = self.offset + len(line)
+            fields = next(csv.reader([line.decode('utf-8')]), None)
+            if not fields:
+                continue
+            yield parse_export_row(dict(zip(self.field_names, fields)))
+
+    def close(self):
+        if self.file == None:
+            return
+        self.file.close()
+        self.file = None
+
+def write_logic2_spi_export(file_path: str, spi_frames):
+    with open(file_path, 'w', newline = '') as file:
+        writer = csv.writer(file)
+        writer.writerow(('name', 'type', 'start_time', 'duration', 'mosi', 'miso'))
+        for spi_frame in spi_frames:
+            mosi = "" if spi_frame.mosi == None else f"0x{spi_frame.mosi:02X}"
+            miso = "" if spi_frame.miso == None else f"0x{spi_frame.miso:02X}"
+            writer.writerow(('SPI', spi_frame.type, repr(spi_frame.start_time), repr(spi_frame.end_time - spi_frame.start_time), mosi, miso))
+
+def add_tmag5170_crc(value: int) -> int:
+    frame = value & 0xFFFFFFF0
+    return frame | lbr.tmga5170_frame_decoder.calculate_tmag5170_crc(frame).crc_calculated
+
+def generate_spi_frames(mosi_miso_values, byte_period = 1e-6, frame_period = 20e-6, frames_per_transaction = 1):
+    '''
+    Yields enable/result/disable spi_frame_type sequence for list of (mosi, miso) 32-bit values.
+    With frames_per_transaction > 1 chip select is held for several tmag5170 frames.
+    '''
+    start_time = 0.0
+    mosi_miso_values = list(mosi_miso_values)
+    for first_frame_index in range(0, len(mosi_miso_values), frames_per_transaction):
+        yield spi_frame_type(SPI_ENABLE_TOKEN, start_time, start_time, None, None)
+        byte_time = start_time + byte_period
+        for mosi_value, miso_value in mosi_miso_values[first_frame_index:first_frame_index + frames_per_transaction]:
+            for mosi_byte, miso_byte in zip(mosi_value.to_bytes(4, 'big'), miso_value.to_bytes(4, 'big')):
+                yield spi_frame_type(SPI_RESULT_TOKEN, byte_time, byte_time + byte_period * 0.8, mosi_byte, miso_byte)
+                byte_time = byte_time + byte_period
+        yield spi_frame_type(SPI_DISABLE_TOKEN, byte_time, byte_time, None, None)
+        start_time = start_time + frame_period * frames_per_transaction
+
+def generate_synthetic_mosi_miso_values(frame_count: int):
+    '''
+    Typical polling sequence: CONV_STATUS, X/Y/Z_CH_RESULT and TEMP_RESULT reads with occasional configuration write.
+    '''
+    sequence = (0x88000000, 0x89000000, 0x8A000000, 0x8B000000, 0x8C000000)
+    values = []
+    for i in range(frame_count):
+        if i % 100 == 0:
+            mosi_value = 0x040AF600
+        else:
+            mosi_value = sequence[i % len(sequence)]
+        miso_value = ((i * 37) & 0xFFFF) << 8
+        values.append((add_tmag5170_crc(mosi_value), add_tmag5170_crc(miso_value)))
+    return values
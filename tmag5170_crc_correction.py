@@ -0,0 +1,114 @@
+'''
+Single bit error localization of tmag5170 frames.
+
+CRC-4 of tmag5170 (x^4 + x + 1, init 0xF) is affine, so flipping bit i of the frame always changes
+syndrome (calculated crc XOR crc from bus) by the same value, whatever the rest of the frame is.
+Syndrome of every bit position is precomputed, failing frame is then located by one table lookup.
+Polynomial has period 15, so 32 bit positions share 15 non zero syndromes and every syndrome has
+1-3 candidate positions: single bit error can be localized to candidates, not corrected for sure.
+'''
+import collections
+
+import tmag5170 as lbr
+
+TMAG5170_FRAME_BIT_COUNT = 32
+CRC_BIT_COUNT = 4
+
+MOSI_LINE_TOKEN = "mosi"
+MISO_LINE_TOKEN = "miso"
+
+crc_correction_candidate_type = collections.namedtuple('crc_correction_candidate_type', ['bit_position', 'corrected_word', 'register_address', 'register_value'])
+
+def build_crc_syndrome_table():
+    '''
+    syndrome -> tuple of frame bit positions which flip gives that syndrome.
+    Bits 3..0 are crc from bus, their flip changes syndrome by the bit itself.
+    '''
+    crc_of_zero = lbr.tmga5170_frame_decoder.calculate_tmag5170_crc(0).crc_calculated
+    syndrome_table = {}
+    for bit_position in range(TMAG5170_FRAME_BIT_COUNT):
+        if bit_position < CRC_BIT_COUNT:
+            syndrome = 1 << bit_position
+        else:
+            syndrome = lbr.tmga5170_frame_decoder.calculate_tmag5170_crc(1 << bit_position).crc_calculated ^ crc_of_zero
+        syndrome_table.setdefault(syndrome, []).append(bit_position)
+    return {syndrome: tuple(bit_positions) for syndrome, bit_positions in syndrome_table.items()}
+
+CRC_SYNDROME_TABLE = build_crc_syndrome_table()
+
+def get_crc_syndrome(value: int, crc_calculated: int) -> int:
+    return crc_calculated ^ (value & 0x0F)
+
+def get_single_bit_error_candidates(value: int, crc_calculated: int = None):
+    '''
+    Tuple of crc_correction_candidate_type, every candidate corrected word has correct crc.
+    Empty for correct frame and for frames without value (length error).
+    '''
+    if value == None:
+        return ()
+    if crc_calculated == None:
+        crc_calculated = lbr.tmga5170_frame_decoder.calculate_tmag5170_crc(value).crc_calculated
+    syndrome = get_crc_syndrome(value, crc_calculated)
+    if syndrome == 0:
+        return ()
+    candidates = []
+    for bit_position in CRC_SYNDROME_TABLE.get(syndrome, ()):
+        corrected_word = value ^ (1 << bit_position)
+        candidates.append(crc_correction_candidate_type(bit_position, corrected_word,
+                                                        lbr.tmga5170_frame_decoder.get_register_index_from_tmag5170_frame(corrected_word),
+                                                        lbr.tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(corrected_word)))
+    return tuple(candidates)
+
+def get_candidates_str(line: str, candidates, register_name_function = None)->str:
+    '''
+    register_name_function: register address -> name, used for mosi candidates where address can be affected too.
+    '''
+    candidate_strings = []
+    for candidate in candidates:
+        candidate_str = f"{line} bit {candidate.bit_position}: {lbr.int_to_hex_string(candidate.corrected_word, 8)}"
+        if line == MOSI_LINE_TOKEN and register_name_function != None:
+            candidate_str = candidate_str + f" {register_name_function(candidate.register_address)}"
+        candidate_strings.append(candidate_str + f" {lbr.int_to_hex_string(candidate.register_value, 4)}")
+    return " | ".join(candidate_strings)
+
+
+class tmag5170_crc_error_statistics:
+    '''
+    Bit position histograms of crc errors per line. Every candidate position of failing frame is counted,
+    positions repeating over many frames (e.g. always bit 0 of the same byte) point to sampling or signal integrity problem.
+    '''
+    def __init__(self):
+        self.error_counts = {MOSI_LINE_TOKEN: 0, MISO_LINE_TOKEN: 0}
+        self.bit_position_counts = {MOSI_LINE_TOKEN: [0] * TMAG5170_FRAME_BIT_COUNT, MISO_LINE_TOKEN: [0] * TMAG5170_FRAME_BIT_COUNT}
+        self.syndrome_counts = {MOSI_LINE_TOKEN: [0] * (1 << CRC_BIT_COUNT), MISO_LINE_TOKEN: [0] * (1 << CRC_BIT_COUNT)}
+
+    def add_error(self, line: str, value: int, crc_calculated: int):
+        '''
+        Count failing frame of given line, returns its single bit error candidates.
+        '''
+        candidates = get_single_bit_error_candidates(value, crc_calculated)
+        if len(candidates) == 0:
+            return candidates
+        self.error_counts[line] = self.error_counts[line] + 1
+        self.syndrome_counts[line][get_crc_syndrome(value, crc_calculated)] += 1
+        bit_position_counts = self.bit_position_counts[line]
+        for candidate in candidates:
+            bit_position_counts[candidate.bit_position] += 1
+        return candidates
+
+    def get_bit_position_histogram(self, line: str):
+        '''
+        bit position -> count for positions with non zero count.
+        '''
+        return {bit_position: count for bit_position, count in enumerate(self.bit_position_counts[line]) if count != 0}
+
+    def get_summary(self):
+        return {line: {'errors': self.error_counts[line], 'bit_positions': self.get_bit_position_histogram(line)} for line in self.error_counts}
+
+    @staticmethod
+    def get_summary_str(summary)->str:
+        line_strings = []
+        for line, line_summary in summary.items():
+            bit_positions = " ".join(f"{bit_position}:{count}" for bit_position, count in sorted(line_summary['bit_positions'].items(), reverse = True))
+            line_strings.append(f"{line} crc errors: {line_summary['errors']}, candidate bits: {bit_positions}")
+        return ", ".join(line_strings)
@@ -0,0 +1,118 @@
+import csv
+import json
+import os
+
+import tmag5170 as lbr
+
+EXPORT_FORMAT_JSON_LINES = "jsonl"
+EXPORT_FORMAT_CSV = "csv"
+
+DEFAULT_WRITE_BUFFER_SIZE = 1024 * 1024
+DEFAULT_BATCH_SIZE = 1024
+
+# Order of columns when no field selection is given, frame dictionaries of all decoded frame types are covered,
+# numeric register fields are taken from register field table of decoder
+EXPORT_ALL_FIELDS = (
+    'frame_type', 'start_time', 'end_time', 'FrameCnt_debug', 'device_tag', 'length_err_msg', 'threshold_violations', 'crc_error_candidates',
+    'mosi_frame', 'mosi_crc_calculated', 'mosi_crc_from_bus', 'crc_mosi_correct',
+    'miso_frame', 'miso_crc_calculated', 'miso_crc_from_bus', 'crc_miso_correct',
+    'read_write', 'register_address', 'register_name', 'register_value', 'register_decoding',
+    'ch1_value', 'ch1_si_value_str', 'ch2_value', 'ch2_si_value_str', 'ch1', 'ch2',
+    'stat_2_0', 'error_stat', 't_stat', 'z_stat', 'y_stat', 'x_stat',
+    'afe_alrt_status0_stat', 'sys_alrt_status1_stat', 'cfg_reset_stat', 'prev_crc_stat',
+    'cmd3', 'cmd2', 'cmd1', 'cmd0',
+) + lbr.tmga5170_frame_decoder.get_register_field_names()
+
+def parse_export_fields(fields_setting: str):
+    '''
+    Comma separated list of field names from Hla setting, empty string selects all fields.
+    '''
+    fields = tuple(field.strip() for field in fields_setting.split(',') if field.strip() != "")
+    if len(fields) == 0:
+        fields = EXPORT_ALL_FIELDS
+    return fields
+
+def get_export_format(file_path: str):
+    if file_path.lower().endswith('.csv'):
+        return EXPORT_FORMAT_CSV
+    return EXPORT_FORMAT_JSON_LINES
+
+
+class tmag5170_export_sink:
+    '''
+    Writes decoded frames to JSON Lines or CSV file.
+
+    write() only queues reference to frame dictionary, formatting and writing is done in batches
+    through large file buffer. File is synced to disk only on sync() and close().
+    With resume_position (returned by sync() of previous run) existing file is truncated there and writing continues,
+    records written after that sync are dropped.
+    '''
+    def __init__(self, file_path: str, fields = EXPORT_ALL_FIELDS, export_format = None,
+                 write_buffer_size = DEFAULT_WRITE_BUFFER_SIZE, batch_size = DEFAULT_BATCH_SIZE, resume_position = None):
+        if export_format == None:
+            export_format = get_export_format(file_path)
+        self.export_format = export_format
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self.pending_records = []
+        self.record_count = 0
+        self.csv_writer = None
+        if resume_position != None:
+            self.file = open(file_path, 'r+', newline = '', encoding = 'utf-8', buffering = write_buffer_size)
+            self.file.seek(resume_position)
+            self.file.truncate()
+            if self.export_format == EXPORT_FORMAT_CSV:
+                self.csv_writer = csv.writer(self.file)
+            return
+        self.file = open(file_path, 'w', newline = '', encoding = 'utf-8', buffering = write_buffer_size)
+        if self.export_format == EXPORT_FORMAT_CSV:
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(self.fields)
+
+    def write(self, frame_type, start_time, end_time, frame_data: dict):
+        if self.file == None:
+            return
+        self.pending_records.append((frame_type, start_time, end_time, frame_data))
+        if len(self.pending_records) >= self.batch_size:
+            self.flush()
+
+    def get_record_values(self, frame_type, start_time, end_time, frame_data: dict):
+        values = []
+        for field in self.fields:
+            if field == 'frame_type':
+                value = frame_type
+            elif field == 'start_time':
+                value = start_time
+            elif field == 'end_time':
+                value = end_time
+            else:
+                value = frame_data.get(field, "")
+            values.append(value)
+        return values
+
+    def flush(self):
+        if self.file == None:
+            return
+        if self.csv_writer != None:
+            self.csv_writer.writerows(self.get_record_values(*record) for record in self.pending_records)
+        else:
+            self.file.writelines(json.dumps(dict(zip(self.fields, self.get_record_values(*record))), default = str) + '\n'
+                                 for record in self.pending_records)
+        self.record_count = self.record_count + len(self.pending_records)
+        self.pending_records.clear()
+
+    def sync(self) -> int:
+        '''
+        Write pending records and sync file to disk, returns file position after last record.
+        '''
+        self.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.file == None:
+            return
+        self.sync()
+        self.file.close()
+        self.file = None
@@ -0,0 +1,102 @@
+import collections
+
+import tmag5170_statistics
+
+# Detail levels from full decoding down to counting frames only
+DETAIL_FULL = 0
+DETAIL_NUMERIC = 1
+DETAIL_CRC_ADDRESS = 2
+DETAIL_COUNTED = 3
+
+detail_level_names = {
+    DETAIL_FULL: "full",
+    DETAIL_NUMERIC: "numeric",
+    DETAIL_CRC_ADDRESS: "crc+address",
+    DETAIL_COUNTED: "counted",
+    }
+
+DEFAULT_WINDOW_FRAME_COUNT = 256
+# Level is raised only when estimated load of higher level is below this fraction of budget
+DEFAULT_RESTORE_FRACTION = 0.5
+COST_SMOOTHING = 0.25
+
+detail_level_change_type = collections.namedtuple('detail_level_change_type', ['previous_level', 'level', 'load', 'frame_rate', 'degraded_frame_count'])
+
+
+class tmag5170_load_shedder:
+    '''
+    Chooses detail level of decoding from recent frame rate and decode cost.
+
+    Load is decode time [s] per second of capture, measured over windows of window_frame_count frames.
+    When load exceeds budget, detail goes one level down at the end of window. Decode cost per frame is kept for every level,
+    detail goes one level up only when frame rate times cost of the higher level is below restore_fraction of budget,
+    so level does not oscillate between two neighbours.
+    '''
+    def __init__(self, budget: float, window_frame_count = DEFAULT_WINDOW_FRAME_COUNT, restore_fraction = DEFAULT_RESTORE_FRACTION):
+        self.budget = budget
+        self.window_frame_count = window_frame_count
+        self.restore_fraction = restore_fraction
+        self.level = DETAIL_FULL
+        self.cost_per_frame = dict.fromkeys(detail_level_names)
+        self.level_frame_counts = dict.fromkeys(detail_level_names, 0)
+        self.degraded_frame_count = 0
+        self.last_load = None
+        self.window_start_time = None
+        self.window_frames = 0
+        self.window_decode_seconds = 0.0
+
+    def add_frames(self, frame_time, decode_seconds: float, frame_count = 1):
+        '''
+        Account frame_count frames decoded at current level in decode_seconds, frame_time is Hla timestamp of the last one.
+        Returns detail_level_change_type when level changed, None otherwise.
+        '''
+        if frame_count == 0 or frame_time == None:
+            return None
+        if self.window_start_time == None:
+            self.window_start_time = frame_time
+        self.window_frames = self.window_frames + frame_count
+        self.window_decode_seconds = self.window_decode_seconds + decode_seconds
+        self.level_frame_counts[self.level] += frame_count
+        if self.level != DETAIL_FULL:
+            self.degraded_frame_count = self.degraded_frame_count + frame_count
+        if self.window_frames < self.window_frame_count:
+            return None
+
+        capture_span = tmag5170_statistics.time_difference(frame_time, self.window_start_time)
+        cost = self.window_decode_seconds / self.window_frames
+        if self.cost_per_frame[self.level] == None:
+            self.cost_per_frame[self.level] = cost
+        else:
+            self.cost_per_frame[self.level] = self.cost_per_frame[self.level] + COST_SMOOTHING * (cost - self.cost_per_frame[self.level])
+        frame_rate = None
+        self.last_load = float('inf')
+        if capture_span > 0:
+            frame_rate = self.window_frames / capture_span
+            self.last_load = self.window_decode_seconds / capture_span
+        self.window_start_time = frame_time
+        self.window_frames = 0
+        self.window_decode_seconds = 0.0
+
+        previous_level = self.level
+        if self.last_load > self.budget:
+            self.level = min(self.level + 1, DETAIL_COUNTED)
+        elif self.level != DETAIL_FULL:
+            # Level not measured yet is assumed to be affordable
+            higher_level_cost = self.cost_per_frame[self.level - 1]
+            if higher_level_cost == None or frame_rate * higher_level_cost < self.budget * self.restore_fraction:
+                self.level = self.level - 1
+        if self.level == previous_level:
+            return None
+        level_change = detail_level_change_type(previous_level, self.level, self.last_load, frame_rate, self.degraded_frame_count)
+        if self.level == DETAIL_FULL:
+            self.degraded_frame_count = 0
+        return level_change
+
+    @staticmethod
+    def get_level_change_str(level_change: detail_level_change_type, budget: float)->str:
+        frame_rate = "-" if level_change.frame_rate == None else f"{level_change.frame_rate:0.0f} frames/s"
+        level_change_str = f"detail {detail_level_names[level_change.previous_level]} -> {detail_level_names[level_change.level]}, \
+load {level_change.load:0.3f} s/s (budget {budget:0.3f}), {frame_rate}"
+        if level_change.level == DETAIL_FULL:
+            level_change_str = level_change_str + f", {level_change.degraded_frame_count} frames with reduced detail"
+        return level_change_str
@@ -0,0 +1,118 @@
+import sys
+import tracemalloc
+
+DEFAULT_TRACEBACK_LIMIT = 1
+DEFAULT_TOP_STATISTICS_COUNT = 10
+
+def get_object_size(obj) -> int:
+    '''
+    Deep size in bytes of dict/list/tuple/set tree with its keys and values, every object is counted once.
+    Objects shared between frames (interned strings, small ints, tokens) are counted too, so result is upper bound.
+    '''
+    seen = set()
+    pending = [obj]
+    size = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size = size + sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+    return size
+
+
+class tmag5170_memory_accounting:
+    '''
+    Memory accounting of Hla: bytes of emitted frame dictionaries per frame type, high-water marks of buffers
+    and optional tracemalloc snapshots compared with snapshot taken at start.
+    '''
+    def __init__(self, trace_allocations = False, traceback_limit = DEFAULT_TRACEBACK_LIMIT):
+        self.frame_dictionary_counts = {}
+        self.frame_dictionary_bytes = {}
+        self.frame_dictionary_max_bytes = {}
+        self.buffer_high_water_marks = {}
+        self.started_tracing = False
+        self.baseline_snapshot = None
+        if trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(traceback_limit)
+                self.started_tracing = True
+            self.baseline_snapshot = tracemalloc.take_snapshot()
+
+    def add_frame_dictionary(self, frame_type, frame_dictionary: dict):
+        frame_dictionary_size = get_object_size(frame_dictionary)
+        self.frame_dictionary_counts[frame_type] = self.frame_dictionary_counts.get(frame_type, 0) + 1
+        self.frame_dictionary_bytes[frame_type] = self.frame_dictionary_bytes.get(frame_type, 0) + frame_dictionary_size
+        if frame_dictionary_size > self.frame_dictionary_max_bytes.get(frame_type, 0):
+            self.frame_dictionary_max_bytes[frame_type] = frame_dictionary_size
+
+    def update_buffer_high_water_mark(self, buffer_name, length: int):
+        if length > self.buffer_high_water_marks.get(buffer_name, 0):
+            self.buffer_high_water_marks[buffer_name] = length
+
+    def get_bytes_per_frame(self, frame_type = None):
+        '''
+        Mean size of frame dictionary of given frame type, all frame types when None.
+        '''
+        if frame_type == None:
+            frame_count = sum(self.frame_dictionary_counts.values())
+            total_bytes = sum(self.frame_dictionary_bytes.values())
+        else:
+            frame_count = self.frame_dictionary_counts.get(frame_type, 0)
+            total_bytes = self.frame_dictionary_bytes.get(frame_type, 0)
+        if frame_count == 0:
+            return None
+        return total_bytes / frame_count
+
+    def get_traced_memory_statistics(self, top_statistics_count = DEFAULT_TOP_STATISTICS_COUNT):
+        '''
+        (current bytes, peak bytes, list of (source line, size difference) with largest growth since start), None without tracing.
+        '''
+        if self.baseline_snapshot == None or not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        top_statistics = [(str(statistic.traceback), statistic.size_diff)
+                          for statistic in snapshot.compare_to(self.baseline_snapshot, 'lineno')[:top_statistics_count]]
+        return current, peak, top_statistics
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        self.baseline_snapshot = None
+
+    def get_report(self, cache_sizes = None):
+        '''
+        cache_sizes: name -> (entry count, bytes) of caches owned by caller.
+        '''
+        report = {
+            'frame_dictionary_counts': dict(self.frame_dictionary_counts),
+            'bytes_per_frame': {frame_type: self.get_bytes_per_frame(frame_type) for frame_type in self.frame_dictionary_counts},
+            'max_bytes_per_frame': dict(self.frame_dictionary_max_bytes),
+            'buffer_high_water_marks': dict(self.buffer_high_water_marks),
+            'cache_sizes': dict(cache_sizes or {}),
+            'traced_memory': None,
+        }
+        traced_memory_statistics = self.get_traced_memory_statistics()
+        if traced_memory_statistics != None:
+            current, peak, top_statistics = traced_memory_statistics
+            report['traced_memory'] = {'current_bytes': current, 'peak_bytes': peak, 'top_growth': top_statistics}
+        return report
+
+    @staticmethod
+    def get_report_str(report)->str:
+        frames = ", ".join(f"{frame_type}: {report['frame_dictionary_counts'][frame_type]} x {bytes_per_frame:0.0f} B (max {report['max_bytes_per_frame'][frame_type]} B)"
+                           for frame_type, bytes_per_frame in report['bytes_per_frame'].items())
+        buffers = ", ".join(f"{buffer_name}: {length}" for buffer_name, length in report['buffer_high_water_marks'].items())
+        caches = ", ".join(f"{cache_name}: {entry_count} entries {cache_bytes} B" for cache_name, (entry_count, cache_bytes) in report['cache_sizes'].items())
+        report_str = f"frames: {frames}, buffer high-water marks: {buffers}, caches: {caches}"
+        traced_memory = report['traced_memory']
+        if traced_memory != None:
+            report_str = report_str + f", traced current/peak: {traced_memory['current_bytes']}/{traced_memory['peak_bytes']} B"
+        return report_str
@@ -0,0 +1,352 @@
+'''
+Offline decoding of Logic 2 SPI analyzer data table exports.
+
+Decoding is split into two phases:
+- raw phase - frame assembly, words, length verification and crc. It does not depend on data type, ranges or SI conversion,
+  so result is cached on disk, keyed by hash of capture file
+- presentation phase - register decoding, numeric fields and SI units for selected settings, cheap to repeat
+
+Very large captures are decoded in streaming mode with --checkpoint, interrupted run started again with the same
+checkpoint continues where it stopped.
+
+Usage:
+    python tmag5170_offline.py export.csv --output frames.jsonl --x-range TMAG5170A2_150mT_0h --cache-dir .tmag5170_cache
+    python tmag5170_offline.py huge_export.csv --output frames.csv --checkpoint frames.checkpoint
+'''
+import argparse
+import collections
+import csv
+import hashlib
+import os
+import pickle
+
+import tmag5170 as lbr
+import tmag5170_archive
+import tmag5170_capture
+import tmag5170_export
+import tmag5170_shared_memory
+
+# Change when raw record layout changes, old cache files are ignored then
+RAW_CACHE_VERSION = 1
+# Change when checkpoint content changes, old checkpoints are ignored then
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 100000
+
+REGULAR_FRAME_TYPE = 'tmag5170_regular'
+SPECIAL_FRAME_TYPE = 'tmag5170_special'
+
+offline_frame_type = collections.namedtuple('offline_frame_type', ['start_time', 'end_time', 'raw_frame_record'])
+
+def assemble_tmag5170_transactions(spi_frames, split_bursts = False):
+    '''
+    Group SPI bytes between chip select enable and disable, the same way as Hla does.
+    Yields list of (start_time, end_time, mosi_raw_data, miso_raw_data) of every transaction right after its disable frame,
+    with split_bursts every 4 bytes of transaction are separate frame.
+    '''
+    frame_data_MOSI = bytearray()
+    frame_data_MISO = bytearray()
+    byte_start_times = []
+    byte_end_times = []
+    start_frame_label_time = None
+    for spi_frame in spi_frames:
+        if spi_frame.type == tmag5170_capture.SPI_ENABLE_TOKEN:
+            start_frame_label_time = spi_frame.start_time
+        elif spi_frame.type == tmag5170_capture.SPI_RESULT_TOKEN:
+            frame_data_MOSI.append(spi_frame.mosi)
+            frame_data_MISO.append(spi_frame.miso)
+            byte_start_times.append(spi_frame.start_time)
+            byte_end_times.append(spi_frame.end_time)
+        elif spi_frame.type == tmag5170_capture.SPI_DISABLE_TOKEN:
+            if split_bursts and len(byte_start_times) > 0:
+                yield [(byte_start_times[burst_frame.first_byte_index], byte_end_times[burst_frame.last_byte_index],
+                        bytes(burst_frame.mosi_raw_data), bytes(burst_frame.miso_raw_data))
+                       for burst_frame in lbr.split_burst_into_frames(frame_data_MOSI, frame_data_MISO)]
+            else:
+                yield [(start_frame_label_time, spi_frame.start_time, bytes(frame_data_MOSI), bytes(frame_data_MISO))]
+            del frame_data_MOSI[:]
+            del frame_data_MISO[:]
+            byte_start_times.clear()
+            byte_end_times.clear()
+            start_frame_label_time = None
+
+def assemble_tmag5170_frames(spi_frames, split_bursts = False):
+    '''
+    Yields (start_time, end_time, mosi_raw_data, miso_raw_data) of every frame, see assemble_tmag5170_transactions().
+    '''
+    for transaction_frames in assemble_tmag5170_transactions(spi_frames, split_bursts):
+        yield from transaction_frames
+
+def get_capture_hash(file_path: str, split_bursts = False) -> str:
+    capture_hash = hashlib.sha256(f"{RAW_CACHE_VERSION}:{split_bursts}:".encode())
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            capture_hash.update(chunk)
+    return capture_hash.hexdigest()
+
+def decode_capture_raw(file_path: str, split_bursts = False, cache_directory = None):
+    '''
+    Raw phase for whole capture, returns list of offline_frame_type.
+    With cache_directory result is stored in <capture hash>.pickle and reused on next call.
+    '''
+    cache_path = None
+    if cache_directory != None:
+        cache_path = os.path.join(cache_directory, get_capture_hash(file_path, split_bursts) + ".pickle")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as file:
+                return [offline_frame_type(start_time, end_time, lbr.tmga5170_frame_decoder.raw_frame_record_type._make(raw_frame_record))
+                        for start_time, end_time, raw_frame_record in pickle.load(file)]
+
+    decoder = lbr.tmga5170_frame_decoder()
+    offline_frames = []
+    for start_time, end_time, mosi_raw_data, miso_raw_data in assemble_tmag5170_frames(tmag5170_capture.read_logic2_spi_export(file_path), split_bursts):
+        offline_frames.append(offline_frame_type(start_time, end_time, decoder.decode_raw_frame(mosi_raw_data, miso_raw_data)))
+
+    if cache_path != None:
+        os.makedirs(cache_directory, exist_ok = True)
+        temporary_path = cache_path + ".tmp"
+        with open(temporary_path, 'wb') as file:
+            pickle.dump([(offline_frame.start_time, offline_frame.end_time, tuple(offline_frame.raw_frame_record)) for offline_frame in offline_frames],
+                        file, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    return offline_frames
+
+def present_frame(decoder: lbr.tmga5170_frame_decoder, raw_frame_record, frame_counter: int):
+    '''
+    Presentation phase of single frame, returns frame type and dictionary with the same keys as Hla frames.
+    '''
+    length_err_msg, miso_crc_group, mosi_crc_group, cmd_stat_4_bit_group = decoder.load_raw_frame_record(raw_frame_record)
+    decoder.update_device_context(length_err_msg, miso_crc_group, mosi_crc_group)
+    mosi_frame, miso_frame = decoder.get_mosi_miso_str()
+    frame_data = {
+        'length_err_msg': length_err_msg,
+        'mosi_frame': mosi_frame,
+        'mosi_crc_calculated': lbr.int_to_hex_string(mosi_crc_group.crc_calculated),
+        'mosi_crc_from_bus': lbr.int_to_hex_string(mosi_crc_group.crc_from_bus),
+        'crc_mosi_correct': mosi_crc_group.crc_status,
+        'miso_frame': miso_frame,
+        'miso_crc_calculated': lbr.int_to_hex_string(miso_crc_group.crc_calculated),
+        'miso_crc_from_bus': lbr.int_to_hex_string(miso_crc_group.crc_from_bus),
+        'crc_miso_correct': miso_crc_group.crc_status,
+        'stat_2_0': lbr.int_to_hex_string(cmd_stat_4_bit_group.stat_2_0),
+        'error_stat': lbr.int_to_hex_string(cmd_stat_4_bit_group.error_stat),
+        'cmd3': lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd3),
+        'cmd2': lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd2),
+        'cmd1': lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd1),
+        'cmd0': lbr.int_to_hex_string(cmd_stat_4_bit_group.cmd0),
+        'FrameCnt_debug': frame_counter,
+    }
+    if decoder.data_type == lbr.tmga5170_frame_decoder.DataType.default_32bit_access:
+        frame_type = REGULAR_FRAME_TYPE
+        register_group, stat_8_bit_group = decoder.get_register_16_bit_address_stat_8_bit_group()
+        for name in stat_8_bit_group._fields:
+            frame_data[name] = lbr.int_to_hex_string(getattr(stat_8_bit_group, name))
+    else:
+        frame_type = SPECIAL_FRAME_TYPE
+        register_group = decoder.get_24_bit_data_group()
+        frame_data['ch1_value'] = register_group.ch1_value
+        frame_data['ch1_si_value_str'] = register_group.ch1_si_value_str
+        frame_data['ch2_value'] = register_group.ch2_value
+        frame_data['ch2_si_value_str'] = register_group.ch2_si_value_str
+    frame_data['read_write'] = register_group.read_write
+    frame_data['register_address'] = lbr.int_to_hex_string(register_group.register_address)
+    frame_data['register_name'] = register_group.register_name
+    frame_data['register_value'] = lbr.int_to_hex_string(register_group.register_value, 4)
+    frame_data['register_decoding'] = register_group.register_decoding
+    for field_name, field in register_group.register_fields.items():
+        frame_data[field_name] = field.value
+    return frame_type, frame_data
+
+def present_capture(decoder: lbr.tmga5170_frame_decoder, offline_frames):
+    '''
+    Yields (frame type, start time, end time, frame dictionary) for every frame.
+    '''
+    for frame_counter, offline_frame in enumerate(offline_frames):
+        frame_type, frame_data = present_frame(decoder, offline_frame.raw_frame_record, frame_counter)
+        yield frame_type, offline_frame.start_time, offline_frame.end_time, frame_data
+
+def iter_capture_samples(offline_frames, extractor: lbr.tmag5170_streaming_extractor):
+    '''
+    12-bit data access fast path: (timestamp, ch1, ch2) of every frame with correct MISO crc, no per frame decoding.
+    '''
+    for offline_frame in offline_frames:
+        raw_frame_record = offline_frame.raw_frame_record
+        miso_value = raw_frame_record.miso_value
+        if miso_value != None and raw_frame_record.miso_crc_calculated == miso_value & 0x0F:
+            ch1, ch2 = extractor.extract(miso_value)
+            yield offline_frame.start_time, ch1, ch2
+
+def write_capture_samples(file_path: str, samples, channels):
+    with open(file_path, 'w', newline = '', buffering = tmag5170_export.DEFAULT_WRITE_BUFFER_SIZE) as file:
+        writer = csv.writer(file)
+        writer.writerow(('timestamp',) + tuple(channels))
+        writer.writerows(samples)
+
+def publish_capture_samples(sample_publisher: tmag5170_shared_memory.tmag5170_sample_publisher, offline_frames):
+    '''
+    Publish samples of all measurement frames, timestamps are capture times. Returns number of samples.
+    '''
+    for offline_frame in offline_frames:
+        sample_publisher.publish_raw_frame_record(offline_frame.start_time, offline_frame.raw_frame_record)
+    return sample_publisher.published_count
+
+def get_checkpoint_settings(args):
+    '''
+    Arguments which change output, checkpoint of run with other settings can not be resumed.
+    '''
+    return {name: getattr(args, name) for name in ('output', 'fields', 'data_type', 'x_range', 'y_range', 'z_range', 'no_temp_angle_conversion', 'split_bursts')}
+
+def get_capture_signature(file_path: str):
+    file_stat = os.stat(file_path)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+def load_checkpoint(checkpoint_path: str):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, 'rb') as file:
+        checkpoint = pickle.load(file)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+def write_checkpoint(checkpoint_path: str, checkpoint):
+    '''
+    Checkpoint is written to temporary file and renamed, interrupted write keeps previous checkpoint.
+    '''
+    temporary_path = checkpoint_path + ".tmp"
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(checkpoint, file, protocol = pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, checkpoint_path)
+
+def decode_capture_checkpointed(args, checkpoint_path: str, checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL, max_frames = None):
+    '''
+    Streaming raw and presentation phase to export file, for captures too big to be decoded in one run.
+    Every checkpoint_interval frames (at chip select transaction boundary) output is synced and checkpoint is written:
+    input offset, FrameCnt_debug, settings, device context (register shadow, thresholds, counters) and output position.
+    Existing checkpoint is resumed, output is then identical to uninterrupted run. With max_frames run stops after
+    that many frames and keeps checkpoint, otherwise checkpoint is removed when capture is finished.
+    Returns (frames written in this run, capture finished).
+    '''
+    decoder = create_decoder(args)
+    settings = get_checkpoint_settings(args)
+    capture_signature = get_capture_signature(args.capture)
+    input_offset = None
+    frame_counter = 0
+    output_position = None
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint != None:
+        if checkpoint['settings'] != settings or checkpoint['capture_signature'] != capture_signature:
+            raise ValueError(f"{checkpoint_path} was written for different capture or settings")
+        input_offset = checkpoint['input_offset']
+        frame_counter = checkpoint['frame_counter']
+        output_position = checkpoint['output_position']
+        decoder.select_device_context(checkpoint['device_context'])
+
+    export_sink = tmag5170_export.tmag5170_export_sink(args.output, tmag5170_export.parse_export_fields(args.fields), resume_position = output_position)
+    spi_export_reader = tmag5170_capture.logic2_spi_export_reader(args.capture, input_offset)
+    first_frame_counter = frame_counter
+    next_checkpoint_counter = frame_counter + checkpoint_interval
+    finished = True
+    try:
+        for transaction_frames in assemble_tmag5170_transactions(spi_export_reader, args.split_bursts):
+            for start_time, end_time, mosi_raw_data, miso_raw_data in transaction_frames:
+                frame_type, frame_data = present_frame(decoder, decoder.decode_raw_frame(mosi_raw_data, miso_raw_data), frame_counter)
+                export_sink.write(frame_type, start_time, end_time, frame_data)
+                frame_counter = frame_counter + 1
+            stop = max_frames != None and frame_counter - first_frame_counter >= max_frames
+            if frame_counter >= next_checkpoint_counter or stop:
+                # Reader stopped right after disable frame of transaction, so its offset is transaction boundary
+                write_checkpoint(checkpoint_path, {
+                    'version': CHECKPOINT_VERSION,
+                    'settings': settings,
+                    'capture_signature': capture_signature,
+                    'input_offset': spi_export_reader.offset,
+                    'frame_counter': frame_counter,
+                    'output_position': export_sink.sync(),
+                    'device_context': decoder.device_context,
+                })
+                next_checkpoint_counter = frame_counter + checkpoint_interval
+            if stop:
+                finished = False
+                break
+    finally:
+        spi_export_reader.close()
+        export_sink.close()
+    if finished and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return frame_counter - first_frame_counter, finished
+
+def create_argument_parser():
+    range_choices = [br_range.name for br_range in lbr.tmga5170_frame_decoder.Br_range]
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help = "Logic 2 SPI analyzer data table export (CSV)")
+    parser.add_argument('--output', required = True, help = "decoded frames, *.csv or JSON Lines")
+    parser.add_argument('--fields', default = "", help = "comma separated list of exported fields, all when empty")
+    parser.add_argument('--data-type', type = int, default = 0, choices = range(8), help = "DATA_TYPE of SYSTEM_CONFIG")
+    parser.add_argument('--x-range', default = lbr.tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected.name, choices = range_choices)
+    parser.add_argument('--y-range', default = lbr.tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected.name, choices = range_choices)
+    parser.add_argument('--z-range', default = lbr.tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected.name, choices = range_choices)
+    parser.add_argument('--no-temp-angle-conversion', action = 'store_true', help = "do not convert temperature and angle to SI units")
+    parser.add_argument('--split-bursts', action = 'store_true', help = "decode every 4 bytes of held chip select as separate frame")
+    parser.add_argument('--cache-dir', help = "directory for raw phase cache")
+    parser.add_argument('--archive', action = 'store_true', help = "write measurement samples to compact archive (tmag5170_archive.py) instead of decoded frames")
+    parser.add_argument('--shared-memory', help = "also publish samples to shared memory ring buffer with this name, kept until Enter is pressed")
+    parser.add_argument('--checkpoint', help = "streaming decoding with periodic checkpoints in this file, existing checkpoint is resumed")
+    parser.add_argument('--checkpoint-interval', type = int, default = DEFAULT_CHECKPOINT_INTERVAL, help = "frames between checkpoints")
+    parser.add_argument('--max-frames', type = int, help = "with --checkpoint: stop after this many frames, next run continues")
+    parser.add_argument('--samples-only', action = 'store_true', help = "12-bit data access only: write timestamp, ch1, ch2 CSV using streaming fast path")
+    return parser
+
+def create_decoder(args):
+    if args.no_temp_angle_conversion:
+        temp_angle_conversion = lbr.tmga5170_frame_decoder.Temp_Angle_Conv.disabled
+    else:
+        temp_angle_conversion = lbr.tmga5170_frame_decoder.Temp_Angle_Conv.enabled
+    return lbr.tmga5170_frame_decoder(data_type = lbr.tmga5170_frame_decoder.DataType(args.data_type),
+                                      Br_X_axis_enum = lbr.tmga5170_frame_decoder.Br_range[args.x_range],
+                                      Br_Y_axis_enum = lbr.tmga5170_frame_decoder.Br_range[args.y_range],
+                                      Br_Z_axis_enum = lbr.tmga5170_frame_decoder.Br_range[args.z_range],
+                                      TempAngleConvEn = temp_angle_conversion)
+
+def write_output(args, offline_frames):
+    if args.samples_only:
+        decoder = create_decoder(args)
+        extractor = lbr.tmag5170_streaming_extractor(decoder.data_type, decoder.Br_X_axis_enum, decoder.Br_Y_axis_enum, decoder.Br_Z_axis_enum, decoder.TempAngleConvEn)
+        write_capture_samples(args.output, iter_capture_samples(offline_frames, extractor), extractor.channels)
+        return
+    if args.archive:
+        sample_count = tmag5170_archive.write_archive(args.output, offline_frames, lbr.tmga5170_frame_decoder.DataType(args.data_type))
+        print(f"{sample_count} samples written to {args.output}")
+        return
+    export_sink = tmag5170_export.tmag5170_export_sink(args.output, tmag5170_export.parse_export_fields(args.fields))
+    for frame_type, start_time, end_time, frame_data in present_capture(create_decoder(args), offline_frames):
+        export_sink.write(frame_type, start_time, end_time, frame_data)
+    export_sink.close()
+    print(f"{export_sink.record_count} frames written to {args.output}")
+
+def main(argv = None):
+    parser = create_argument_parser()
+    args = parser.parse_args(argv)
+    if args.checkpoint != None:
+        if args.archive or args.samples_only or args.shared_memory or args.cache_dir:
+            parser.error("--checkpoint can not be combined with --archive, --samples-only, --shared-memory or --cache-dir")
+        frame_count, finished = decode_capture_checkpointed(args, args.checkpoint, args.checkpoint_interval, args.max_frames)
+        print(f"{frame_count} frames written to {args.output}" + ("" if finished else f", continue with checkpoint {args.checkpoint}"))
+        return
+    offline_frames = decode_capture_raw(args.capture, args.split_bursts, args.cache_dir)
+    shared_memory_writer = None
+    if args.shared_memory:
+        decoder = create_decoder(args)
+        # Whole capture fits to ring, consumer started later still gets all samples
+        shared_memory_writer = tmag5170_shared_memory.tmag5170_shared_memory_writer(args.shared_memory, max(tmag5170_shared_memory.DEFAULT_CAPACITY, len(offline_frames) * 2))
+        sample_count = publish_capture_samples(tmag5170_shared_memory.tmag5170_sample_publisher(shared_memory_writer, decoder.data_type,
+                                               decoder.Br_X_axis_enum, decoder.Br_Y_axis_enum, decoder.Br_Z_axis_enum, decoder.TempAngleConvEn), offline_frames)
+        print(f"{sample_count} samples published to {args.shared_memory}")
+    write_output(args, offline_frames)
+    if shared_memory_writer != None:
+        input("Press Enter to release shared memory")
+        shared_memory_writer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+'''
+Shared memory ring buffer with decoded measurement samples for live plotting in other process.
+
+Layout (little endian):
+    header: magic, version, record size, capacity (uint32), write sequence (uint64), reserved (uint64)
+    records: capacity x (sequence + 1 (uint64), timestamp [s] (double), channel id (uint32), raw value (int32), SI value (double))
+
+Single writer: record is written at index sequence % capacity, then write sequence in header is incremented.
+Reader remembers its own sequence, unpacks new records directly from shared buffer and drops records
+which writer overwrote in the meantime (sequence stored in record does not match or is older than write sequence - capacity).
+'''
+import collections
+import struct
+from multiprocessing import shared_memory
+
+import tmag5170 as lbr
+import tmag5170_archive
+
+SHARED_MEMORY_MAGIC = 0x544D4147
+SHARED_MEMORY_VERSION = 1
+DEFAULT_CAPACITY = 1 << 16
+
+HEADER_STRUCT = struct.Struct('<IIIIQQ')
+WRITE_SEQUENCE_STRUCT = struct.Struct('<Q')
+WRITE_SEQUENCE_OFFSET = 16
+RECORD_STRUCT = struct.Struct('<QdIid')
+
+MAGNETIC_X_CHANNEL_ID = 0
+MAGNETIC_Y_CHANNEL_ID = 1
+MAGNETIC_Z_CHANNEL_ID = 2
+TEMPERATURE_CHANNEL_ID = 3
+ANGLE_CHANNEL_ID = 4
+MAGNITUDE_CHANNEL_ID = 5
+
+channel_id_mapping = {
+    lbr.tmag5170_streaming_extractor.MAGNETIC_X: MAGNETIC_X_CHANNEL_ID,
+    lbr.tmag5170_streaming_extractor.MAGNETIC_Y: MAGNETIC_Y_CHANNEL_ID,
+    lbr.tmag5170_streaming_extractor.MAGNETIC_Z: MAGNETIC_Z_CHANNEL_ID,
+    lbr.tmag5170_streaming_extractor.TEMPERATURE: TEMPERATURE_CHANNEL_ID,
+    lbr.tmag5170_streaming_extractor.ANGLE: ANGLE_CHANNEL_ID,
+    lbr.tmag5170_streaming_extractor.MAGNITUDE: MAGNITUDE_CHANNEL_ID,
+    }
+channel_name_mapping = {channel_id: channel_name for channel_name, channel_id in channel_id_mapping.items()}
+
+# Result registers of 32-bit access published as channels
+register_channel_mapping = {
+    "X_CH_RESULT": lbr.tmag5170_streaming_extractor.MAGNETIC_X,
+    "Y_CH_RESULT": lbr.tmag5170_streaming_extractor.MAGNETIC_Y,
+    "Z_CH_RESULT": lbr.tmag5170_streaming_extractor.MAGNETIC_Z,
+    "TEMP_RESULT": lbr.tmag5170_streaming_extractor.TEMPERATURE,
+    "ANGLE_RESULT": lbr.tmag5170_streaming_extractor.ANGLE,
+    "MAGNITUDE_RESULT": lbr.tmag5170_streaming_extractor.MAGNITUDE,
+    }
+
+sample_record_type = collections.namedtuple('sample_record_type', ['sequence', 'timestamp', 'channel_id', 'raw_value', 'value'])
+
+# Blocks owned by writers of this process, they stay registered in resource tracker
+writer_shared_memory_names = set()
+
+def attach_shared_memory(name: str):
+    '''
+    Attach existing block without registering it in resource tracker, so block is not unlinked when attaching process ends.
+    '''
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        from multiprocessing import resource_tracker
+        existing_shared_memory = shared_memory.SharedMemory(name = name)
+        if name not in writer_shared_memory_names:
+            resource_tracker.unregister(existing_shared_memory._name, 'shared_memory')
+        return existing_shared_memory
+
+
+class tmag5170_shared_memory_writer:
+    '''
+    Creates ring buffer block, existing block with the same name (e.g. Hla re-created after settings change) is reused when it is big enough.
+    close() unlinks the block.
+    '''
+    def __init__(self, name: str, capacity = DEFAULT_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        size = HEADER_STRUCT.size + capacity * RECORD_STRUCT.size
+        try:
+            self.shared_memory = shared_memory.SharedMemory(name = name, create = True, size = size)
+        except FileExistsError:
+            self.shared_memory = shared_memory.SharedMemory(name = name)
+            if self.shared_memory.size < size:
+                self.shared_memory.close()
+                self.shared_memory.unlink()
+                self.shared_memory = shared_memory.SharedMemory(name = name, create = True, size = size)
+        writer_shared_memory_names.add(name)
+        self.buffer = self.shared_memory.buf
+        # Readers detect restarted writer by write sequence going back
+        self.write_sequence = 0
+        HEADER_STRUCT.pack_into(self.buffer, 0, SHARED_MEMORY_MAGIC, SHARED_MEMORY_VERSION, RECORD_STRUCT.size, capacity, 0, 0)
+
+    def publish(self, timestamp: float, channel_id: int, raw_value: int, value: float):
+        sequence = self.write_sequence
+        RECORD_STRUCT.pack_into(self.buffer, HEADER_STRUCT.size + (sequence % self.capacity) * RECORD_STRUCT.size,
+                                sequence + 1, timestamp, channel_id, raw_value, value)
+        self.write_sequence = sequence + 1
+        WRITE_SEQUENCE_STRUCT.pack_into(self.buffer, WRITE_SEQUENCE_OFFSET, self.write_sequence)
+
+    def close(self, unlink = True):
+        if self.shared_memory == None:
+            return
+        self.buffer = None
+        self.shared_memory.close()
+        if unlink:
+            self.shared_memory.unlink()
+            writer_shared_memory_names.discard(self.name)
+        self.shared_memory = None
+
+
+class tmag5170_shared_memory_reader:
+    '''
+    Reference consumer. By default starts at newest record, with start_at_oldest all records still in ring are returned first.
+    '''
+    def __init__(self, name: str, start_at_oldest = False):
+        self.shared_memory = attach_shared_memory(name)
+        self.buffer = self.shared_memory.buf
+        magic, version, record_size, capacity, write_sequence, reserved = HEADER_STRUCT.unpack_from(self.buffer, 0)
+        if magic != SHARED_MEMORY_MAGIC or version != SHARED_MEMORY_VERSION or record_size != RECORD_STRUCT.size:
+            self.close()
+            raise ValueError(f"{name} is not tmag5170 sample ring buffer")
+        self.capacity = capacity
+        self.read_sequence = write_sequence
+        if start_at_oldest:
+            self.read_sequence = max(0, write_sequence - capacity)
+        self.lost_count = 0
+
+    def get_write_sequence(self) -> int:
+        return WRITE_SEQUENCE_STRUCT.unpack_from(self.buffer, WRITE_SEQUENCE_OFFSET)[0]
+
+    def read(self, max_records = None):
+        '''
+        List of sample_record_type published since last call, records overwritten before they were read are counted in lost_count.
+        '''
+        write_sequence = self.get_write_sequence()
+        if write_sequence < self.read_sequence:
+            # Writer was restarted
+            self.read_sequence = 0
+        if write_sequence - self.read_sequence > self.capacity:
+            self.lost_count = self.lost_count + write_sequence - self.capacity - self.read_sequence
+            self.read_sequence = write_sequence - self.capacity
+        end_sequence = write_sequence
+        if max_records != None:
+            end_sequence = min(end_sequence, self.read_sequence + max_records)
+
+        unpacked_records = []
+        sequence = self.read_sequence
+        while sequence < end_sequence:
+            index = sequence % self.capacity
+            count = min(end_sequence - sequence, self.capacity - index)
+            start_offset = HEADER_STRUCT.size + index * RECORD_STRUCT.size
+            view = self.buffer[start_offset:start_offset + count * RECORD_STRUCT.size]
+            unpacked_records.extend(RECORD_STRUCT.iter_unpack(view))
+            view.release()
+            sequence = sequence + count
+
+        # Records older than this could be overwritten while they were unpacked
+        oldest_valid_sequence = self.get_write_sequence() - self.capacity
+        records = []
+        for expected_sequence, record in enumerate(unpacked_records, self.read_sequence):
+            if record[0] == expected_sequence + 1 and expected_sequence >= oldest_valid_sequence:
+                records.append(sample_record_type(expected_sequence, record[1], record[2], record[3], record[4]))
+            else:
+                self.lost_count = self.lost_count + 1
+        self.read_sequence = end_sequence
+        return records
+
+    def close(self):
+        if self.shared_memory == None:
+            return
+        self.buffer = None
+        self.shared_memory.close()
+        self.shared_memory = None
+
+
+class tmag5170_sample_publisher:
+    '''
+    Converts measurement frames (raw frame records) to channel samples in SI units and publishes them to ring buffer.
+    Result register reads in 32-bit access, both channels of every read in 12-bit data access. Frames with length or crc errors are not published.
+    '''
+    def __init__(self, writer: tmag5170_shared_memory_writer,
+                 data_type: lbr.tmga5170_frame_decoder.DataType = lbr.tmga5170_frame_decoder.DataType.default_32bit_access,
+                 Br_X_axis_enum: lbr.tmga5170_frame_decoder.Br_range = lbr.tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 Br_Y_axis_enum: lbr.tmga5170_frame_decoder.Br_range = lbr.tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 Br_Z_axis_enum: lbr.tmga5170_frame_decoder.Br_range = lbr.tmga5170_frame_decoder.Br_range.TMAG5170_NotSelected,
+                 TempAngleConvEn: lbr.tmga5170_frame_decoder.Temp_Angle_Conv = lbr.tmga5170_frame_decoder.Temp_Angle_Conv.enabled):
+        self.writer = writer
+        self.data_type = data_type
+        self.axis_ranges = {
+            lbr.tmag5170_streaming_extractor.MAGNETIC_X: Br_X_axis_enum,
+            lbr.tmag5170_streaming_extractor.MAGNETIC_Y: Br_Y_axis_enum,
+            lbr.tmag5170_streaming_extractor.MAGNETIC_Z: Br_Z_axis_enum,
+            }
+        self.convert_temp_angle = TempAngleConvEn == lbr.tmga5170_frame_decoder.Temp_Angle_Conv.enabled
+        self.published_count = 0
+
+    def convert_to_si_value(self, channel_name: str, raw_value: int) -> float:
+        value = None
+        if channel_name in self.axis_ranges:
+            value = lbr.tmga5170_frame_decoder.convert_raw_magnetic_field_to_miliTeslas(raw_value, self.data_type, self.axis_ranges[channel_name])
+        elif channel_name == lbr.tmag5170_streaming_extractor.TEMPERATURE and self.convert_temp_angle:
+            value = lbr.tmga5170_frame_decoder.convert_raw_temp_to_celsius(raw_value, self.data_type)
+        elif channel_name == lbr.tmag5170_streaming_extractor.ANGLE and self.convert_temp_angle:
+            value = lbr.tmga5170_frame_decoder.convert_raw_angle_to_deg(raw_value, self.data_type)
+        if value == None:
+            value = float(raw_value)
+        return value
+
+    def publish_raw_frame_record(self, timestamp: float, raw_frame_record) -> int:
+        '''
+        Returns number of published samples.
+        '''
+        samples = tmag5170_archive.get_archive_samples(raw_frame_record, self.data_type)
+        for stream_name, raw_value in samples:
+            channel_name = register_channel_mapping.get(stream_name, stream_name)
+            self.writer.publish(timestamp, channel_id_mapping[channel_name], raw_value, self.convert_to_si_value(channel_name, raw_value))
+        self.published_count = self.published_count + len(samples)
+        return len(samples)
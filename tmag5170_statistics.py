@@ -0,0 +1,242 @@
+import math
+
+import tmag5170 as lbr
+
+def time_difference(end_time, start_time) -> float:
+    '''
+    Difference of two timestamps in seconds, works for floats and for Logic 2 GraphTime objects.
+    '''
+    return float(end_time - start_time)
+
+
+class log_histogram:
+    '''
+    Streaming histogram with power of 2 buckets, bucket k counts values from [2^(k-1), 2^k).
+    Update is O(1), memory is constant.
+    '''
+    def __init__(self, min_exponent = -30, max_exponent = 10):
+        self.min_exponent = min_exponent
+        self.max_exponent = max_exponent
+        self.bucket_counts = [0] * (max_exponent - min_exponent + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min_value = None
+        self.max_value = None
+
+    def add(self, value: float):
+        if value > 0:
+            exponent = min(max(math.frexp(value)[1], self.min_exponent), self.max_exponent)
+        else:
+            exponent = self.min_exponent
+        self.bucket_counts[exponent - self.min_exponent] += 1
+        self.count = self.count + 1
+        self.total = self.total + value
+        if self.min_value == None or value < self.min_value:
+            self.min_value = value
+        if self.max_value == None or value > self.max_value:
+            self.max_value = value
+
+    def get_mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def get_percentile(self, percentile: float):
+        '''
+        Upper bound of bucket which contains given percentile, limited to max seen value.
+        '''
+        if self.count == 0:
+            return None
+        rank = math.ceil(self.count * percentile / 100)
+        accumulated = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            accumulated = accumulated + bucket_count
+            if accumulated >= rank:
+                return min(math.ldexp(1, index + self.min_exponent), self.max_value)
+        return self.max_value
+
+    def get_buckets(self):
+        '''
+        List of (bucket upper bound, count) for non empty buckets.
+        '''
+        return [(math.ldexp(1, index + self.min_exponent), bucket_count) for index, bucket_count in enumerate(self.bucket_counts) if bucket_count != 0]
+
+
+class tmag5170_bus_timing_statistics:
+    '''
+    Frame duration, inter-frame gap and per register read rate statistics of SPI bus.
+    Times are taken from chip select enable/disable of every frame.
+    '''
+    def __init__(self):
+        self.frame_duration = log_histogram()
+        self.inter_frame_gap = log_histogram()
+        self.register_read_counts = {}
+        self.first_frame_time = None
+        self.last_frame_start_time = None
+        self.last_frame_end_time = None
+
+    def add_frame(self, start_time, end_time, register_name = None, is_read = False):
+        if start_time == None or end_time == None:
+            return
+        if self.first_frame_time == None:
+            self.first_frame_time = start_time
+        else:
+            self.inter_frame_gap.add(time_difference(start_time, self.last_frame_end_time))
+        self.frame_duration.add(time_difference(end_time, start_time))
+        self.last_frame_start_time = start_time
+        self.last_frame_end_time = end_time
+        if is_read:
+            self.register_read_counts[register_name] = self.register_read_counts.get(register_name, 0) + 1
+
+    def get_capture_span(self):
+        if self.first_frame_time == None:
+            return 0.0
+        return time_difference(self.last_frame_end_time, self.first_frame_time)
+
+    def get_register_read_rates(self):
+        '''
+        Reads per second of every register over whole capture span.
+        '''
+        capture_span = self.get_capture_span()
+        if capture_span <= 0:
+            return {}
+        return {register_name: read_count / capture_span for register_name, read_count in self.register_read_counts.items()}
+
+    def get_summary(self):
+        capture_span = self.get_capture_span()
+        frame_rate = 0.0
+        if capture_span > 0:
+            frame_rate = self.frame_duration.count / capture_span
+        return {
+            'frame_count': self.frame_duration.count,
+            'frame_rate_hz': frame_rate,
+            'frame_duration_mean_s': self.frame_duration.get_mean(),
+            'frame_duration_max_s': self.frame_duration.max_value,
+            'inter_frame_gap_mean_s': self.inter_frame_gap.get_mean(),
+            'inter_frame_gap_min_s': self.inter_frame_gap.min_value,
+            'inter_frame_gap_max_s': self.inter_frame_gap.max_value,
+            'inter_frame_gap_p99_s': self.inter_frame_gap.get_percentile(99),
+            'register_read_rates_hz': self.get_register_read_rates(),
+        }
+
+    @staticmethod
+    def get_summary_str(summary)->str:
+        def us(value):
+            if value == None:
+                return "-"
+            return f"{value * 1e6:0.2f} us"
+        read_rates = ", ".join(f"{register_name}: {rate:0.1f} Hz" for register_name, rate in summary['register_read_rates_hz'].items())
+        return f"frames: {summary['frame_count']}, frame rate: {summary['frame_rate_hz']:0.1f} Hz, \
+duration mean/max: {us(summary['frame_duration_mean_s'])}/{us(summary['frame_duration_max_s'])}, \
+gap mean/min/max/p99: {us(summary['inter_frame_gap_mean_s'])}/{us(summary['inter_frame_gap_min_s'])}/{us(summary['inter_frame_gap_max_s'])}/{us(summary['inter_frame_gap_p99_s'])}, \
+reads: {read_rates}"
+
+
+class tmag5170_conversion_latency_statistics:
+    '''
+    Conversion latency from trigger (CMD0 of MOSI frame, TRIGGER_MODE = 0h) to RDY of CONV_STATUS and to first result register read,
+    number of CONV_STATUS reads (polls) and their bus time per conversion.
+    Conversion is opened by trigger or, without triggers (continuous mode), by first CONV_STATUS read after previous result read,
+    and closed by first result read. Only frames with correct length and crc should be added.
+    In 12-bit data access every read returns channel data and is taken as result read, RDY can not be seen.
+    '''
+    def __init__(self, is_12_bit_data_access = False):
+        self.is_12_bit_data_access = is_12_bit_data_access
+        self.trigger_to_ready = log_histogram()
+        self.trigger_to_result = log_histogram()
+        self.ready_to_result = log_histogram()
+        self.polling_time = log_histogram()
+        self.poll_counts = {}
+        self.trigger_mode = lbr.TRIGGER_MODE_SPI_COMMAND
+        self.completed_count = 0
+        self.incomplete_count = 0
+        self.reset_conversion()
+
+    def reset_conversion(self):
+        self.conversion_open = False
+        self.trigger_time = None
+        self.ready_time = None
+        self.poll_count = 0
+        self.poll_bus_time = 0.0
+
+    def add_frame(self, start_time, end_time, mosi_value: int, miso_value: int):
+        if start_time == None or end_time == None or mosi_value == None or miso_value == None:
+            return
+        is_read = (mosi_value >> lbr.READ_WRITE_BIT_POSITION) & 0x01 == 1
+        register_address = lbr.tmga5170_frame_decoder.get_register_index_from_tmag5170_frame(mosi_value)
+        if not is_read and register_address == lbr.SYSTEM_CONFIG_ADDRESS:
+            register_value = lbr.tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(mosi_value)
+            self.trigger_mode = (register_value >> lbr.TRIGGER_MODE_POSITION) & lbr.TRIGGER_MODE_MASK
+
+        if is_read:
+            if not self.is_12_bit_data_access and register_address == lbr.CONV_STATUS_ADDRESS:
+                self.add_poll(start_time, end_time, miso_value)
+            elif self.is_12_bit_data_access or register_address in lbr.MEASUREMENT_REGISTER_ADDRESSES:
+                self.add_result_read(end_time)
+
+        # Result read with CMD0 in the same frame closes previous conversion and starts next one
+        if self.trigger_mode == lbr.TRIGGER_MODE_SPI_COMMAND and (mosi_value >> lbr.CONVERSION_START_CMD_BIT_POSITION) & 0x01 == 1:
+            if self.trigger_time != None:
+                self.incomplete_count = self.incomplete_count + 1
+            self.reset_conversion()
+            self.conversion_open = True
+            self.trigger_time = end_time
+
+    def add_poll(self, start_time, end_time, miso_value: int):
+        self.conversion_open = True
+        self.poll_count = self.poll_count + 1
+        self.poll_bus_time = self.poll_bus_time + time_difference(end_time, start_time)
+        register_value = lbr.tmga5170_frame_decoder.get_16_bit_spi_data_tmag5170(miso_value)
+        if self.ready_time == None and (register_value >> lbr.CONV_STATUS_RDY_BIT_POSITION) & 0x01 == 1:
+            self.ready_time = start_time
+            if self.trigger_time != None:
+                self.trigger_to_ready.add(time_difference(start_time, self.trigger_time))
+
+    def add_result_read(self, end_time):
+        if not self.conversion_open:
+            # Further result reads of the same conversion (e.g. Y and Z after X)
+            return
+        if self.trigger_time != None:
+            self.trigger_to_result.add(time_difference(end_time, self.trigger_time))
+        if self.ready_time != None:
+            self.ready_to_result.add(time_difference(end_time, self.ready_time))
+        self.poll_counts[self.poll_count] = self.poll_counts.get(self.poll_count, 0) + 1
+        self.polling_time.add(self.poll_bus_time)
+        self.completed_count = self.completed_count + 1
+        self.reset_conversion()
+
+    def get_mean_poll_count(self):
+        if self.completed_count == 0:
+            return None
+        return sum(poll_count * count for poll_count, count in self.poll_counts.items()) / self.completed_count
+
+    def get_summary(self):
+        return {
+            'conversion_count': self.completed_count,
+            'incomplete_conversion_count': self.incomplete_count,
+            'trigger_to_ready_mean_s': self.trigger_to_ready.get_mean(),
+            'trigger_to_ready_max_s': self.trigger_to_ready.max_value,
+            'trigger_to_result_mean_s': self.trigger_to_result.get_mean(),
+            'trigger_to_result_max_s': self.trigger_to_result.max_value,
+            'trigger_to_result_p99_s': self.trigger_to_result.get_percentile(99),
+            'ready_to_result_mean_s': self.ready_to_result.get_mean(),
+            'ready_to_result_max_s': self.ready_to_result.max_value,
+            'polls_per_conversion_mean': self.get_mean_poll_count(),
+            'polls_per_conversion': dict(sorted(self.poll_counts.items())),
+            'polling_time_mean_s': self.polling_time.get_mean(),
+            'polling_time_total_s': self.polling_time.total,
+        }
+
+    @staticmethod
+    def get_summary_str(summary)->str:
+        def us(value):
+            if value == None:
+                return "-"
+            return f"{value * 1e6:0.2f} us"
+        polls_mean = "-" if summary['polls_per_conversion_mean'] == None else f"{summary['polls_per_conversion_mean']:0.2f}"
+        polls = " ".join(f"{poll_count}:{count}" for poll_count, count in summary['polls_per_conversion'].items())
+        return f"conversions: {summary['conversion_count']} (incomplete {summary['incomplete_conversion_count']}), \
+trigger->ready mean/max: {us(summary['trigger_to_ready_mean_s'])}/{us(summary['trigger_to_ready_max_s'])}, \
+trigger->result mean/max/p99: {us(summary['trigger_to_result_mean_s'])}/{us(summary['trigger_to_result_max_s'])}/{us(summary['trigger_to_result_p99_s'])}, \
+ready->result mean/max: {us(summary['ready_to_result_mean_s'])}/{us(summary['ready_to_result_max_s'])}, \
+polls per conversion mean: {polls_mean} ({polls}), polling bus time: {us(summary['polling_time_total_s'])}"
@@ -0,0 +1,75 @@
+'''
+Thread pool scaling of pure tmag5170.decode().
+
+Synthetic polling sequence is decoded once serially and then by thread pools of growing size sharing one config,
+results of every pool are compared with serial results. With GIL decoding does not scale (expected speedup ~1),
+free-threaded Python build runs decode() in parallel.
+
+Usage:
+    python tools/decode_thread_scaling.py --frames 200000 --threads 1 2 4 8
+'''
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIRECTORY))
+
+import tmag5170 as lbr
+import tmag5170_capture
+
+DEFAULT_FRAME_COUNT = 100000
+DEFAULT_THREAD_COUNTS = (1, 2, 4, 8)
+DEFAULT_CHUNK_SIZE = 1000
+
+def decode_chunk(mosi_miso_values, config):
+    return [lbr.decode(mosi_value, miso_value, config) for mosi_value, miso_value in mosi_miso_values]
+
+def decode_with_thread_pool(mosi_miso_values, config, thread_count: int, chunk_size = DEFAULT_CHUNK_SIZE):
+    chunks = [mosi_miso_values[index:index + chunk_size] for index in range(0, len(mosi_miso_values), chunk_size)]
+    records = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers = thread_count) as executor:
+        for chunk_records in executor.map(decode_chunk, chunks, [config] * len(chunks)):
+            records.extend(chunk_records)
+    return records
+
+def is_gil_enabled() -> bool:
+    if hasattr(sys, '_is_gil_enabled'):
+        return sys._is_gil_enabled()
+    return True
+
+def run_benchmark(frame_count = DEFAULT_FRAME_COUNT, thread_counts = DEFAULT_THREAD_COUNTS, config = lbr.DEFAULT_DECODER_CONFIG, chunk_size = DEFAULT_CHUNK_SIZE):
+    '''
+    List of (thread count, seconds, frames per second, speedup against serial decoding, results equal to serial).
+    '''
+    mosi_miso_values = tmag5170_capture.generate_synthetic_mosi_miso_values(frame_count)
+    start = time.perf_counter()
+    serial_records = decode_chunk(mosi_miso_values, config)
+    serial_seconds = time.perf_counter() - start
+    results = []
+    for thread_count in thread_counts:
+        start = time.perf_counter()
+        records = decode_with_thread_pool(mosi_miso_values, config, thread_count, chunk_size)
+        seconds = time.perf_counter() - start
+        results.append((thread_count, seconds, frame_count / seconds, serial_seconds / seconds, records == serial_records))
+    return serial_seconds, results
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type = int, default = DEFAULT_FRAME_COUNT, help = "number of decoded frames")
+    parser.add_argument('--threads', type = int, nargs = '+', default = DEFAULT_THREAD_COUNTS, help = "thread pool sizes")
+    parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = "frames per submitted task")
+    parser.add_argument('--data-type', type = int, default = 0, choices = range(8), help = "DATA_TYPE of SYSTEM_CONFIG")
+    args = parser.parse_args(argv)
+
+    config = lbr.tmag5170_decoder_config(data_type = lbr.tmga5170_frame_decoder.DataType(args.data_type))
+    serial_seconds, results = run_benchmark(args.frames, args.threads, config, args.chunk_size)
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if is_gil_enabled() else 'disabled'}, CPUs: {os.cpu_count()}")
+    print(f"serial: {args.frames / serial_seconds:0.0f} frames/s")
+    for thread_count, seconds, frames_per_second, speedup, equal in results:
+        print(f"threads: {thread_count: >3}, {frames_per_second: >10.0f} frames/s, speedup: {speedup:0.2f}, results equal: {equal}")
+
+if __name__ == "__main__":
+    main()
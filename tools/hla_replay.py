@@ -0,0 +1,144 @@
+'''
+Headless replay of SPI frames through main_tmag5170_spi_decoder.Hla.
+
+Real saleae.analyzers is used when available, otherwise stub from tools/saleae_stub is loaded.
+Reports per decode() call latency percentiles and throughput for every combination of settings.
+
+Usage:
+    python tools/hla_replay.py                          # synthetic polling sequence
+    python tools/hla_replay.py --capture export.csv     # Logic 2 SPI analyzer data table export
+'''
+import argparse
+import contextlib
+import itertools
+import os
+import sys
+import time
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.dirname(TOOLS_DIRECTORY)
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+try:
+    import saleae.analyzers
+except ImportError:
+    sys.path.insert(0, os.path.join(TOOLS_DIRECTORY, 'saleae_stub'))
+    import saleae.analyzers
+
+import main_tmag5170_spi_decoder
+import tmag5170_capture
+
+# Settings changed between replay runs, X/Y/Z_RANGE always get the same value
+VARIED_SETTINGS = ('DATA_TYPE', 'Frame_length_verification', 'Temperature_Angle_Conversion', 'X_RANGE')
+
+
+def get_settings(hla_class = main_tmag5170_spi_decoder.Hla):
+    '''
+    Mapping of setting name to setting object declared on Hla class.
+    '''
+    settings = {}
+    for name in dir(hla_class):
+        value = getattr(hla_class, name)
+        if hasattr(value, 'get_default_value'):
+            settings[name] = value
+    return settings
+
+def create_hla(settings_values = None, hla_class = main_tmag5170_spi_decoder.Hla):
+    '''
+    Create Hla the way Logic 2 does: setting values are set on instance before __init__ is called.
+    '''
+    hla = hla_class.__new__(hla_class)
+    for name, setting in get_settings(hla_class).items():
+        setattr(hla, name, setting.get_default_value())
+    for name, value in (settings_values or {}).items():
+        setattr(hla, name, value)
+    hla.__init__()
+    return hla
+
+def get_settings_combinations(varied_settings = VARIED_SETTINGS, hla_class = main_tmag5170_spi_decoder.Hla):
+    settings = get_settings(hla_class)
+    choices = [settings[name].choices for name in varied_settings]
+    for values in itertools.product(*choices):
+        settings_values = dict(zip(varied_settings, values))
+        if 'X_RANGE' in settings_values:
+            settings_values['Y_RANGE'] = settings_values['X_RANGE']
+            settings_values['Z_RANGE'] = settings_values['X_RANGE']
+        yield settings_values
+
+def convert_to_analyzer_frames(spi_frames):
+    analyzer_frames = []
+    for spi_frame in spi_frames:
+        data = {}
+        if spi_frame.type == tmag5170_capture.SPI_RESULT_TOKEN:
+            data = {'mosi': bytes((spi_frame.mosi,)), 'miso': bytes((spi_frame.miso,))}
+        analyzer_frames.append(saleae.analyzers.AnalyzerFrame(spi_frame.type, spi_frame.start_time, spi_frame.end_time, data))
+    return analyzer_frames
+
+def replay(hla, analyzer_frames):
+    '''
+    Feed frames to hla, returns list of decode() latencies [ns] and list of produced frames.
+    '''
+    latencies = []
+    output_frames = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for analyzer_frame in analyzer_frames:
+            start = time.perf_counter_ns()
+            result = hla.decode(analyzer_frame)
+            latencies.append(time.perf_counter_ns() - start)
+            if isinstance(result, list):
+                output_frames.extend(result)
+            elif result != None:
+                output_frames.append(result)
+        if getattr(hla, 'background_worker', None) != None:
+            hla.background_worker.stop()
+    return latencies, output_frames
+
+def get_percentile(sorted_values, percentile):
+    if len(sorted_values) == 0:
+        return 0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))
+    return sorted_values[index]
+
+def get_replay_report(latencies, output_frames):
+    sorted_latencies = sorted(latencies)
+    total_seconds = sum(latencies) / 1e9
+    return {
+        'decode_calls': len(latencies),
+        'output_frames': len(output_frames),
+        'p50_us': get_percentile(sorted_latencies, 50) / 1e3,
+        'p90_us': get_percentile(sorted_latencies, 90) / 1e3,
+        'p99_us': get_percentile(sorted_latencies, 99) / 1e3,
+        'max_us': get_percentile(sorted_latencies, 100) / 1e3,
+        'decode_calls_per_s': len(latencies) / total_seconds if total_seconds > 0 else 0,
+        'output_frames_per_s': len(output_frames) / total_seconds if total_seconds > 0 else 0,
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--capture', help = "Logic 2 SPI analyzer export (CSV), synthetic frames are used when not given")
+    parser.add_argument('--frames', type = int, default = 500, help = "number of synthetic tmag5170 frames")
+    parser.add_argument('--frames-per-transaction', type = int, default = 1, help = "synthetic frames sent with chip select held")
+    parser.add_argument('--memory', action = 'store_true', help = "enable memory accounting and print report for every run")
+    parser.add_argument('--vary', nargs = '*', default = list(VARIED_SETTINGS), help = "choice settings varied between runs")
+    args = parser.parse_args(argv)
+
+    if args.capture:
+        spi_frames = list(tmag5170_capture.read_logic2_spi_export(args.capture))
+    else:
+        spi_frames = list(tmag5170_capture.generate_spi_frames(tmag5170_capture.generate_synthetic_mosi_miso_values(args.frames),
+                                                               frames_per_transaction = args.frames_per_transaction))
+    analyzer_frames = convert_to_analyzer_frames(spi_frames)
+
+    print(f"{'p50 us':>8} {'p90 us':>8} {'p99 us':>8} {'max us':>9} {'calls/s':>10} {'frames/s':>10}  settings")
+    for settings_values in get_settings_combinations(args.vary):
+        if args.memory:
+            settings_values['Memory_accounting'] = main_tmag5170_spi_decoder.Hla.MEMORY_ACCOUNTING_ENABLED
+        hla = create_hla(settings_values)
+        report = get_replay_report(*replay(hla, analyzer_frames))
+        settings_str = ", ".join(f"{name}={value}" for name, value in settings_values.items() if name in args.vary)
+        print(f"{report['p50_us']:8.2f} {report['p90_us']:8.2f} {report['p99_us']:8.2f} {report['max_us']:9.2f} "
+              f"{report['decode_calls_per_s']:10.0f} {report['output_frames_per_s']:10.0f}  {settings_str}")
+        if args.memory:
+            print(f"    {main_tmag5170_spi_decoder.tmag5170_memory.tmag5170_memory_accounting.get_report_str(hla.getMemoryReport())}")
+
+if __name__ == "__main__":
+    main()
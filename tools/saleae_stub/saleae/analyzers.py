@@ -0,0 +1,52 @@
+'''
+Minimal stand-in for Logic 2 saleae.analyzers module, only for running Hla outside of Logic 2.
+Never put this directory on sys.path inside Logic 2.
+'''
+
+class AnalyzerFrame:
+    def __init__(self, type, start_time, end_time, data = None):
+        self.type = type
+        self.start_time = start_time
+        self.end_time = end_time
+        self.data = data if data != None else {}
+
+    def __repr__(self):
+        return f"AnalyzerFrame({self.type!r}, {self.start_time!r}, {self.end_time!r}, {self.data!r})"
+
+
+class HighLevelAnalyzer:
+    pass
+
+
+class Setting:
+    def __init__(self, label = None):
+        self.label = label
+
+    def get_default_value(self):
+        return None
+
+
+class StringSetting(Setting):
+    def get_default_value(self):
+        return ""
+
+
+class NumberSetting(Setting):
+    def __init__(self, label = None, min_value = None, max_value = None):
+        super().__init__(label)
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def get_default_value(self):
+        if self.min_value != None:
+            return self.min_value
+        return 0
+
+
+class ChoicesSetting(Setting):
+    def __init__(self, choices, label = None):
+        super().__init__(label)
+        self.choices = tuple(choices)
+
+    def get_default_value(self):
+        return self.choices[0]
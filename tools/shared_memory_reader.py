@@ -0,0 +1,64 @@
+'''
+Reference consumer of tmag5170 sample ring buffer published by Hla (Shared_memory_name setting) or tmag5170_offline.py --shared-memory.
+Prints latest value and sample rate of every channel once per period, with --count prints records and exits.
+
+Usage:
+    python tools/shared_memory_reader.py tmag5170_samples
+    python tools/shared_memory_reader.py tmag5170_samples --oldest --count 100
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tmag5170_shared_memory
+
+POLL_PERIOD = 0.01
+
+def print_records(reader, count: int, timeout: float):
+    printed_count = 0
+    deadline = time.monotonic() + timeout
+    while printed_count < count and time.monotonic() < deadline:
+        records = reader.read(count - printed_count)
+        for record in records:
+            print(f"{record.sequence},{record.timestamp!r},{tmag5170_shared_memory.channel_name_mapping[record.channel_id]},{record.raw_value},{record.value!r}")
+        printed_count = printed_count + len(records)
+        if len(records) == 0:
+            time.sleep(POLL_PERIOD)
+    return printed_count
+
+def print_channel_summary(reader, period: float):
+    while True:
+        time.sleep(period)
+        latest_values = {}
+        sample_counts = {}
+        for record in reader.read():
+            channel_name = tmag5170_shared_memory.channel_name_mapping[record.channel_id]
+            latest_values[channel_name] = record.value
+            sample_counts[channel_name] = sample_counts.get(channel_name, 0) + 1
+        channels = ", ".join(f"{channel_name}: {value:0.3f} ({sample_counts[channel_name] / period:0.0f}/s)" for channel_name, value in latest_values.items())
+        print(f"{channels} lost: {reader.lost_count}")
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('name', help = "shared memory block name")
+    parser.add_argument('--oldest', action = 'store_true', help = "start with oldest record in ring instead of newest")
+    parser.add_argument('--count', type = int, help = "print this number of records as CSV and exit")
+    parser.add_argument('--timeout', type = float, default = 10.0, help = "maximal wait for --count records [s]")
+    parser.add_argument('--period', type = float, default = 0.5, help = "channel summary period [s]")
+    args = parser.parse_args(argv)
+
+    reader = tmag5170_shared_memory.tmag5170_shared_memory_reader(args.name, args.oldest)
+    try:
+        if args.count != None:
+            print_records(reader, args.count, args.timeout)
+        else:
+            print_channel_summary(reader, args.period)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+if __name__ == "__main__":
+    main()